@@ -89,42 +89,51 @@ class ArchiveRequest(BaseModel):
     rating: int
 
 from database.internal_types import MovieInfoInternal, PersonInfoInternal, CharacterInfoInternal
-def public_movie_info(internal: MovieInfoInternal) -> Movie:
-    from common.tmdb_utils import tmdb_full_image_path, ImgType
-
-    movie = internal
+from common.tmdb_utils import TmdbImageResolver, ImgType, tmdb_image_resolver
 
+def _public_movie(movie: MovieInfoInternal, resolver: TmdbImageResolver, poster_img_url: str, trailer_img_url: str) -> Movie:
     return Movie(
         id=movie.id,
         title=movie.title,
         overview=movie.tmdb_overview                             if movie.tmdb_overview else "[TMDB 줄거리 없음]",
         wiki_document=movie.wiki_document                        if movie.wiki_document else "[WIKIPEDIA 정보 없음]",
         release_date=str(movie.release_date)                     if movie.release_date else "[방영일 정보 없음]",
-        poster_img_url=tmdb_full_image_path(movie.poster_img_url, ImgType.POSTER, None)  if movie.poster_img_url  else "",
-        trailer_img_url=tmdb_full_image_path(movie.trailer_img_url, ImgType.STILL, None) if movie.trailer_img_url else "",
+        poster_img_url=poster_img_url,
+        trailer_img_url=trailer_img_url,
         bookmarked=movie.bookmarked                                                      if movie.bookmarked is not None else False,
         rating = movie.rating,
         ordering = 0,
         genres = movie.genres,
-        characters = [public_character_info(chara) for chara in movie.characters],
-        directors = [public_person_info(crew) for crew in movie.directors]
+        characters = [public_character_info(chara, resolver) for chara in movie.characters],
+        directors = [public_person_info(crew, resolver) for crew in movie.directors]
+    )
+
+def public_movie_info(internal: MovieInfoInternal, resolver: TmdbImageResolver|None = None) -> Movie:
+    resolver = resolver or tmdb_image_resolver()
+    return _public_movie(
+        internal, resolver,
+        resolver.url(internal.poster_img_url, ImgType.POSTER),
+        resolver.url(internal.trailer_img_url, ImgType.STILL)
     )
 
-def public_person_info(internal: PersonInfoInternal) -> Person:
-    from common.tmdb_utils import tmdb_full_image_path, ImgType
+def public_movie_infos(internals: List[MovieInfoInternal]) -> List[Movie]:
+    """영화 list 응답용. image URL resolver를 한 번만 불러오고, poster/still URL은 `urls()`로 한꺼번에 만듭니다"""
+    resolver = tmdb_image_resolver()
+    posters = resolver.urls([movie.poster_img_url for movie in internals], ImgType.POSTER)
+    trailers = resolver.urls([movie.trailer_img_url for movie in internals], ImgType.STILL)
+    return [_public_movie(movie, resolver, poster, trailer) for movie, poster, trailer in zip(internals, posters, trailers)]
 
+def public_person_info(internal: PersonInfoInternal, resolver: TmdbImageResolver|None = None) -> Person:
+    resolver = resolver or tmdb_image_resolver()
     return Person(
         id = internal.id,
         name = internal.name,
-        profile_image = tmdb_full_image_path(
-            internal.profile_image_path,
-            ImgType.PROFILE,
-            None) if internal.profile_image_path else ""
+        profile_image = resolver.url(internal.profile_image_path, ImgType.PROFILE)
     )
 
-def public_character_info(internal: CharacterInfoInternal) -> Character:
+def public_character_info(internal: CharacterInfoInternal, resolver: TmdbImageResolver|None = None) -> Character:
     return Character(
         id = internal.id,
         name = internal.name,
-        actor = public_person_info(internal.actor) if internal.actor else None
+        actor = public_person_info(internal.actor, resolver) if internal.actor else None
     )
\ No newline at end of file
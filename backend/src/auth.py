@@ -1,30 +1,78 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, Request, status
 from api_schema import *
 from database.utils import *
+import database.async_utils as adb
+from database.cache import StatCache
+from common.env import ENV_SESSION_SECRET
+from cachetools import TTLCache
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from pydantic import BaseModel, ValidationError
+import secrets
 
-USER_ID_COOKIE_KEY = "user_id"
+SESSION_COOKIE_KEY = "session"
+SESSION_TTL = 60 * 60 * 24 * 7 # 초 단위, token 유효 기간
+USER_CACHE_TTL = 60 # 초 단위, 탈퇴/정보 변경이 반영되기까지 최대 지연 시간
+
+_serializer = URLSafeTimedSerializer(ENV_SESSION_SECRET, salt="moviechat-session")
+# sid -> True, logout된 session (token이 만료될 때까지만 기억하면 됨)
+_revoked_sessions: TTLCache = TTLCache(maxsize=65536, ttl=SESSION_TTL)
+# user id -> UserInfoInternal, token이 유효할 때 매 요청마다 DB를 조회하지 않기 위함
+user_cache: StatCache[int, UserInfoInternal] = StatCache(TTLCache(maxsize=4096, ttl=USER_CACHE_TTL))
+
+class SessionToken(BaseModel):
+    id: int
+    nickname: str
+    sid: str
+
+def issue_session_token(user_id: int, nickname: str) -> str:
+    """user id와 nickname이 담긴 서명된 session token을 발급합니다"""
+    return _serializer.dumps({"id": user_id, "nickname": nickname, "sid": secrets.token_urlsafe(16)})
+
+def read_session_token(token: str|None) -> SessionToken|None:
+    """서명, 만료, logout 여부를 확인하고 token의 내용을 반환합니다. 유효하지 않다면 None"""
+    if not token:
+        return None
+    try:
+        session = SessionToken.model_validate(_serializer.loads(token, max_age=SESSION_TTL))
+    except (BadSignature, ValidationError):
+        return None
+    if session.sid in _revoked_sessions:
+        return None
+    return session
+
+def set_session_cookie(response: Response, user_id: int, nickname: str):
+    response.set_cookie(
+        key=SESSION_COOKIE_KEY,
+        value=issue_session_token(user_id, nickname),
+        max_age=SESSION_TTL,
+        httponly=True
+    )
 
 def check_user_id(request: Request):
     """Exception-Free User ID 추출"""
-    user_id = request.cookies.get(USER_ID_COOKIE_KEY)
-    if not user_id:
-      return None
-
-    return int(user_id)
+    session = read_session_token(request.cookies.get(SESSION_COOKIE_KEY))
+    return session.id if session else None
 
-def get_current_user_id(request: Request):
-    """Cookie에서 User ID를 추출"""
-    user_id = request.cookies.get(USER_ID_COOKIE_KEY)
-    if not user_id:
+def get_current_session(request: Request):
+    """Cookie에서 session token을 추출"""
+    session = read_session_token(request.cookies.get(SESSION_COOKIE_KEY))
+    if not session:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not logged in")
 
-    return int(user_id)
+    return session
 
-def validate_user(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
-    """Cookie의 User ID를 validate 합니다"""
-    user = db_find_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def validate_user(session: SessionToken = Depends(get_current_session), db: Session = Depends(adb.get_db)):
+    """
+    Cookie의 session token을 validate 합니다  
+    token 검증은 메모리에서 끝나며, user 정보는 USER_CACHE_TTL 동안 캐싱되므로 대부분의 요청은 DB를 조회하지 않습니다.
+    """
+    user = user_cache.get(session.id)
+    if user is None:
+        version = user_cache.version()
+        user = await adb.db_find_user_by_id(db, session.id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_cache.put(session.id, user, version)
     return user
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
@@ -38,18 +86,15 @@ async def get_user_information(user: UserInfoInternal = Depends(validate_user)):
     )
 
 @router.post("/register", response_model=UserInfoResponse)
-async def register_user(payload: RegisterRequest, response: Response, db: Session = Depends(get_db)):
-    id = db_create_new_user(db, payload.email, payload.password, payload.nickname)
+async def register_user(payload: RegisterRequest, response: Response, db: Session = Depends(adb.get_db)):
+    id = await adb.db_create_new_user(db, payload.email, payload.password, payload.nickname)
     if id is None:
-        raise HTTPException(status_code=400, detail="User already exists")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already exists")
 
     if payload.login == True:
-      # we immdiately login here, since we have the valid ID:
-      response.set_cookie(
-          key=USER_ID_COOKIE_KEY,
-          value=str(id),
-          httponly=True
-      )
+      # id는 이번 요청에서 새로 만든 user의 것이므로 바로 로그인시킵니다
+      # (이미 있는 email이라면 위에서 409로 끝나므로 다른 user의 session이 만들어지지 않음)
+      set_session_cookie(response, id, payload.nickname)
 
     return UserInfoResponse(
         id = id,
@@ -58,16 +103,12 @@ async def register_user(payload: RegisterRequest, response: Response, db: Sessio
     )
 
 @router.post("/login", response_model=UserInfoResponse)
-async def login_user(payload: UserLoginRequest, response: Response, db: Session = Depends(get_db)):
-    user = db_find_user_with_password(db, payload.email, payload.password)
+async def login_user(payload: UserLoginRequest, response: Response, db: Session = Depends(adb.get_db)):
+    user = await adb.db_find_user_with_password(db, payload.email, payload.password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    response.set_cookie(
-        key=USER_ID_COOKIE_KEY,
-        value=str(user.id),
-        httponly=True
-    )
+    set_session_cookie(response, user.id, user.nickname)
     return UserInfoResponse(
         id = user.id,
         email = user.email,
@@ -75,6 +116,10 @@ async def login_user(payload: UserLoginRequest, response: Response, db: Session
     )
 
 @router.post("/logout")
-async def logout_user(response: Response):
-    response.delete_cookie(key=USER_ID_COOKIE_KEY)
+async def logout_user(request: Request, response: Response):
+    session = read_session_token(request.cookies.get(SESSION_COOKIE_KEY))
+    if session:
+        _revoked_sessions[session.sid] = True
+        user_cache.invalidate(session.id)
+    response.delete_cookie(key=SESSION_COOKIE_KEY)
     return {"message": "Logged out"}
@@ -0,0 +1,65 @@
+"""
+로그인 확인(auth.validate_user)에 드는 시간을 잽니다.
+
+* db lookup: 예전 방식. 요청마다 cookie의 user id로 DB에서 user를 조회
+* token: 지금 방식. session token 서명/만료 확인 + user_cache(TTL) 조회, cache miss일 때만 DB 조회
+
+임시 DB에 user 하나를 만들어두고 각각 N번 호출한 평균과 user_cache 적중률을 보여줍니다.
+
+```bash
+# pwd = backend/src
+python -m bench_auth
+python -m bench_auth --calls 20000
+```
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from sqlalchemy.orm import sessionmaker
+import auth
+import database.async_utils as adb
+import database.models as m
+
+async def _measure(calls: int, session: sessionmaker, user_id: int, nickname: str) -> dict:
+    with session() as db:
+        start = time.perf_counter()
+        for _ in range(calls):
+            await adb.db_find_user_by_id(db, user_id)
+        lookup = (time.perf_counter() - start) / calls
+
+        auth.user_cache.clear()
+        token = auth.issue_session_token(user_id, nickname)
+        start = time.perf_counter()
+        for _ in range(calls):
+            await auth.validate_user(auth.read_session_token(token), db)
+        verify = (time.perf_counter() - start) / calls
+    return {"db lookup": lookup * 1e6, "token": verify * 1e6, "cache": auth.user_cache.stats()}
+
+def run(calls: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="moviechat_bench_")
+    path = os.path.join(directory, "bench.db")
+    engine = m.make_engine(f"sqlite:///{path}")
+    try:
+        m.Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            user = m.User(email="bench@moviechat", password="pw", nickname="bench")
+            db.add(user)
+            db.commit()
+            user_id, nickname = user.id, user.nickname
+
+        return asyncio.run(_measure(calls, sessionmaker(bind=engine, autoflush=False), user_id, nickname))
+    finally:
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로그인 확인 시간 측정")
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+    result = run(args.calls)
+    print(f"db lookup {result['db lookup']:.1f} us/호출, token {result['token']:.1f} us/호출")
+    print(f"user_cache {result['cache']}")
@@ -2,15 +2,19 @@ from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, Re
 from fastapi.responses import StreamingResponse
 from api_schema import *
 from database.utils import *
+import database.async_utils as adb
 from auth import validate_user
 from sse import *
 import asyncio
 
 router = APIRouter(prefix="/api/chatrooms", tags=["chatroom"])
 
+CURSOR_HEADER = "X-Next-Cursor"
+"""cursor pagination 시 다음 요청의 `before` 값을 담는 response header"""
+
 @router.get("", response_model=ChatRoomList)
-async def get_chatrooms(user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
-    rooms = db_get_user_chatrooms(db, user.id)
+async def get_chatrooms(user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
+    rooms = await adb.db_get_user_chatrooms(db, user.id)
     
     return {
         "normal": [
@@ -27,10 +31,12 @@ async def get_chatrooms(user: UserInfoInternal = Depends(validate_user), db: Ses
 @router.post("", response_model=CreateChatroomResponse)
 async def create_chatroom(payload: CreateChatroomRequest,
                           user: UserInfoInternal = Depends(validate_user),
-                          db: Session = Depends(get_db)):
+                          db: Session = Depends(adb.get_db),
+                          llm_db: Session = Depends(get_db)): # llm_layer는 아직 동기 Session을 사용합니다
     from llm_layer import stream_create_character
+    from llm.session_gc import forget_session
     
-    room = db_make_new_chatroom(db, user.id)
+    room = await adb.db_make_new_chatroom(db, user.id)
     if room is None:
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail="failed to create chatroom")
 
@@ -45,28 +51,30 @@ async def create_chatroom(payload: CreateChatroomRequest,
     else:
         # we create/prepare character for this chat room
         character_id = payload.character_id
-        profile = db_get_character_profile_by_id(db, character_id)
+        profile = await adb.db_get_character_profile_by_id(db, character_id)
         if profile is None:
             # client did something dumb
-            db_delete_user_chatroom(db, room.id, user.id)
+            await adb.db_delete_user_chatroom(db, room.id, user.id)
             raise HTTPException(status.HTTP_404_NOT_FOUND, "character not found")
 
         # now we're sure that room and character exists
         title = f"{profile.name} 님과 대화"
-        db_change_chatroom_immersive(db, room.id, character_id, title)
+        await adb.db_change_chatroom_immersive(db, room.id, character_id, title)
 
         # since creating character takes looong time, we use SSE here
         async def event_generator():
             ccr = CreateChatroomResponse(id = room.id, title = title, chats = [])
             yield sse_to_string(make_sse(SSE_CHATROOM, ccr.model_dump()))
 
-            async for chunk in stream_create_character(db, room.id, character_id):
+            async for chunk in stream_create_character(llm_db, room.id, character_id):
                 yield sse_to_string(chunk)
                 await asyncio.sleep(0) # 버퍼링 방지
 
                 if sse_type(chunk) == SSE_SIGNAL and sse_content(chunk) == SSE_CC_FAIL:
                     # something oof happened
-                    db_delete_user_chatroom(db, room.id, user.id)
+                    await adb.db_delete_user_chatroom(db, room.id, user.id)
+                    # 캐릭터를 만들면서 기록한 영화 문서 참조 등도 정리
+                    await asyncio.to_thread(forget_session, str(room.id))
                     raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "failed to create character")
 
             # finish our SSE message
@@ -79,28 +87,53 @@ async def create_chatroom(payload: CreateChatroomRequest,
 @router.delete("", response_model=DeleteChatroomResponse)
 async def delete_chatroom(payload: ChatroomIDRequest,
                           user: UserInfoInternal = Depends(validate_user),
-                          db: Session = Depends(get_db)):
-    if db_delete_user_chatroom(db, payload.id, user.id):
+                          db: Session = Depends(adb.get_db)):
+    from llm.session_gc import forget_session
+
+    # 다른 유저의 채팅방이거나 없는 채팅방이라면 아무것도 지우지 않고 False를 반환함
+    if await adb.db_delete_user_chatroom(db, payload.id, user.id):
+        # 채팅방의 memory, 영화 문서 참조, 예전 채팅방별 chroma 폴더도 정리
+        await asyncio.to_thread(forget_session, str(payload.id))
         return DeleteChatroomResponse(id=payload.id)
     else:
-        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail="db removal failed")
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="chatroom not found")
 
 # ---------------------------
 # /chatrooms/{room_id}/recommended
 # ---------------------------
-@router.get("/{room_id}/recommended", response_model=List[List[Movie]])
-async def get_recommended(room_id: int, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
-    list_of_movies = db_get_recommended_movies(db, room_id)
-    return [[public_movie_info(movie) for movie in movies] for movies in list_of_movies]
+@router.get("/{room_id}/recommended", response_model=List[List[Movie]], response_description=f"""
+`room_id`의 대화방에서 추천된 영화 목록들을 대화 순서대로 불러옵니다.  
+`limit`을 설정하면 최근 대화부터 최대 `limit`개의 추천 목록만 반환하며, 더 이전 목록이 남아있다면
+`{CURSOR_HEADER}` header에 다음 요청의 `before` 값이 담겨 옵니다.
+""")
+async def get_recommended(room_id: int,
+                          response: Response,
+                          before: Optional[int] = Query(None, description="cursor. 이전 응답의 X-Next-Cursor 값"),
+                          limit: Optional[int] = Query(None, ge=1, description="불러올 최대 추천 목록 수"),
+                          user: UserInfoInternal = Depends(validate_user),
+                          db: Session = Depends(adb.get_db)):
+    turns = await adb.db_get_recommended_turns(db, room_id, before, limit)
+    if limit is not None and len(turns) == limit:
+        response.headers[CURSOR_HEADER] = str(turns[0][0])
+    return await adb.to_thread(lambda: [public_movie_infos(movies) for _, movies in turns])
 
 # ---------------------------
 # /chatrooms/{room_id}/messages
 # ---------------------------
-@router.get("/{room_id}/messages", response_model=List[ChatHistory])
+@router.get("/{room_id}/messages", response_model=List[ChatHistory], response_description=f"""
+`room_id`의 대화방의 메시지 내역을 오래된 순서대로 불러옵니다.  
+`limit`을 설정하면 최근 메시지부터 최대 `limit`개만 반환하며(첫 화면용), 더 이전 메시지가 남아있다면
+`{CURSOR_HEADER}` header에 다음 요청의 `before` 값이 담겨 옵니다.
+""")
 async def get_messages(room_id: int,
+                       response: Response,
+                       before: Optional[int] = Query(None, description="cursor. 이전 응답의 X-Next-Cursor 값"),
+                       limit: Optional[int] = Query(None, ge=1, description="불러올 최대 메시지 수"),
                        user: UserInfoInternal = Depends(validate_user),
-                       db: Session = Depends(get_db)):
-    chats = db_get_chat_messages(db, user.id, room_id)
+                       db: Session = Depends(adb.get_db)):
+    chats = await adb.db_get_chat_messages(db, user.id, room_id, before, limit)
+    if limit is not None and len(chats) == limit:
+        response.headers[CURSOR_HEADER] = str(chats[0].id)
     return [ChatHistory(
         user_message=chat.user_chat,
         ai_message=chat.ai_chat,
@@ -115,19 +148,23 @@ async def post_message(room_id: int,
                        payload: MessageRequest = Body(...),
                        stream: bool = Query(False, description="true 시 SSE를 통한 스트리밍 응답"),
                        user: UserInfoInternal= Depends(validate_user),
-                       db: Session = Depends(get_db)):
+                       db: Session = Depends(adb.get_db),
+                       llm_db: Session = Depends(get_db)): # llm_layer는 아직 동기 Session을 사용합니다
     from llm_layer import send_message_to_ai, stream_send_message_to_ai, get_current_summary
+    from llm.session_gc import pin_session
     import llm.tools, json
     
-    room = db_get_chatroom(db, room_id)
+    room = await adb.db_get_chatroom(db, room_id)
     if not stream:
-        result = await send_message_to_ai(db, user.id, room_id, payload.content)
-        response = result["message"]
-        if not db_get_chatroom_name(db, room_id):
-            new_title = llm.tools.generate_chat_title(response)
-            db_update_chatroom_name(db, room_id, new_title)
-
-        result = db_append_chat_message(db, room_id, payload.content, response, get_current_summary(room))
+        # 응답을 만든 memory가 저장하기 전에 cache에서 내보내지지 않도록 고정
+        with pin_session(str(room_id)):
+            result = await send_message_to_ai(llm_db, user.id, room_id, payload.content)
+            response = result["message"]
+            if not await adb.db_get_chatroom_name(db, room_id):
+                new_title = llm.tools.generate_chat_title(response)
+                await adb.db_update_chatroom_name(db, room_id, new_title)
+
+            result = await adb.db_append_chat_message(db, room_id, payload.content, response, get_current_summary(llm_db, room))
         if result is None:
             raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail="failed to send message")
 
@@ -140,30 +177,32 @@ async def post_message(room_id: int,
         async def event_generator():
             full_answer = ""
             recommended = []
-            async for chunk in stream_send_message_to_ai(db, user.id, room_id, payload.content):
-                t = sse_type(chunk)
-                v = sse_content(chunk)
-                if t == SSE_MESSAGE:
-                    full_answer += cast(str, v)
-                elif t == SSE_RECOMMEND:
-                    recommended = cast(list[int], v)
+            # 응답을 만든 memory가 저장하기 전에 cache에서 내보내지지 않도록 고정
+            with pin_session(str(room_id)):
+                async for chunk in stream_send_message_to_ai(llm_db, user.id, room_id, payload.content):
+                    t = sse_type(chunk)
+                    v = sse_content(chunk)
+                    if t == SSE_MESSAGE:
+                        full_answer += cast(str, v)
+                    elif t == SSE_RECOMMEND:
+                        recommended = cast(list[int], v)
 
-                yield f"data: {json.dumps(chunk)}\n\n"
+                    yield f"data: {json.dumps(chunk)}\n\n"
 
-                # 버퍼링 방지
-                await asyncio.sleep(0)
+                    # 버퍼링 방지
+                    await asyncio.sleep(0)
 
-            if not db_get_chatroom_name(db, room_id):
-                new_title = llm.tools.generate_chat_title(full_answer)
-                if db_update_chatroom_name(db, room_id, new_title):
-                    yield f"data: {json.dumps(make_sse(SSE_ROOM_TITLE, new_title))}\n\n"
+                if not await adb.db_get_chatroom_name(db, room_id):
+                    new_title = llm.tools.generate_chat_title(full_answer)
+                    if await adb.db_update_chatroom_name(db, room_id, new_title):
+                        yield f"data: {json.dumps(make_sse(SSE_ROOM_TITLE, new_title))}\n\n"
 
-            result = db_append_chat_message(db, room_id, payload.content, full_answer, get_current_summary(room))
+                result = await adb.db_append_chat_message(db, room_id, payload.content, full_answer, get_current_summary(llm_db, room))
 
             if result is None:
                 print("something went wrong...")
             elif recommended:
-                db_add_recommended_movies(db, result.id, recommended)
+                await adb.db_add_recommended_movies(db, result.id, recommended)
             yield f"data: {json.dumps(make_sse(SSE_SIGNAL, SSE_FINISH))}\n\n"
 
         return StreamingResponse(
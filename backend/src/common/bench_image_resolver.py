@@ -0,0 +1,115 @@
+"""
+TMDB image URL 생성(TmdbImageResolver)을 예전 tmdb_full_image_path와 비교합니다.
+
+* 모든 이미지 타입, size_max -1 ~ 1499와 None에 대해 고르는 사이즈가 예전과 같은지 확인
+* 영화 N개짜리 목록 응답(Movie 변환): 예전 방식(URL마다 configuration에서 사이즈 계산) vs public_movie_infos 방식
+* poster N개를 size_max로: 예전 방식 vs `urls()`
+
+configuration은 `tmdb_get_configuration()`으로 한 번만 불러옵니다. (네트워크가 없다면 저장된 파일이나 기본값)
+
+```bash
+# pwd = backend/src
+python -m common.bench_image_resolver
+python -m common.bench_image_resolver --movies 500 --size-max 400
+```
+"""
+
+import argparse
+import time
+from datetime import datetime
+from typing import Callable, List, cast
+from api_schema import Character, Movie, Person, public_movie_info
+from common.tmdb_utils import ImgType, TmdbImageResolver, tmdb_get_configuration
+from database.internal_types import MovieInfoInternal, PersonInfoInternal
+
+def legacy_full_image_path(config: dict, path: str, type: ImgType, size_max: int|None = None, secure: bool = True) -> str:
+  """TmdbImageResolver 이전의 tmdb_full_image_path (호출마다 사이즈 목록을 정렬해서 고름)"""
+  images = config["images"]
+  base_url = cast(str, images["secure_base_url" if secure else "base_url"]).strip('/')
+  path = path.strip('/')
+
+  sizes = "original"
+  if size_max is not None:
+    def _resolution_of(s: str) -> int: return int(s[1:])
+    config_size = [i for i in images[f"{type.value}_sizes"] if i.startswith('w')]
+    for i in sorted(config_size, key=_resolution_of, reverse=True):
+      if _resolution_of(i) <= size_max:
+        sizes = i
+        break
+  return "/".join([base_url, sizes, path])
+
+def legacy_public_movie_info(config: dict, movie: MovieInfoInternal) -> Movie:
+  """TmdbImageResolver 이전의 api_schema.public_movie_info"""
+  def person(internal: PersonInfoInternal) -> Person:
+    return Person(id=internal.id, name=internal.name, profile_image=legacy_full_image_path(config, internal.profile_image_path, ImgType.PROFILE) if internal.profile_image_path else "")
+  return Movie(
+    id=movie.id,
+    title=movie.title,
+    overview=movie.tmdb_overview if movie.tmdb_overview else "[TMDB 줄거리 없음]",
+    wiki_document=movie.wiki_document if movie.wiki_document else "[WIKIPEDIA 정보 없음]",
+    release_date=str(movie.release_date) if movie.release_date else "[방영일 정보 없음]",
+    poster_img_url=legacy_full_image_path(config, movie.poster_img_url, ImgType.POSTER) if movie.poster_img_url else "",
+    trailer_img_url=legacy_full_image_path(config, movie.trailer_img_url, ImgType.STILL) if movie.trailer_img_url else "",
+    bookmarked=movie.bookmarked if movie.bookmarked is not None else False,
+    rating=movie.rating,
+    ordering=0,
+    genres=movie.genres,
+    characters=[Character(id=i.id, name=i.name, actor=person(i.actor) if i.actor else None) for i in movie.characters],
+    directors=[person(i) for i in movie.directors],
+  )
+
+def sample_movies(count: int) -> List[MovieInfoInternal]:
+  return [MovieInfoInternal(
+    id=i,
+    tmdb_id=i,
+    title=f"movie {i}",
+    tmdb_overview="overview",
+    wiki_document=None,
+    release_date=None,
+    poster_img_url=f"/poster{i}.jpg",
+    trailer_img_url=f"/still{i}.jpg",
+    last_update=datetime.now(),
+    genres=["드라마"],
+    directors=[PersonInfoInternal(id=k, name="director", profile_image_path=f"/director{k}.jpg") for k in range(2)],
+    bookmarked=True,
+  ) for i in range(count)]
+
+def check_sizes(config: dict, resolver: TmdbImageResolver) -> List[tuple]:
+  """예전 함수와 다른 URL을 만드는 (type, size_max) 목록. 비어있어야 합니다"""
+  mismatches = []
+  for type in ImgType:
+    for size_max in [*range(-1, 1500), None]:
+      if legacy_full_image_path(config, "/x.jpg", type, size_max) != resolver.url("/x.jpg", type, size_max):
+        mismatches.append((type, size_max))
+  return mismatches
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+  start = time.perf_counter()
+  for _ in range(repeat):
+    fn()
+  return (time.perf_counter() - start) / repeat * 1000
+
+def run(movie_count: int, size_max: int, repeat: int) -> dict:
+  config = tmdb_get_configuration()
+  resolver = TmdbImageResolver(config)
+  movies = sample_movies(movie_count)
+  assert [legacy_public_movie_info(config, i) for i in movies] == [public_movie_info(i, resolver) for i in movies]
+  return {
+    "mismatches": check_sizes(config, resolver),
+    "response_legacy_ms": _time(lambda: [legacy_public_movie_info(config, i) for i in movies], repeat),
+    "response_ms": _time(lambda: [public_movie_info(i, resolver) for i in movies], repeat),
+    "posters_legacy_ms": _time(lambda: [legacy_full_image_path(config, i.poster_img_url, ImgType.POSTER, size_max) for i in movies], repeat),
+    "posters_ms": _time(lambda: resolver.urls([i.poster_img_url for i in movies], ImgType.POSTER, size_max), repeat),
+  }
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="TMDB image URL 생성 비교")
+  parser.add_argument("--movies", type=int, default=500)
+  parser.add_argument("--size-max", type=int, default=400)
+  parser.add_argument("--repeat", type=int, default=50)
+  args = parser.parse_args()
+  result = run(args.movies, args.size_max, args.repeat)
+  mismatches = result["mismatches"]
+  print(f"사이즈 선택: {f'{len(mismatches)}개 다름 {mismatches[:5]}' if mismatches else '모두 동일'}")
+  print(f"영화 {args.movies}개 목록 응답: 예전 {result['response_legacy_ms']:.2f} ms, public_movie_infos {result['response_ms']:.2f} ms")
+  print(f"poster {args.movies}개 (size_max={args.size_max}): 예전 {result['posters_legacy_ms']:.2f} ms, urls() {result['posters_ms']:.2f} ms")
@@ -0,0 +1,157 @@
+"""
+TMDB 검색 + 상세 정보 요청을 가짜 TMDB 서버에 보내서, 직렬 요청과 동시 요청(AsyncTmdbClient)을 비교합니다.
+
+local에 요청마다 `--latency`초 늦게 응답하는 가짜 TMDB 서버(`/3/search/movie`, `/3/movie/{id}`)를 띄운 뒤,
+검색 결과가 N개일 때 다음 둘의 시간을 재고, 두 결과가 같은지 확인합니다.
+
+* serial: 예전 방식. tmdbsimple로 검색 후 상세 정보를 하나씩 요청
+* concurrent: `_request_movie_bulk` (AsyncTmdbClient, 최대 TMDB_MAX_CONCURRENCY개 동시 요청)
+
+API key나 네트워크 없이 동작하며, 응답 캐시(TmdbResponseCache)는 사용하지 않습니다.
+
+```bash
+# pwd = backend/src
+python -m common.bench_tmdb_fetch
+python -m common.bench_tmdb_fetch --hits 5 10 20 --latency 0.05
+```
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import tmdbsimple as tmdb
+from common.tmdb_types import TmdbRequestResult
+from common.tmdb_utils import AsyncTmdbClient, _request_movie_bulk, tmdb_parse_movie
+
+MAX_CASTS = 15
+_MOVIE_PATH = re.compile(r"^/3/movie/(\d+)$")
+
+def fake_movie_detail(id: int, title: str|None = None) -> dict:
+  """`/movie/{id}?append_to_response=credits,watch/providers,external_ids` 응답 형태의 가짜 데이터"""
+  return {
+    "id": id,
+    "title": title or f"movie {id}",
+    "overview": "overview",
+    "poster_path": f"/poster{id}.jpg",
+    "release_date": "2020-01-01",
+    "genres": [{"id": 18, "name": "드라마"}],
+    "credits": {
+      "cast": [
+        {"credit_id": f"{id}-{k}", "id": id * 100 + k, "character": f"character {k}", "name": "actor", "original_name": "actor", "profile_path": None, "order": k}
+        for k in range(3)
+      ],
+      "crew": [{"credit_id": f"{id}-d", "id": id * 100 + 99, "name": "director", "original_name": "director", "profile_path": None, "job": "Director"}],
+    },
+    "watch/providers": {"results": {}},
+    "external_ids": {"imdb_id": None, "wikidata_id": None},
+  }
+
+class FakeTmdbServer:
+  """
+  요청마다 `latency`초 늦게 응답하는 가짜 TMDB 서버.  
+  검색 결과는 `search_results`가 있다면 그 목록, 없다면 `movie {id}` `hits`개입니다.
+  상세 정보 요청 횟수는 `movie_requests`에 셉니다.
+  """
+  def __init__(self, latency: float):
+    self.latency = latency
+    self.hits = 1
+    self.search_results: list[dict]|None = None
+    self.movie_requests = 0
+    server = self
+
+    class Handler(BaseHTTPRequestHandler):
+      protocol_version = "HTTP/1.1"
+
+      def do_GET(self):
+        time.sleep(server.latency)
+        path = urlparse(self.path).path
+        found = _MOVIE_PATH.match(path)
+        if path == "/3/search/movie":
+          body = {"page": 1, "results": server.search_results or [{"id": i, "title": f"movie {i}"} for i in range(1, server.hits + 1)]}
+        elif found:
+          server.movie_requests += 1
+          id = int(found.group(1))
+          body = fake_movie_detail(id, next((i["title"] for i in server.search_results or [] if i["id"] == id), None))
+        else:
+          self.send_error(404)
+          return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+      def log_message(self, format, *args):
+        pass
+
+    self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    self._server.daemon_threads = True
+    self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}/3"
+    threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+  def close(self):
+    self._server.shutdown()
+    self._server.server_close()
+
+def serial_request(base_url: str, query: str, lang: str) -> list[TmdbRequestResult]:
+  """tmdbsimple로 검색 결과의 상세 정보를 하나씩 요청합니다 (AsyncTmdbClient 이전 방식)"""
+  search = tmdb.Search()
+  search.base_uri = base_url
+  results = []
+  for hit in search.movie(query=query)["results"]:
+    movie = tmdb.Movies(hit["id"])
+    movie.base_uri = base_url
+    response = movie.info(append_to_response="credits,watch/providers,external_ids", language=lang)
+    results.append(tmdb_parse_movie(hit["id"], response, MAX_CASTS))
+  return results
+
+async def concurrent_request(base_url: str, query: str, lang: str) -> tuple[list[TmdbRequestResult], float]:
+  """`_request_movie_bulk`의 결과와 걸린 시간(초). 서버에서는 client를 공유하므로 client 생성 시간은 제외합니다"""
+  client = AsyncTmdbClient("bench", base_url)
+  try:
+    start = time.perf_counter()
+    results = await _request_movie_bulk(client, {"search": {"query": query}, "lang": lang}, MAX_CASTS)
+    return results, time.perf_counter() - start
+  finally:
+    await client.aclose()
+
+def run(hits: list[int], latency: float) -> list[dict]:
+  if not tmdb.API_KEY:
+    tmdb.API_KEY = "bench"
+  server = FakeTmdbServer(latency)
+  report = []
+  try:
+    for count in hits:
+      server.hits = count
+      start = time.perf_counter()
+      serial = serial_request(server.base_url, "movie", "ko")
+      serial_time = time.perf_counter() - start
+
+      concurrent, concurrent_time = asyncio.run(concurrent_request(server.base_url, "movie", "ko"))
+
+      report.append({
+        "hits": count,
+        "serial_ms": serial_time * 1000,
+        "concurrent_ms": concurrent_time * 1000,
+        "identical": [i.model_dump() for i in serial] == [i.model_dump() for i in concurrent],
+      })
+  finally:
+    server.close()
+  return report
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="TMDB 직렬 요청과 동시 요청 비교 (가짜 서버 사용)")
+  parser.add_argument("--hits", type=int, nargs="+", default=[5, 10, 20], help="검색 결과 개수들")
+  parser.add_argument("--latency", type=float, default=0.05, help="가짜 서버의 요청당 지연 시간 (초)")
+  args = parser.parse_args()
+  for result in run(args.hits, args.latency):
+    print(
+      f"검색 결과 {result['hits']:>3}개: serial {result['serial_ms']:>6.0f} ms, concurrent {result['concurrent_ms']:>6.0f} ms, "
+      f"결과 {'동일' if result['identical'] else '다름'}"
+    )
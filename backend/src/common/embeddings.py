@@ -0,0 +1,138 @@
+"""
+모든 vector store(database/chroma.py, llm/qachat.py, llm/characterchat.py)가 같이 쓰는 embedding 모델입니다.
+
+같은 모델로 같은 텍스트를 다시 embedding하지 않도록, 결과를 SQLite 파일에 저장해두고 재사용합니다.
+key는 `sha256(모델 이름 + 텍스트)`이므로 어느 채팅방/모듈에서 만든 embedding이든 공유됩니다.
+
+```python
+from common.embeddings import shared_embeddings
+Chroma(..., embedding_function=shared_embeddings())
+```
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from common.env import ENV_BACKEND_ROOT
+
+EMBEDDING_CACHE_PATH = f"{ENV_BACKEND_ROOT}/src/common/embedding_cache.db"
+# text-embedding-ada-002 기준 한 개에 약 6KB
+EMBEDDING_CACHE_MAX_ENTRIES = 50000
+# embedding 몇 개를 저장할 때마다 개수를 확인하고 오래된 것을 지울지
+EMBEDDING_CACHE_EVICT_INTERVAL = 500
+
+def embedding_key(model: str, text: str) -> str:
+  return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+class CachedEmbeddings(Embeddings):
+  """
+  `Embeddings`를 감싸서 결과를 SQLite에 캐싱합니다.
+  * 여러 텍스트를 한 번에 조회하고, 없는 것만 모아서 한 번에 embedding 요청
+  * `max_entries`개를 넘으면 가장 오래 사용되지 않은 것부터 삭제 (`evict_interval`개 저장할 때마다 확인하므로 잠깐 넘을 수 있음)
+  * hit/miss/eviction 횟수는 process별로 기록됩니다 (`stats()`)
+  """
+  def __init__(self, embeddings: Embeddings, model: str, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, evict_interval: int = EMBEDDING_CACHE_EVICT_INTERVAL):
+    self.embeddings = embeddings
+    self.model = model
+    self.max_entries = max_entries
+    self.evict_interval = evict_interval
+    self._stored = 0  # 마지막으로 개수를 확인한 뒤 저장한 embedding 수
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute("PRAGMA synchronous=NORMAL")
+    self._conn.execute(
+      "CREATE TABLE IF NOT EXISTS embeddings ("
+      "key TEXT PRIMARY KEY, vector BLOB NOT NULL, used_at REAL NOT NULL)"
+    )
+    self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_used_at ON embeddings (used_at)")
+
+  def _lookup(self, keys: List[str]) -> dict[str, List[float]]:
+    found: dict[str, List[float]] = {}
+    unique = list(dict.fromkeys(keys))
+    # SQLite 변수 개수 제한 때문에 나눠서 조회
+    for start in range(0, len(unique), 500):
+      chunk = unique[start:start + 500]
+      rows = self._conn.execute(
+        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+      ).fetchall()
+      for key, blob in rows:
+        vector = array("f")
+        vector.frombytes(blob)
+        found[key] = vector.tolist()
+    if found:
+      now = time.time()
+      self._conn.executemany("UPDATE embeddings SET used_at = ? WHERE key = ?", [(now, key) for key in found])
+    return found
+
+  def _store(self, vectors: dict[str, List[float]]):
+    now = time.time()
+    self._conn.executemany(
+      "INSERT OR REPLACE INTO embeddings (key, vector, used_at) VALUES (?, ?, ?)",
+      [(key, array("f", vector).tobytes(), now) for key, vector in vectors.items()]
+    )
+    # 개수 확인(count(*))은 table 전체를 훑으므로 저장할 때마다 하지 않음
+    self._stored += len(vectors)
+    if self._stored < self.evict_interval:
+      return
+    self._stored = 0
+    (count,) = self._conn.execute("SELECT count(*) FROM embeddings").fetchone()
+    if count > self.max_entries:
+      self.evictions += self._conn.execute(
+        "DELETE FROM embeddings WHERE key IN "
+        "(SELECT key FROM embeddings ORDER BY used_at LIMIT ?)", (count - self.max_entries,)
+      ).rowcount
+
+  def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    keys = [embedding_key(self.model, text) for text in texts]
+    with self._lock:
+      found = self._lookup(keys)
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    with self._lock:
+      self.hits += len(texts) - sum(1 for key in keys if key in missing)
+      self.misses += len(missing)
+
+    if missing:
+      vectors = self.embeddings.embed_documents(list(missing.values()))
+      new = dict(zip(missing.keys(), vectors))
+      with self._lock:
+        self._store(new)
+      found.update(new)
+    return [found[key] for key in keys]
+
+  def embed_query(self, text: str) -> List[float]:
+    return self.embed_documents([text])[0]
+
+  def stats(self) -> dict:
+    """hit, miss, eviction 횟수와 적중률, 현재 크기를 반환합니다"""
+    with self._lock:
+      (size,) = self._conn.execute("SELECT count(*) FROM embeddings").fetchone()
+      total = self.hits + self.misses
+      return {
+        "hits": self.hits,
+        "misses": self.misses,
+        "hit_rate": self.hits / total if total else 0.0,
+        "evictions": self.evictions,
+        "size": size,
+        "max_entries": self.max_entries,
+      }
+
+_shared_embeddings: Optional[CachedEmbeddings] = None
+_shared_embeddings_lock = threading.Lock()
+
+def shared_embeddings() -> CachedEmbeddings:
+  """process에서 공유하는 OpenAI embedding 모델 (캐시 포함)"""
+  global _shared_embeddings
+  with _shared_embeddings_lock:
+    if _shared_embeddings is None:
+      from langchain_openai import OpenAIEmbeddings
+      openai = OpenAIEmbeddings()
+      _shared_embeddings = CachedEmbeddings(openai, openai.model)
+    return _shared_embeddings
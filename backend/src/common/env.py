@@ -1,4 +1,5 @@
 import os
+import secrets
 from dotenv import load_dotenv
 
 assert(load_dotenv())
@@ -6,6 +7,14 @@ ENV_BACKEND_ROOT=os.getenv("BACKEND_ROOT")
 ENV_OPENAI_API_KEY=os.getenv("OPENAI_API_KEY")
 ENV_OPENROUTER_KEY=os.getenv("OPEN_ROUTER_KEY")
 ENV_TMDB_API_KEY=os.getenv("TMDB_API_KEY")
+ENV_DB_PROFILE=os.getenv("DB_PROFILE") or "dev"
+ENV_TMDB_CACHE_TTL=float(os.getenv("TMDB_CACHE_TTL") or 60 * 60 * 24)
+ENV_MOVIE_STALE_DAYS=float(os.getenv("MOVIE_STALE_DAYS") or 7)
+ENV_MOVIE_REFRESH_INTERVAL=float(os.getenv("MOVIE_REFRESH_INTERVAL") or 60)
+ENV_SESSION_IDLE_DAYS=float(os.getenv("SESSION_IDLE_DAYS") or 30)
+ENV_SESSION_GC_INTERVAL=float(os.getenv("SESSION_GC_INTERVAL") or 60 * 60)
+# 설정하지 않으면 process마다 새로 만들어지므로, 재시작하거나 worker가 여러 개라면 반드시 설정해야 함
+ENV_SESSION_SECRET=os.getenv("SESSION_SECRET") or secrets.token_urlsafe(32)
 assert(ENV_BACKEND_ROOT)
 assert(ENV_OPENAI_API_KEY)
 assert(ENV_OPENROUTER_KEY)
@@ -1,13 +1,31 @@
+import asyncio
+import concurrent.futures
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import httpx
 import tmdbsimple as tmdb
 from datetime import date
 from enum import Enum
 from urllib.parse import urljoin
-from typing import cast
+from rapidfuzz import fuzz
+from typing import Any, Callable, Coroutine, Iterable, TypeVar, cast
 
 from common.tmdb_types import *
-from common.env import ENV_TMDB_API_KEY
+from common.env import ENV_TMDB_API_KEY, ENV_BACKEND_ROOT, ENV_TMDB_CACHE_TTL
+from database.title_index import normalize_title, title_numbers
 
 tmdb.API_KEY = ENV_TMDB_API_KEY
+TMDB_API_BASE_URL = "https://api.themoviedb.org/3"
+TMDB_MAX_CONCURRENCY = 8
+TMDB_CACHE_PATH = f"{ENV_BACKEND_ROOT}/src/common/tmdb_cache.db"
+TMDB_CACHE_MAX_ENTRIES = 20000
+TMDB_CACHE_EVICT_INTERVAL = 100 # put 몇 번마다 만료/초과된 응답을 지울지
+
+_R = TypeVar("_R")
 
 class ImgType(Enum):
   LOGO="logo"
@@ -16,14 +34,126 @@ class ImgType(Enum):
   STILL="still"
   BACKDROP="backdrop"
 
-_cached_tmbd_configuration: dict|None = None
+# TMDB 권장: configuration은 며칠에 한 번씩만 갱신
+TMDB_CONFIGURATION_PATH = f"{ENV_BACKEND_ROOT}/src/common/tmdb_configuration.json"
+TMDB_CONFIGURATION_REFRESH = 60 * 60 * 24 * 3
+
+# 네트워크도, 저장된 파일도 없을 때 사용하는 configuration (TMDB 문서 기준)
+_DEFAULT_TMDB_CONFIGURATION = {
+  "images": {
+    "base_url": "http://image.tmdb.org/t/p/",
+    "secure_base_url": "https://image.tmdb.org/t/p/",
+    "backdrop_sizes": ["w300", "w780", "w1280", "original"],
+    "logo_sizes": ["w45", "w92", "w154", "w185", "w300", "w500", "original"],
+    "poster_sizes": ["w92", "w154", "w185", "w342", "w500", "w780", "original"],
+    "profile_sizes": ["w45", "w185", "h632", "original"],
+    "still_sizes": ["w92", "w185", "w300", "original"],
+  }
+}
+
+def _load_saved_configuration() -> tuple[dict, float]|None:
+  try:
+    with open(TMDB_CONFIGURATION_PATH, encoding="utf-8") as f:
+      return json.load(f), os.path.getmtime(TMDB_CONFIGURATION_PATH)
+  except (OSError, ValueError):
+    return None
+
+def _save_configuration(config: dict):
+  # 다른 worker가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체
+  tmp = f"{TMDB_CONFIGURATION_PATH}.{os.getpid()}.tmp"
+  with open(tmp, "w", encoding="utf-8") as f:
+    json.dump(config, f)
+  os.replace(tmp, TMDB_CONFIGURATION_PATH)
+
+def tmdb_get_configuration(force_refresh: bool = False) -> dict:
+  """
+  TMDB configuration을 불러옵니다.  
+  `TMDB_CONFIGURATION_PATH`에 저장된 것이 `TMDB_CONFIGURATION_REFRESH`초보다 오래되었을 때만 TMDB에 요청하며,
+  요청에 실패하면 저장된 것(없다면 기본값)을 사용합니다.
+  """
+  saved = _load_saved_configuration()
+  if saved is not None and not force_refresh and time.time() - saved[1] < TMDB_CONFIGURATION_REFRESH:
+    return saved[0]
+
+  try:
+    config = tmdb.Configuration().info()
+    _save_configuration(config)
+    return config
+  except Exception as e:
+    print(f"[tmdb_get_configuration] TMDB configuration을 불러오지 못함: {e}")
+    return saved[0] if saved is not None else _DEFAULT_TMDB_CONFIGURATION
+
+class TmdbImageResolver:
+  """
+  TMDB image path를 full URL로 바꿔줍니다.  
+  configuration에서 base URL과 이미지 타입별 사이즈 표를 미리 만들어두므로,
+  `size_max`가 주어져도 사이즈 선택은 O(1)입니다.
+  """
+  def __init__(self, config: dict):
+    images = config["images"]
+    self.built_at = time.monotonic()
+    self._base_urls = {
+      True: cast(str, images["secure_base_url"]).strip('/'),
+      False: cast(str, images["base_url"]).strip('/'),
+    }
+    # type -> (width -> 그 width 이하 중 가장 큰 사이즈), 가장 큰 width
+    self._size_tables: dict[ImgType, tuple[list[str], int]] = {}
+    for type in ImgType:
+      widths = sorted(int(i[1:]) for i in images.get(f"{type.value}_sizes", []) if i.startswith('w'))
+      table = ["original"] * (widths[-1] + 1 if widths else 0)
+      for width, next_width in zip(widths, widths[1:] + [len(table)]):
+        table[width:next_width] = [f"w{width}"] * (next_width - width)
+      self._size_tables[type] = (table, len(table) - 1)
+
+  def size_of(self, type: ImgType, size_max: int|None) -> str:
+    """width가 size_max 이하인 가장 큰 사이즈 (없거나 size_max가 None이면 original)"""
+    if size_max is None or size_max < 0:
+      return "original"
+    table, largest = self._size_tables[type]
+    return table[min(size_max, largest)] if table else "original"
 
-def tmdb_get_configuration() -> dict|None:
-  """TMDB configuration을 불러옵니다"""
-  global _cached_tmbd_configuration
-  if _cached_tmbd_configuration is None:
-    _cached_tmbd_configuration = tmdb.Configuration().info()
-  return _cached_tmbd_configuration
+  def url(self, path: str|None, type: ImgType, size_max: int|None = None, secure: bool = True) -> str:
+    """path가 비어있다면 빈 문자열을 반환합니다"""
+    if not path:
+      return ""
+    return f"{self._base_urls[secure]}/{self.size_of(type, size_max)}/{path.strip('/')}"
+
+  def urls(self, paths: Iterable[str|None], type: ImgType, size_max: int|None = None, secure: bool = True) -> List[str]:
+    """여러 path를 한 번에 변환합니다. (list 응답용)"""
+    prefix = f"{self._base_urls[secure]}/{self.size_of(type, size_max)}/"
+    return [prefix + path.strip('/') if path else "" for path in paths]
+
+_tmdb_image_resolver: TmdbImageResolver|None = None
+_tmdb_image_resolver_lock = threading.Lock()
+_tmdb_image_resolver_refreshing = False
+
+def _refresh_image_resolver():
+  global _tmdb_image_resolver, _tmdb_image_resolver_refreshing
+  try:
+    _tmdb_image_resolver = TmdbImageResolver(tmdb_get_configuration())
+  finally:
+    _tmdb_image_resolver_refreshing = False
+
+def tmdb_image_resolver() -> TmdbImageResolver:
+  """
+  process에서 공유하는 TmdbImageResolver를 반환합니다.  
+  만들어진 지 `TMDB_CONFIGURATION_REFRESH`초가 지났다면 기존 것을 반환하면서 background에서 다시 만듭니다.
+  처음 호출할 때는 configuration을 불러오느라 block될 수 있으므로, main.py의 lifespan에서 미리 한 번 호출합니다.
+  """
+  global _tmdb_image_resolver_refreshing
+  resolver = _tmdb_image_resolver
+  if resolver is None:
+    with _tmdb_image_resolver_lock:
+      if _tmdb_image_resolver is None:
+        _refresh_image_resolver()
+      return cast(TmdbImageResolver, _tmdb_image_resolver)
+
+  if time.monotonic() - resolver.built_at > TMDB_CONFIGURATION_REFRESH:
+    with _tmdb_image_resolver_lock:
+      if not _tmdb_image_resolver_refreshing:
+        _tmdb_image_resolver_refreshing = True
+        threading.Thread(target=_refresh_image_resolver, name="tmdb-configuration", daemon=True).start()
+  return resolver
 
 # TMDB에서는 주요인물만 가져올 수 있는 방법이 딱히 없기 때문에 order 상위 N명으로 추려냅니다
 def tmdb_parse_casts(credits: dict, max_ordering: int) -> List[ActorInfo]:
@@ -51,7 +181,6 @@ def tmdb_parse_directors(credits: dict) -> List[DirectorInfo]:
 def tmdb_parse_platforms(kr_providers: dict) -> List[PlatformInfo]:
   if kr_providers is None:
     return []
-  print(kr_providers)
   tmp = kr_providers.get("flatrate")
   if tmp is None:
     tmp = kr_providers.get("free") # 여기 실제론 TMDB API 문서와 다르게 반환하는 요소가 있는 것 같음
@@ -64,17 +193,188 @@ def tmdb_parse_platforms(kr_providers: dict) -> List[PlatformInfo]:
     logo_path = i["logo_path"],
   ) for i in tmp]
 
-def tmdb_request_movie_bulk(identifier: TmdbSearchOpt, max_casts: int= 15) -> List[TmdbRequestResult]:
+class TmdbResponseCache:
   """
-  TMDB에서 영화를 찾습니다.  
-  Args:
-    identifier:
-      * ID로 찾고 싶다면 `movie_id`에 id값 세팅
-      * query로 찾고 싶다면: `search`에 dictionary 형태로 `query`, `page` 등의 값 세팅  
-        참고: https://developer.themoviedb.org/reference/search-movie
-  Returns:
-    TMDB에서 찾은 영화 정보들을 모두 반환합니다
+  TMDB API 응답(JSON)을 SQLite 파일에 저장하는 캐시입니다.  
+  WAL 모드를 사용하므로 여러 worker process가 같은 파일을 동시에 읽고 쓸 수 있습니다.
+  * 저장 후 `ttl`초가 지난 응답은 사용하지 않습니다
+  * `max_entries`개를 넘으면 가장 먼저 만료될 응답부터 지웁니다 (put `evict_interval`번마다 확인하므로 잠깐 넘을 수 있음)
+  * hit/miss/eviction 횟수는 process별로 기록됩니다 (`stats()`)
   """
+  def __init__(self, path: str = TMDB_CACHE_PATH, ttl: float = ENV_TMDB_CACHE_TTL, max_entries: int = TMDB_CACHE_MAX_ENTRIES, evict_interval: int = TMDB_CACHE_EVICT_INTERVAL):
+    self.ttl = ttl
+    self.max_entries = max_entries
+    self.evict_interval = evict_interval
+    self._puts = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute("PRAGMA synchronous=NORMAL")
+    self._conn.execute(
+      "CREATE TABLE IF NOT EXISTS tmdb_responses ("
+      "key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+    )
+    self._conn.execute("CREATE INDEX IF NOT EXISTS ix_tmdb_responses_expires_at ON tmdb_responses (expires_at)")
+
+  @staticmethod
+  def movie_key(id: int, lang: str) -> str:
+    return f"movie:{id}:{lang}"
+
+  @staticmethod
+  def search_key(search: dict, lang: str) -> str:
+    return f"search:{lang}:{json.dumps(search, sort_keys=True, ensure_ascii=False)}"
+
+  def get(self, key: str) -> dict|None:
+    with self._lock:
+      row = self._conn.execute(
+        "SELECT payload FROM tmdb_responses WHERE key = ? AND expires_at > ?", (key, time.time())
+      ).fetchone()
+      if row is None:
+        self.misses += 1
+        return None
+      self.hits += 1
+    return json.loads(row[0])
+
+  def put(self, key: str, payload: dict):
+    now = time.time()
+    with self._lock:
+      self._conn.execute(
+        "INSERT INTO tmdb_responses (key, payload, expires_at) VALUES (?, ?, ?) "
+        "ON CONFLICT (key) DO UPDATE SET payload = excluded.payload, expires_at = excluded.expires_at",
+        (key, json.dumps(payload, ensure_ascii=False), now + self.ttl)
+      )
+      # 만료된 응답은 get에서 걸러지므로, 개수 확인(count(*))은 가끔만 함
+      self._puts += 1
+      if self._puts % self.evict_interval == 0:
+        self._evict(now)
+
+  def _evict(self, now: float):
+    evicted = self._conn.execute("DELETE FROM tmdb_responses WHERE expires_at <= ?", (now,)).rowcount
+    (count,) = self._conn.execute("SELECT count(*) FROM tmdb_responses").fetchone()
+    if count > self.max_entries:
+      evicted += self._conn.execute(
+        "DELETE FROM tmdb_responses WHERE key IN "
+        "(SELECT key FROM tmdb_responses ORDER BY expires_at LIMIT ?)", (count - self.max_entries,)
+      ).rowcount
+    self.evictions += evicted
+
+  def clear(self):
+    with self._lock:
+      self._conn.execute("DELETE FROM tmdb_responses")
+
+  def stats(self) -> dict:
+    """hit, miss, eviction 횟수와 적중률, 현재 크기를 반환합니다"""
+    with self._lock:
+      (size,) = self._conn.execute("SELECT count(*) FROM tmdb_responses").fetchone()
+      total = self.hits + self.misses
+      return {
+        "hits": self.hits,
+        "misses": self.misses,
+        "hit_rate": self.hits / total if total else 0.0,
+        "evictions": self.evictions,
+        "size": size,
+        "max_entries": self.max_entries,
+      }
+
+class AsyncTmdbClient:
+  """
+  connection pool을 공유하는 async TMDB API client입니다.  
+  동시에 나가는 요청 수는 `max_concurrency`개로 제한됩니다.
+  """
+  def __init__(self, api_key: str, base_url: str = TMDB_API_BASE_URL, max_concurrency: int = TMDB_MAX_CONCURRENCY, timeout: float = 10.0, cache: TmdbResponseCache|None = None):
+    self.api_key = api_key
+    self.cache = cache
+    self._client = httpx.AsyncClient(
+      base_url=base_url,
+      timeout=timeout,
+      limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    )
+    self._semaphore = asyncio.Semaphore(max_concurrency)
+
+  async def get(self, path: str, **params) -> dict:
+    params["api_key"] = self.api_key
+    async with self._semaphore:
+      response = await self._client.get(path, params=params)
+    response.raise_for_status()
+    return response.json()
+
+  async def _cached_get(self, key: str, path: str, **params) -> dict:
+    if self.cache is not None:
+      cached = self.cache.get(key)
+      if cached is not None:
+        return cached
+    response = await self.get(path, **params)
+    if self.cache is not None:
+      self.cache.put(key, response)
+    return response
+
+  async def search_movie_hits(self, lang: str, **search) -> List[dict]:
+    """검색 결과(`results`)를 그대로 반환합니다"""
+    response = await self._cached_get(TmdbResponseCache.search_key(search, lang), "/search/movie", **search)
+    return response["results"]
+
+  async def search_movie(self, lang: str, **search) -> List[int]:
+    """검색 결과 영화들의 TMDB ID를 반환합니다"""
+    return [movie["id"] for movie in await self.search_movie_hits(lang, **search)]
+
+  async def movie(self, id: int, lang: str, max_casts: int) -> TmdbRequestResult:
+    response = await self._cached_get(
+      TmdbResponseCache.movie_key(id, lang), f"/movie/{id}",
+      append_to_response="credits,watch/providers,external_ids", language=lang
+    )
+    return tmdb_parse_movie(id, response, max_casts)
+
+  async def movies(self, ids: List[int], lang: str, max_casts: int) -> List[TmdbRequestResult]:
+    """영화들의 상세 정보를 동시에 요청합니다. 결과는 ids 순서대로이며, 요청에 실패한 영화는 빠집니다"""
+    results = await asyncio.gather(*(self.movie(id, lang, max_casts) for id in ids), return_exceptions=True)
+    movies = []
+    for id, result in zip(ids, results):
+      if isinstance(result, BaseException):
+        print(f"[AsyncTmdbClient] 영화 {id} 정보를 불러오지 못함: {result!r}")
+      else:
+        movies.append(result)
+    return movies
+
+  async def aclose(self):
+    await self._client.aclose()
+
+_tmdb_response_cache: TmdbResponseCache|None = None
+_tmdb_cache_lock = threading.Lock()
+
+def tmdb_response_cache() -> TmdbResponseCache:
+  """process에서 공유하는 TMDB 응답 캐시 (통계는 `tmdb_response_cache().stats()`)"""
+  global _tmdb_response_cache
+  with _tmdb_cache_lock:
+    if _tmdb_response_cache is None:
+      _tmdb_response_cache = TmdbResponseCache(TMDB_CACHE_PATH)
+    return _tmdb_response_cache
+
+# 동기 코드(db_*, llm_layer)에서도 같은 connection pool을 쓸 수 있도록
+# TMDB client는 전용 event loop thread 하나에서만 동작합니다.
+_tmdb_loop: asyncio.AbstractEventLoop|None = None
+_tmdb_client: AsyncTmdbClient|None = None
+_tmdb_lock = threading.Lock()
+
+def _get_tmdb_loop() -> asyncio.AbstractEventLoop:
+  global _tmdb_loop, _tmdb_client
+  with _tmdb_lock:
+    if _tmdb_loop is None:
+      loop = asyncio.new_event_loop()
+      threading.Thread(target=loop.run_forever, name="tmdb-client", daemon=True).start()
+      cache = tmdb_response_cache()
+      async def _make_client(): return AsyncTmdbClient(cast(str, ENV_TMDB_API_KEY), TMDB_API_BASE_URL, cache=cache)
+      _tmdb_client = asyncio.run_coroutine_threadsafe(_make_client(), loop).result()
+      _tmdb_loop = loop
+    return _tmdb_loop
+
+def _run_on_tmdb_loop(coro_fn: Callable[[AsyncTmdbClient], Coroutine[Any, Any, _R]]) -> concurrent.futures.Future[_R]:
+  loop = _get_tmdb_loop()
+  return asyncio.run_coroutine_threadsafe(coro_fn(cast(AsyncTmdbClient, _tmdb_client)), loop)
+
+async def _request_movie_bulk(client: AsyncTmdbClient, identifier: TmdbSearchOpt, max_casts: int) -> List[TmdbRequestResult]:
   id = identifier.get("movie_id")
   search = identifier.get("search")
   lang = identifier.get("lang")
@@ -85,39 +385,100 @@ def tmdb_request_movie_bulk(identifier: TmdbSearchOpt, max_casts: int= 15) -> Li
   if id is not None:
     ids = [id]
   elif search and search["query"]:
-    tmdb.Search().movie()
-    movies = tmdb.Search().movie(**search)["results"]
-    ids = [movie["id"] for movie in movies]
+    ids = await client.search_movie(lang, **{"language": lang, **search})
   else:
     return []
 
-  movie_data: List[TmdbRequestResult] = []
-  for id in ids:
-    movie = tmdb.Movies(id)
-
-    response = movie.info(append_to_response="credits,watch/providers,external_ids", language=lang)
-    credits = response["credits"]
-    kr_providers = response["watch/providers"]["results"].get('KR')
-    externals = response["external_ids"]
-
-    data = TmdbRequestResult(
-      id = id,
-      title = response["title"],
-      overview = response["overview"],
-      poster_path = response["poster_path"],
-      release_date = tmdb_parse_release_date(response),
-      genres = tmdb_parse_genres(response),
-      casts = tmdb_parse_casts(credits, max_casts),
-      directors = tmdb_parse_directors(credits),
-      platforms = tmdb_parse_platforms(kr_providers),
-      external_ids = ExternalIdInfo(
-        imdb = externals.get("imdb_id"),
-        wikidata = externals.get("wikidata_id")
-      )
-    )
-    movie_data.append(data)
+  return await client.movies(ids, lang, max_casts)
+
+def _title_similarity(query: str, title: str) -> float:
+  """
+  database.title_index와 같은 기준(정규화, RapidFuzz ratio)으로 계산한 제목 유사도 0 ~ 1.
+  제목의 숫자(속편 번호)가 다르면 다른 영화이므로 0입니다.
+  """
+  if title_numbers(query) != title_numbers(title):
+    return 0.0
+  return fuzz.ratio(normalize_title(query), normalize_title(title)) / 100
+
+def tmdb_score_search_hit(hit: dict, query: str, year: str|None = None) -> float:
+  """
+  검색 결과 하나의 점수를 검색 응답만으로 계산합니다. (높을수록 찾는 영화일 가능성이 높음)
+  * 제목 유사도 (title, original_title 중 높은 쪽): 0 ~ 1
+  * 개봉 연도 일치: +0.3
+  * 인기도: 0 ~ 0.2 (log scale)
+  """
+  similarity = max(
+    (_title_similarity(query, i) for i in (hit.get("title"), hit.get("original_title")) if i),
+    default=0.0
+  )
+  year_bonus = 0.3 if year and (hit.get("release_date") or "").startswith(year) else 0.0
+  popularity = min(math.log1p(hit.get("popularity") or 0.0) / math.log1p(1000), 1.0) * 0.2
+  return similarity + year_bonus + popularity
+
+async def _search_movies(client: AsyncTmdbClient, search: TmdbSearchMovieArgs, lang: str) -> List[dict]:
+  return await client.search_movie_hits(lang, **{"language": lang, **search})
+
+def tmdb_search_movies(search: TmdbSearchMovieArgs, lang: str = "ko", top_k: int|None = None) -> List[dict]:
+  """
+  TMDB에서 영화를 검색하고, 상세 정보 요청 없이 검색 응답만으로 순위를 매겨 반환합니다.  
+  `search["primary_release_year"]`가 연도라면 순위에도 반영합니다.
+  Returns:
+    점수가 높은 순서대로 최대 top_k개의 검색 결과 (`id`, `title`, `release_date`, `popularity` 등)
+  """
+  if not search.get("query"):
+    return []
+  hits = _run_on_tmdb_loop(lambda client: _search_movies(client, search, lang)).result()
+  year = str(search.get("primary_release_year") or "").strip()
+  year = year if year.isdigit() else None
+  ranked = sorted(hits, key=lambda hit: tmdb_score_search_hit(hit, search["query"], year), reverse=True)
+  return ranked[:top_k] if top_k is not None else ranked
+
+def tmdb_request_movie_bulk(identifier: TmdbSearchOpt, max_casts: int= 15) -> List[TmdbRequestResult]:
+  """
+  TMDB에서 영화를 찾습니다.  
+  검색 결과 영화들의 상세 정보는 동시에 요청합니다.
+  Args:
+    identifier:
+      * ID로 찾고 싶다면 `movie_id`에 id값 세팅
+      * query로 찾고 싶다면: `search`에 dictionary 형태로 `query`, `page` 등의 값 세팅  
+        참고: https://developer.themoviedb.org/reference/search-movie
+  Returns:
+    TMDB에서 찾은 영화 정보들을 모두 반환합니다
+  """
+  return _run_on_tmdb_loop(lambda client: _request_movie_bulk(client, identifier, max_casts)).result()
 
-  return movie_data
+async def _request_movies(client: AsyncTmdbClient, ids: List[int], lang: str, max_casts: int) -> List[TmdbRequestResult|None]:
+  results = await asyncio.gather(*(client.movie(id, lang, max_casts) for id in ids), return_exceptions=True)
+  return [None if isinstance(i, BaseException) else i for i in results]
+
+def tmdb_request_movies(ids: List[int], lang: str = "ko", max_casts: int = 15) -> List[TmdbRequestResult|None]:
+  """
+  여러 영화의 상세 정보를 동시에 요청합니다. (대량 import용)  
+  결과는 ids 순서대로이며, 요청에 실패한(삭제된 영화 등) 자리는 None입니다.
+  """
+  return _run_on_tmdb_loop(lambda client: _request_movies(client, ids, lang, max_casts)).result()
+
+def tmdb_parse_movie(id: int, response: dict, max_casts: int) -> TmdbRequestResult:
+  """`/movie/{id}?append_to_response=credits,watch/providers,external_ids` 응답을 변환합니다"""
+  credits = response["credits"]
+  kr_providers = response["watch/providers"]["results"].get('KR')
+  externals = response["external_ids"]
+
+  return TmdbRequestResult(
+    id = id,
+    title = response["title"],
+    overview = response["overview"],
+    poster_path = response["poster_path"],
+    release_date = tmdb_parse_release_date(response),
+    genres = tmdb_parse_genres(response),
+    casts = tmdb_parse_casts(credits, max_casts),
+    directors = tmdb_parse_directors(credits),
+    platforms = tmdb_parse_platforms(kr_providers),
+    external_ids = ExternalIdInfo(
+      imdb = externals.get("imdb_id"),
+      wikidata = externals.get("wikidata_id")
+    )
+  )
 
 
 def tmdb_full_image_path(path: str, type: ImgType, size_max: int|None=None, secure=True):
@@ -146,30 +507,7 @@ def tmdb_full_image_path(path: str, type: ImgType, size_max: int|None=None, secu
   Returns:
     img src태그에 바로 사용할 수 있는 링크가 반환됩니다.
   """
-  config = tmdb_get_configuration()
-  assert(config is not None)
-  config = config["images"]
-
-  base_url: str= config["secure_base_url" if secure else "base_url"]
-  base_url = cast(str, base_url.strip('/'))
-  path = path.strip('/')
-  
-  sizes = "original"
-
-  if size_max is not None:
-    def _resolution_of(s: str) -> int: return int(s[1:])
-
-    config_size: list[str] = config[f"{type.value}_sizes"]
-    config_size = [i for i in config_size if i.startswith('w')]
-
-    config_size = sorted(config_size, key=_resolution_of, reverse=True)
-
-    for i in config_size:
-      if _resolution_of(i) <= size_max:
-        sizes = i
-        break
-
-  return "/".join([base_url, sizes, path])
+  return tmdb_image_resolver().url(path, type, size_max, secure)
 
 # added NULL safety
 def tmdb_parse_title(info: dict) -> str|None:
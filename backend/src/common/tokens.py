@@ -0,0 +1,39 @@
+"""
+prompt/embedding에 들어가는 텍스트의 token 수를 셉니다.
+
+tiktoken encoding 파일을 불러올 수 없는 환경(네트워크 없음 등)에서는
+한글은 글자당 1 token, 그 외는 4글자당 1 token으로 어림합니다.
+"""
+
+import re
+import threading
+from functools import lru_cache
+from typing import Optional
+
+# gpt-4o (prompt)
+PROMPT_ENCODING = "o200k_base"
+# text-embedding-ada-002 (embedding)
+EMBEDDING_ENCODING = "cl100k_base"
+
+_HANGUL = re.compile(r"[가-힣]")
+_encoding_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+  with _encoding_lock:
+    try:
+      import tiktoken
+      return tiktoken.get_encoding(name)
+    except Exception as e:
+      print(f"[tokens] tiktoken encoding({name})을 불러오지 못해 token 수를 어림합니다: {type(e).__name__}")
+      return None
+
+def estimate_tokens(text: str) -> int:
+  hangul = len(_HANGUL.findall(text))
+  return hangul + (len(text) - hangul + 3) // 4
+
+def count_tokens(text: str, encoding: Optional[str] = PROMPT_ENCODING) -> int:
+  enc = _encoding(encoding) if encoding else None
+  if enc is None:
+    return estimate_tokens(text)
+  return len(enc.encode(text, disallowed_special=()))
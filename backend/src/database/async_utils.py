@@ -0,0 +1,102 @@
+"""
+database.utils의 db_* 함수들을 worker thread에서 실행하고 `await`할 수 있도록 감싼 모듈입니다.
+
+FastAPI route는 event loop 위에서 실행되기 때문에, 동기 Session으로 쿼리를 날리면
+그 동안 같은 worker의 다른 요청(SSE 스트리밍 등)이 모두 멈춥니다.
+route에서는 이 모듈의 함수들을 `await`해서 사용해주세요.
+
+```python
+import database.async_utils as adb
+
+@router.get("")
+async def handler(user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
+    rooms = await adb.db_get_user_chatrooms(db, user.id)
+```
+
+각 함수의 인자와 반환값은 database.utils의 같은 이름의 함수와 동일합니다.
+쿼리 로직은 database.utils에 하나만 유지하고, 여기서는 worker thread에서 실행하도록 감싸기만 합니다.
+SQL뿐 아니라 ORM 객체 변환, model_validate까지 모두 worker thread에서 실행되므로 event loop는 기다리기만 합니다.
+(TMDB 등 네트워크 요청이 섞여 있는 함수는 감싸지 않습니다)
+
+worker thread는 DB_THREAD_COUNT개로 제한합니다. hydration은 대부분 GIL을 잡고 도는 Python 코드라서
+thread를 늘려도 빨라지지 않고, event loop가 GIL을 다시 잡기까지 기다리는 시간(SSE stall)만 길어집니다.
+
+`get_db`의 Session은 한 요청 안에서 `await`로 차례대로만 사용해야 합니다. (asyncio.gather 등으로 동시에 쓰지 마세요)
+영화 목록처럼 응답이 큰 route는 `await adb.to_thread(...)`로 Pydantic 변환도 같은 worker thread에서 해주세요.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Concatenate, ParamSpec, TypeVar
+from sqlalchemy.orm import Session
+import database.models as m
+import database.utils as u
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+DB_THREAD_COUNT = 2
+_executor = ThreadPoolExecutor(max_workers=DB_THREAD_COUNT, thread_name_prefix="db")
+
+def get_db():
+  """
+  route용 DB Session을 불러옴  
+  동기 generator이므로 FastAPI가 Session을 열고 닫는 것도 threadpool에서 실행합니다.
+  (database.utils.get_db와 다른 함수이므로, 같은 route에서 둘 다 Depends해도 Session을 공유하지 않습니다)
+  """
+  with m.SessionLocal() as db:
+    yield db
+
+async def to_thread(fn: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> R:
+  """`fn`을 DB worker thread에서 실행하고 결과를 기다립니다 (asyncio.to_thread와 같지만 thread 수가 제한됨)"""
+  return await asyncio.get_running_loop().run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+def _to_async(fn: Callable[Concatenate[Session, P], R]) -> Callable[Concatenate[Session, P], Awaitable[R]]:
+  @functools.wraps(fn)
+  async def wrapper(db: Session, *args: P.args, **kwargs: P.kwargs) -> R:
+    return await to_thread(fn, db, *args, **kwargs)
+  return wrapper
+
+######### 유저 정보 #########
+db_create_new_user              = _to_async(u.db_create_new_user)
+db_find_user                    = _to_async(u.db_find_user)
+db_find_user_by_id              = _to_async(u.db_find_user_by_id)
+db_find_user_with_password      = _to_async(u.db_find_user_with_password)
+
+######### 채팅방 정보 #########
+db_get_chatroom                 = _to_async(u.db_get_chatroom)
+db_make_new_chatroom            = _to_async(u.db_make_new_chatroom)
+db_get_user_chatrooms           = _to_async(u.db_get_user_chatrooms)
+db_delete_user_chatroom         = _to_async(u.db_delete_user_chatroom)
+db_get_chatroom_name            = _to_async(u.db_get_chatroom_name)
+db_update_chatroom_name         = _to_async(u.db_update_chatroom_name)
+db_change_chatroom_immersive    = _to_async(u.db_change_chatroom_immersive)
+db_get_chatroom_context         = _to_async(u.db_get_chatroom_context)
+
+######### 메시지 기능 관련 #########
+db_get_chat_messages            = _to_async(u.db_get_chat_messages)
+db_append_chat_message          = _to_async(u.db_append_chat_message)
+db_get_chatroom_memory          = _to_async(u.db_get_chatroom_memory)
+
+######### 기능 관련 #########
+db_get_bookmarked_movies        = _to_async(u.db_get_bookmarked_movies)
+db_add_bookmark                 = _to_async(u.db_add_bookmark)
+db_rm_bookmark                  = _to_async(u.db_rm_bookmark)
+db_get_watchlist                = _to_async(u.db_get_watchlist)
+db_get_archived_movies          = _to_async(u.db_get_archived_movies)
+db_add_archived                 = _to_async(u.db_add_archived)
+db_rm_archived                  = _to_async(u.db_rm_archived)
+db_update_archived              = _to_async(u.db_update_archived)
+db_find_movie_by_id             = _to_async(u.db_find_movie_by_id)
+db_find_movie_by_tmdb_id        = _to_async(u.db_find_movie_by_tmdb_id)
+db_find_movies_by_tmdb_title    = _to_async(u.db_find_movies_by_tmdb_title)
+db_find_movies_by_alias         = _to_async(u.db_find_movies_by_alias)
+db_update_wikipedia_data        = _to_async(u.db_update_wikipedia_data)
+db_get_movie_reviews            = _to_async(u.db_get_movie_reviews)
+db_add_movie_reviews            = _to_async(u.db_add_movie_reviews)
+db_add_recommended_movies       = _to_async(u.db_add_recommended_movies)
+db_get_recommended_turns        = _to_async(u.db_get_recommended_turns)
+db_get_recommended_movies       = _to_async(u.db_get_recommended_movies)
+db_get_character_profile_by_id  = _to_async(u.db_get_character_profile_by_id)
+db_update_character_description = _to_async(u.db_update_character_description)
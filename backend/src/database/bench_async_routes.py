@@ -0,0 +1,138 @@
+"""
+DB를 읽는 route가 event loop를 얼마나 멈추게 하는지 확인합니다.
+
+10ms마다 깨어나는 ticker(SSE token stream 대신)를 돌리는 동안, 영화 N개가 담긴 watchlist를 동시에 여러 번 요청합니다.
+
+* async: 실제 route (`GET /api/movies/watchlist`, 쿼리와 응답 변환을 database/async_utils.py의 DB worker thread에서 실행)
+* blocking: 같은 응답을 동기 Session(database/utils.py)으로 event loop 위에서 바로 만드는 route (async_utils 이전 방식)
+
+ticker가 한 번 깨어날 때마다 예정보다 늦어진 시간(stall)의 p50/p99/max와, 요청이 끝날 때까지 ticker가 깨어난 횟수를 보여줍니다.
+SSE stream은 가장 오래 멈춘 순간에 끊겨 보이므로 max stall을 기준으로 봐주세요.
+
+```bash
+# pwd = backend/src
+python -m database.bench_async_routes
+python -m database.bench_async_routes --movies 3000 --requests 8
+```
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import List
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.orm import sessionmaker
+import auth
+import database.async_utils as adb
+import database.models as m
+import database.utils as u
+import movies
+from api_schema import Movie, public_movie_infos
+
+TICK = 0.01 # 초
+GENRE_COUNT = 19
+DIRECTOR_COUNT = 300
+
+def _seed(session: sessionmaker, movie_count: int) -> tuple[int, str]:
+  with session() as db:
+    user = m.User(email="bench@moviechat", password="pw", nickname="bench")
+    genres = [m.Genre(name=f"genre {i}") for i in range(GENRE_COUNT)]
+    directors = [m.Director(tmdb_id=i, name=f"director {i}", original_name="d") for i in range(DIRECTOR_COUNT)]
+    db.add_all([user, *genres, *directors])
+    db.flush()
+    films = [m.Movie(tmdb_id=i, title=f"movie {i}", poster_img_url=f"/p{i}.jpg") for i in range(movie_count)]
+    db.add_all(films)
+    db.flush()
+    for i, movie in enumerate(films):
+      db.add_all([
+        m.MovieGenre(movie_id=movie.id, genre_id=genres[i % GENRE_COUNT].id),
+        m.MovieDirector(movie_id=movie.id, director_id=directors[i % DIRECTOR_COUNT].id),
+        m.BookmarkedMovie(movie_id=movie.id, user_id=user.id),
+      ])
+    db.commit()
+    return user.id, user.nickname
+
+def _make_app(session: sessionmaker) -> FastAPI:
+  app = FastAPI()
+  app.include_router(movies.router)
+
+  def get_db():
+    with session() as db:
+      yield db
+  app.dependency_overrides[adb.get_db] = get_db
+
+  @app.get("/blocking/watchlist", response_model=List[Movie])
+  async def blocking_watchlist(user = Depends(auth.validate_user)):
+    with session() as db:
+      return public_movie_infos(u.db_get_watchlist(db, user.id))
+
+  return app
+
+async def _measure(app: FastAPI, path: str, token: str, requests: int) -> dict:
+  stalls: list[float] = []
+  done = asyncio.Event()
+
+  async def ticker():
+    while not done.is_set():
+      expected = time.perf_counter() + TICK
+      await asyncio.sleep(TICK)
+      stalls.append(max(0.0, time.perf_counter() - expected))
+
+  transport = httpx.ASGITransport(app=app)
+  async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies={auth.SESSION_COOKIE_KEY: token}) as client:
+    await client.get(path) # user cache 등 warm up
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK)
+    stalls.clear()
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[client.get(path) for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+    done.set()
+    await task
+
+  assert all(r.status_code == 200 for r in responses), [r.status_code for r in responses]
+  return {
+    "movies": len(responses[0].json()),
+    "elapsed_ms": elapsed * 1000,
+    "ticks": len(stalls),
+    "p50_stall_ms": statistics.median(stalls) * 1000 if stalls else elapsed * 1000,
+    "p99_stall_ms": statistics.quantiles(stalls, n=100, method="inclusive")[98] * 1000 if len(stalls) > 1 else elapsed * 1000,
+    "max_stall_ms": max(stalls, default=elapsed) * 1000,
+  }
+
+def run(movie_count: int, requests: int) -> dict[str, dict]:
+  directory = tempfile.mkdtemp(prefix="moviechat_bench_")
+  path = os.path.join(directory, "bench.db")
+  engine = m.make_engine(f"sqlite:///{path}")
+  try:
+    m.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)
+    user_id, nickname = _seed(session, movie_count)
+    app = _make_app(session)
+    token = auth.issue_session_token(user_id, nickname)
+
+    async def measure_all():
+      return {
+        "blocking": await _measure(app, "/blocking/watchlist", token, requests),
+        "async": await _measure(app, "/api/movies/watchlist", token, requests),
+      }
+    return asyncio.run(measure_all())
+  finally:
+    engine.dispose()
+    shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="DB를 읽는 route가 event loop를 멈추는 시간 측정")
+  parser.add_argument("--movies", type=int, default=3000, help="watchlist의 영화 개수")
+  parser.add_argument("--requests", type=int, default=8, help="동시에 보낼 요청 수")
+  args = parser.parse_args()
+  for name, result in run(args.movies, args.requests).items():
+    print(
+      f"{name:<9} 영화 {result['movies']}개 x {args.requests}번: {result['elapsed_ms']:.0f} ms, "
+      f"tick {result['ticks']}번, stall p50 {result['p50_stall_ms']:.0f} ms / p99 {result['p99_stall_ms']:.0f} ms / max {result['max_stall_ms']:.0f} ms"
+    )
@@ -0,0 +1,100 @@
+"""
+여러 영화 제목을 chroma(`database/chroma.py`)에서 찾을 때의 지연 시간을 비교합니다.
+
+임시 폴더에 영화 N개짜리 chroma DB를 만들고, 요청마다 `--latency`초가 걸리는 가짜 embedding 모델
+(llm/eval_retriever.py의 HashingEmbeddings)로 제목 1/5/20개를 찾습니다. 두 방식의 결과가 같은지도 확인합니다.
+
+* per-title: 예전 방식. 제목마다 Chroma handle을 새로 만들고 similarity_search(k=10)
+* batched: `chroma_fuzzy_search_many` (embedding 요청 한 번, multi-query 한 번)
+
+API key 없이 동작하며, 실제 chroma DB(`database/chroma`)는 건드리지 않습니다.
+
+```bash
+# pwd = backend/src
+python -m database.bench_chroma_search
+python -m database.bench_chroma_search --movies 2000 --titles 1 5 20 --latency 0.08
+```
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from typing import List, Optional
+from langchain_community.vectorstores import Chroma
+import database.chroma as chroma
+from llm.eval_retriever import HashingEmbeddings
+
+class SlowEmbeddings(HashingEmbeddings):
+  """embedding API처럼 요청(batch)마다 latency초가 걸리는 HashingEmbeddings"""
+  def __init__(self, latency: float):
+    super().__init__()
+    self.latency = latency
+    self.calls = 0
+
+  def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    self.calls += 1
+    time.sleep(self.latency)
+    return super().embed_documents(texts)
+
+  def embed_query(self, text: str) -> List[float]:
+    return self.embed_documents([text])[0]
+
+def per_title_search(title: str) -> Optional[int]:
+  """chroma_fuzzy_search_many 이전의 chroma_fuzzy_search (호출마다 handle 생성, 제목 하나씩 검색)"""
+  db = Chroma(persist_directory=chroma.CHROMA_DB_PATH, embedding_function=chroma.embedding_model)
+  docs = db.similarity_search(chroma._build_query(title, None), k=10)
+  return next((doc.metadata["sqlite_id"] for doc in docs if doc.metadata.get("sqlite_id")), None)
+
+def run(movie_count: int, title_counts: List[int], latency: float) -> List[dict]:
+  directory = tempfile.mkdtemp(prefix="moviechat_chroma_bench_")
+  embedding = SlowEmbeddings(latency)
+  chroma.CHROMA_DB_PATH = directory
+  chroma.embedding_model = embedding
+  chroma._chroma = None
+  report = []
+  try:
+    embedding.latency = 0
+    chroma.chroma_insert_many([
+      chroma.MovieMeta(sqlite_id=i, tmdb_id=i, title=f"영화 제목 {i}", release_date="2001-01-01", genres=["드라마"], created_at="bench")
+      for i in range(1, movie_count + 1)
+    ])
+    embedding.latency = latency
+
+    for count in title_counts:
+      titles = [f"영화 제목 {(i * 37) % movie_count + 1}" for i in range(1, count + 1)]
+
+      embedding.calls = 0
+      start = time.perf_counter()
+      per_title = [per_title_search(title) for title in titles]
+      per_title_ms, per_title_calls = (time.perf_counter() - start) * 1000, embedding.calls
+
+      embedding.calls = 0
+      start = time.perf_counter()
+      batched = [meta.sqlite_id if meta else None for meta in chroma.chroma_fuzzy_search_many([(title, None) for title in titles])]
+      batched_ms, batched_calls = (time.perf_counter() - start) * 1000, embedding.calls
+
+      report.append({
+        "titles": count,
+        "per_title_ms": per_title_ms,
+        "per_title_calls": per_title_calls,
+        "batched_ms": batched_ms,
+        "batched_calls": batched_calls,
+        "identical": per_title == batched,
+      })
+  finally:
+    chroma._chroma = None
+    shutil.rmtree(directory, ignore_errors=True)
+  return report
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="chroma 영화 제목 검색 지연 시간 비교 (가짜 embedding 모델 사용)")
+  parser.add_argument("--movies", type=int, default=2000)
+  parser.add_argument("--titles", type=int, nargs="+", default=[1, 5, 20], help="한 번에 찾을 제목 개수들")
+  parser.add_argument("--latency", type=float, default=0.08, help="embedding 요청당 지연 시간 (초)")
+  args = parser.parse_args()
+  for result in run(args.movies, args.titles, args.latency):
+    print(
+      f"제목 {result['titles']:>3}개: per-title {result['per_title_ms']:>6.0f} ms (embedding {result['per_title_calls']}번), "
+      f"batched {result['batched_ms']:>6.0f} ms (embedding {result['batched_calls']}번), 결과 {'동일' if result['identical'] else '다름'}"
+    )
@@ -0,0 +1,93 @@
+"""
+영화 목록(북마크, 아카이브, watchlist) 함수가 실행하는 SQL 개수와 시간을 잽니다.
+
+* per-movie: 예전 방식. 목록 쿼리 1번 + 영화마다 genre/director 쿼리 (1 + 2N번)
+* bulk: `db_hydrate_movies`로 genre/director를 `IN (...)` 쿼리로 한꺼번에 불러오는 지금 방식
+
+in-memory DB에 영화 N개(genre 1개, 감독 1명)를 북마크/아카이브해두고 각 함수를 한 번씩 실행합니다.
+
+```bash
+# pwd = backend/src
+python -m database.bench_list_queries
+python -m database.bench_list_queries --sizes 10 100 1000
+```
+"""
+
+import argparse
+import time
+from typing import Callable
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+import sqlalchemy as sql
+import database.models as m
+import database.utils as u
+
+GENRE_COUNT = 5
+DIRECTOR_COUNT = 5
+
+def _seed(db: Session, user_id: int, genre_ids: list[int], director_ids: list[int], size: int):
+  """영화를 `size`개가 될 때까지 추가하고 모두 북마크/아카이브합니다"""
+  base = db.scalar(sql.select(sql.func.count()).select_from(m.Movie))
+  for i in range(base, size):
+    movie = m.Movie(tmdb_id=i, title=f"movie {i}")
+    db.add(movie)
+    db.flush()
+    db.add_all([
+      m.MovieGenre(movie_id=movie.id, genre_id=genre_ids[i % GENRE_COUNT]),
+      m.MovieDirector(movie_id=movie.id, director_id=director_ids[i % DIRECTOR_COUNT]),
+      m.BookmarkedMovie(movie_id=movie.id, user_id=user_id),
+      m.ArchivedMovie(movie_id=movie.id, user_id=user_id, rating=i % 6),
+    ])
+  db.commit()
+
+def _per_movie_bookmarks(db: Session, user_id: int):
+  """db_hydrate_movies 이전의 db_get_bookmarked_movies (영화마다 genre/director 쿼리)"""
+  stmt = (
+    sql.select(m.Movie)
+    .join(m.BookmarkedMovie, m.Movie.id == m.BookmarkedMovie.movie_id)
+    .where(m.BookmarkedMovie.user_id == user_id)
+  )
+  return [
+    (movie.id, u.db_get_genres_of_movie(db, movie.id), u.db_get_directors_of_movie(db, movie.id))
+    for movie in db.execute(stmt).scalars().all()
+  ]
+
+def run(sizes: list[int]) -> list[dict]:
+  engine = create_engine("sqlite://")
+  m.Base.metadata.create_all(bind=engine)
+  statements = [0]
+  @event.listens_for(engine, "before_cursor_execute")
+  def count(conn, cursor, statement, parameters, context, executemany):
+    statements[0] += 1
+
+  functions: dict[str, Callable[[Session, int], list]] = {
+    "bookmarks (per-movie)": _per_movie_bookmarks,
+    "db_get_bookmarked_movies": u.db_get_bookmarked_movies,
+    "db_get_archived_movies": u.db_get_archived_movies,
+    "db_get_watchlist": u.db_get_watchlist,
+  }
+  results = []
+  with sessionmaker(bind=engine, autoflush=False)() as db:
+    user = m.User(email="bench@moviechat", password="pw", nickname="bench")
+    genres = [m.Genre(name=f"genre {i}") for i in range(GENRE_COUNT)]
+    directors = [m.Director(tmdb_id=i, name=f"director {i}", original_name="d") for i in range(DIRECTOR_COUNT)]
+    db.add_all([user, *genres, *directors])
+    db.flush()
+    user_id, genre_ids, director_ids = user.id, [g.id for g in genres], [d.id for d in directors]
+    for size in sorted(sizes):
+      _seed(db, user_id, genre_ids, director_ids, size)
+      for name, function in functions.items():
+        db.expunge_all()
+        statements[0] = 0
+        start = time.perf_counter()
+        movies = function(db, user_id)
+        elapsed = time.perf_counter() - start
+        results.append({"size": size, "name": name, "movies": len(movies), "statements": statements[0], "ms": elapsed * 1000})
+  return results
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="영화 목록 함수의 SQL 개수 측정")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 300], help="북마크/아카이브할 영화 개수들")
+  args = parser.parse_args()
+  for result in run(args.sizes):
+    print(f"{result['size']:>5}개 {result['name']:<26} SQL {result['statements']:>5}번 {result['ms']:>8.1f} ms")
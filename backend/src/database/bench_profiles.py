@@ -0,0 +1,95 @@
+"""
+DB_PROFILE(database/models.py의 ENGINE_PROFILES)별로 동시에 읽고 쓸 때의 처리량을 비교합니다.
+
+임시 파일 DB에 영화 2000개를 넣어둔 뒤, writer thread들은 ChatHistory를 계속 추가하고
+reader thread들은 영화 300개 목록을 계속 읽습니다. 초당 처리한 쓰기/읽기 수와 실패(locked 등) 수를 보여줍니다.
+
+```bash
+# pwd = backend/src
+python -m database.bench_profiles
+python -m database.bench_profiles --seconds 5 --writers 4 --readers 8
+```
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+import sqlalchemy as sql
+from sqlalchemy.orm import sessionmaker
+import database.models as m
+
+MOVIE_COUNT = 2000
+READ_LIMIT = 300
+
+def run(profile: str, seconds: float, writers: int, readers: int) -> dict:
+  directory = tempfile.mkdtemp(prefix="moviechat_bench_")
+  engine = m.make_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile)
+  try:
+    m.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)
+    with session() as db:
+      user = m.User(email="bench@moviechat", password="pw", nickname="bench")
+      db.add(user)
+      db.flush()
+      room = m.ChatRoom(user_id=user.id, title="bench")
+      db.add(room)
+      db.add_all([m.Movie(tmdb_id=i, title=f"movie {i}") for i in range(MOVIE_COUNT)])
+      db.commit()
+      room_id = room.id
+
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(key: str):
+      with lock:
+        counts[key] += 1
+
+    def write():
+      while time.perf_counter() < deadline:
+        with session() as db:
+          try:
+            db.add(m.ChatHistory(room_id=room_id, user_chat="u", ai_chat="a" * 500))
+            db.commit()
+            count("writes")
+          except sql.exc.OperationalError:
+            count("errors")
+
+    def read():
+      while time.perf_counter() < deadline:
+        with session() as db:
+          try:
+            db.execute(sql.select(m.Movie).limit(READ_LIMIT)).scalars().all()
+            count("reads")
+          except sql.exc.OperationalError:
+            count("errors")
+
+    threads = [threading.Thread(target=write) for _ in range(writers)] + [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+  finally:
+    engine.dispose()
+    shutil.rmtree(directory, ignore_errors=True)
+
+  return {
+    "profile": profile,
+    "writes/s": counts["writes"] / seconds,
+    "reads/s": counts["reads"] / seconds,
+    "errors": counts["errors"],
+  }
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="DB_PROFILE별 동시 읽기/쓰기 처리량 비교")
+  parser.add_argument("--profiles", nargs="+", default=list(m.ENGINE_PROFILES), choices=list(m.ENGINE_PROFILES))
+  parser.add_argument("--seconds", type=float, default=3)
+  parser.add_argument("--writers", type=int, default=2)
+  parser.add_argument("--readers", type=int, default=6)
+  args = parser.parse_args()
+  for profile in args.profiles:
+    result = run(profile, args.seconds, args.writers, args.readers)
+    print(f"{result['profile']:<12} 쓰기 {result['writes/s']:>6.0f}/s, 읽기 {result['reads/s']:>6.0f}/s, 실패 {result['errors']}번")
@@ -0,0 +1,84 @@
+"""
+TMDB 검색으로 영화를 DB에 반영할 때(`update_movie_by_tmdb_search`) 상세 정보 요청이 몇 번 나가는지 확인합니다.
+
+가짜 TMDB 서버(common/bench_tmdb_fetch.py의 FakeTmdbServer)가 검색 결과 `--hits`개를 돌려주며,
+찾는 영화(`원제`가 query와 같은 영화)는 인기도가 가장 낮게 섞여 있습니다.
+
+* all hits: 예전 방식. 검색 결과 전부의 상세 정보를 요청 (`tmdb_request_movie_bulk`)
+* top-k cold: `update_movie_by_tmdb_search` (검색 응답으로 순위를 매기고 상위 MOVIE_SEARCH_TOP_K개만 요청)
+* top-k again: TMDB 응답 캐시를 비우고 같은 query로 다시 요청 (MOVIE_FRESH_FOR 이내라 DB에서 바로 반환)
+
+1위 영화와 query로 등록된 alias 개수(1위 영화에만 등록되어야 함)도 보여줍니다.
+API key, 네트워크 없이 동작하며 실제 DB와 TMDB 응답 캐시는 건드리지 않습니다.
+
+```bash
+# pwd = backend/src
+python -m database.bench_tmdb_search
+python -m database.bench_tmdb_search --hits 20 --latency 0.02
+```
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+from sqlalchemy.orm import sessionmaker
+import common.tmdb_utils as tmu
+import database.models as m
+import database.utils as u
+from common.bench_tmdb_fetch import FakeTmdbServer
+
+QUERY = "the host"
+TITLE = "괴물"
+
+def fake_search_results(hits: int) -> list[dict]:
+  """찾는 영화 하나 + 제목이 비슷하고 인기도가 더 높은 영화 hits - 1개"""
+  results = [
+    {"id": i, "title": f"{TITLE}들 {i}", "original_title": f"the hosts {i}", "release_date": "2010-01-01", "popularity": 100.0 + i}
+    for i in range(1, hits)
+  ]
+  results.insert(hits // 2, {"id": hits, "title": TITLE, "original_title": QUERY.title(), "release_date": "2006-07-27", "popularity": 5.0})
+  return results
+
+def run(hits: int, latency: float) -> list[dict]:
+  directory = tempfile.mkdtemp(prefix="moviechat_bench_")
+  server = FakeTmdbServer(latency)
+  server.search_results = fake_search_results(hits)
+  # 전용 TMDB client가 만들어지기 전에 가짜 서버와 임시 캐시를 바라보게 합니다
+  tmu.TMDB_API_BASE_URL = server.base_url
+  tmu.ENV_TMDB_API_KEY = "bench"
+  tmu._tmdb_response_cache = tmu.TmdbResponseCache(os.path.join(directory, "tmdb_cache.db"))
+  engine = m.make_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+  report = []
+  try:
+    m.Base.metadata.create_all(bind=engine)
+
+    def record(name: str, movies: list):
+      report.append({"name": name, "fetches": server.movie_requests, "movies": len(movies), "top": movies[0].title if movies else None})
+      server.movie_requests = 0
+
+    record("all hits", tmu.tmdb_request_movie_bulk({"search": {"query": QUERY}, "lang": "ko"}))
+    tmu.tmdb_response_cache().clear()
+
+    with sessionmaker(bind=engine, autoflush=False)() as db:
+      record("top-k cold", u.update_movie_by_tmdb_search(db, {"query": QUERY}))
+      tmu.tmdb_response_cache().clear()
+      record("top-k again", u.update_movie_by_tmdb_search(db, {"query": QUERY}))
+      aliases = db.query(m.MovieAlias).filter(m.MovieAlias.aliased_name == QUERY).count()
+    for i in report:
+      i["aliases"] = aliases
+  finally:
+    server.close()
+    engine.dispose()
+    shutil.rmtree(directory, ignore_errors=True)
+  return report
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="TMDB 검색 시 상세 정보 요청 횟수 비교 (가짜 서버 사용)")
+  parser.add_argument("--hits", type=int, default=20, help="검색 결과 개수")
+  parser.add_argument("--latency", type=float, default=0.02, help="가짜 서버의 요청당 지연 시간 (초)")
+  args = parser.parse_args()
+  report = run(args.hits, args.latency)
+  for result in report:
+    print(f"{result['name']:<12} 상세 정보 요청 {result['fetches']:>2}번, 영화 {result['movies']}개, 1위 {result['top']}")
+  print(f"'{QUERY}' alias {report[0]['aliases']}개 등록됨")
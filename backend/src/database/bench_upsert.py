@@ -0,0 +1,105 @@
+"""
+TMDB 결과를 DB에 반영하는 속도(`upsert_movies_with_tmdb`)를 잽니다.
+
+genre 3개, 배우 15명, 감독 1명, platform 1개가 붙은 가짜 TMDB 결과 N개를 만들어
+새 DB에 한 번(insert), 같은 내용을 다시 한 번(update) 반영합니다.
+
+* single: 영화마다 `upsert_movie_with_tmdb` 호출
+* batch: 전체를 `upsert_movies_with_tmdb` 한 번으로 반영
+* baseline: `--baseline`으로 예전 database/utils.py를 주면 그 파일의 `upsert_movie_with_tmdb`도 같이 잽니다
+
+```bash
+# pwd = backend/src
+python -m database.bench_upsert
+git show <commit>:backend/src/database/utils.py > /tmp/old_utils.py
+python -m database.bench_upsert --baseline /tmp/old_utils.py
+```
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import time
+from datetime import date
+from types import ModuleType
+from typing import Callable
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+import database.models as m
+import database.utils as u
+from common.tmdb_types import ActorInfo, DirectorInfo, ExternalIdInfo, PlatformInfo, TmdbRequestResult
+
+GENRE_COUNT = 19
+ACTOR_COUNT = 5000
+DIRECTOR_COUNT = 300
+PLATFORM_COUNT = 8
+
+def fake_tmdb_result(i: int) -> TmdbRequestResult:
+  return TmdbRequestResult(
+    id=i,
+    title=f"movie {i}",
+    overview="overview",
+    poster_path="/poster.jpg",
+    release_date=date(2000, 1, 1),
+    genres=[f"genre {(i + k) % GENRE_COUNT}" for k in range(3)],
+    casts=[
+      ActorInfo(credit_id=f"{i}-{k}", person_id=(i * 7 + k) % ACTOR_COUNT, character=f"character {k}", name="actor", original_name="actor", profile_path=None, order=k)
+      for k in range(15)
+    ],
+    directors=[DirectorInfo(credit_id=f"{i}-d", person_id=i % DIRECTOR_COUNT, name="director", original_name="director", profile_path=None)],
+    platforms=[PlatformInfo(tmdb_id=i % PLATFORM_COUNT, name="platform", logo_path=None)],
+    external_ids=ExternalIdInfo(imdb=None, wikidata=None),
+  )
+
+def _load_baseline(path: str) -> ModuleType:
+  spec = importlib.util.spec_from_file_location("baseline_utils", path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+def run(count: int, baseline: str|None = None) -> list[dict]:
+  methods: dict[str, Callable[[Session, list[TmdbRequestResult]], list]] = {}
+  if baseline:
+    old = _load_baseline(baseline)
+    methods["baseline"] = lambda db, results: [old.upsert_movie_with_tmdb(db, i) for i in results]
+  methods["single"] = lambda db, results: [u.upsert_movie_with_tmdb(db, i) for i in results]
+  methods["batch"] = u.upsert_movies_with_tmdb
+
+  results = [fake_tmdb_result(i) for i in range(1, count + 1)]
+  report = []
+  for name, method in methods.items():
+    engine = create_engine("sqlite://")
+    m.Base.metadata.create_all(bind=engine)
+    statements = [0]
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+      statements[0] += 1
+
+    with sessionmaker(bind=engine, autoflush=False)() as db:
+      for phase in ("insert", "update"):
+        statements[0] = 0
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+          saved = method(db, results)
+        elapsed = time.perf_counter() - start
+        report.append({
+          "name": name,
+          "round": phase,
+          "movies/s": count / elapsed,
+          "statements": statements[0],
+          "saved": sum(1 for i in saved if i),
+        })
+    engine.dispose()
+  return report
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="TMDB 결과 DB 반영 속도 측정")
+  parser.add_argument("--count", type=int, default=500, help="영화 개수")
+  parser.add_argument("--baseline", help="비교할 예전 database/utils.py 경로")
+  args = parser.parse_args()
+  for result in run(args.count, args.baseline):
+    print(
+      f"{result['name']:<9} {result['round']:<6} {result['movies/s']:>7.0f} movies/s, "
+      f"SQL {result['statements']}번, 저장 {result['saved']}/{args.count}"
+    )
@@ -0,0 +1,105 @@
+"""
+process 안에서만 유지되는 캐시들입니다.
+
+여러 thread(FastAPI threadpool, database/async_utils.py의 DB worker thread)에서 동시에 접근하므로 lock으로 보호하며,
+적중률을 확인할 수 있도록 hit/miss/invalidate 횟수를 셉니다.
+worker process끼리는 캐시를 공유하지 않으므로, 값을 바꾸는 쪽에서 반드시 `invalidate`를 불러주세요.
+"""
+
+import threading
+import time
+from typing import Generic, Hashable, TypeVar
+from cachetools import Cache, LRUCache, TTLCache
+from database.internal_types import MovieInfoInternal
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+class StatCache(Generic[K, V]):
+  """
+  cachetools의 Cache(LRUCache, TTLCache 등)를 thread-safe하게 감싸고 통계를 기록합니다.
+
+  DB에서 읽은 값을 넣을 때는 읽기 전에 `version()`을 받아두고 `put(key, value, version)`으로 넣어주세요.
+  읽는 동안 `invalidate`/`clear`가 불렸다면 읽은 값이 이미 오래된 것일 수 있으므로 넣지 않습니다.
+  """
+  def __init__(self, cache: Cache):
+    self._cache = cache
+    self._lock = threading.Lock()
+    self._version = 0
+    self.hits = 0
+    self.misses = 0
+    self.invalidations = 0
+    self.stale_puts = 0
+
+  def get(self, key: K) -> V|None:
+    with self._lock:
+      value = self._cache.get(key)
+      if value is None:
+        self.misses += 1
+      else:
+        self.hits += 1
+      return value
+
+  def version(self) -> int:
+    """invalidate/clear될 때마다 바뀌는 값"""
+    with self._lock:
+      return self._version
+
+  def put(self, key: K, value: V, version: int|None = None):
+    """`version`이 주어졌다면, 그 뒤로 invalidate/clear가 불리지 않았을 때만 넣습니다"""
+    with self._lock:
+      if version is not None and version != self._version:
+        self.stale_puts += 1
+        return
+      self._cache[key] = value
+
+  def invalidate(self, *keys: K):
+    with self._lock:
+      self._version += 1
+      for key in keys:
+        if self._cache.pop(key, None) is not None:
+          self.invalidations += 1
+
+  def clear(self):
+    with self._lock:
+      self._version += 1
+      self._cache.clear()
+
+  def stats(self) -> dict:
+    """hit, miss, 적중률, 현재 크기 등을 반환합니다"""
+    with self._lock:
+      total = self.hits + self.misses
+      return {
+        "hits": self.hits,
+        "misses": self.misses,
+        "hit_rate": self.hits / total if total else 0.0,
+        "invalidations": self.invalidations,
+        "stale_puts": self.stale_puts,
+        "size": len(self._cache),
+        "maxsize": self._cache.maxsize,
+      }
+
+# 영화 상세 정보 중 유저와 상관 없는 부분 (장르, 감독, 캐릭터 포함)
+MOVIE_DETAIL_CACHE_SIZE = 1024
+# 초 단위. 다른 worker process에서 바뀐 영화 정보가 반영되기까지 최대 지연 시간
+MOVIE_DETAIL_CACHE_TTL = 60 * 5
+movie_detail_cache: StatCache[int, MovieInfoInternal] = StatCache(TTLCache(maxsize=MOVIE_DETAIL_CACHE_SIZE, ttl=MOVIE_DETAIL_CACHE_TTL))
+
+class MovieAccessLog:
+  """영화별 마지막 조회 시각 (최근 조회된 MOVIE_ACCESS_LOG_SIZE개만 기억함)"""
+  def __init__(self, maxsize: int):
+    self._times: LRUCache = LRUCache(maxsize=maxsize)
+    self._lock = threading.Lock()
+
+  def touch(self, movie_id: int):
+    with self._lock:
+      self._times[movie_id] = time.time()
+
+  def since(self, seconds: float) -> dict[int, float]:
+    """최근 seconds초 안에 조회된 영화들 (movie id -> 마지막 조회 시각)"""
+    threshold = time.time() - seconds
+    with self._lock:
+      return {id: at for id, at in self._times.items() if at >= threshold}
+
+MOVIE_ACCESS_LOG_SIZE = 100000
+movie_access_log = MovieAccessLog(MOVIE_ACCESS_LOG_SIZE)
@@ -1,21 +1,25 @@
 """
 MovieChat 로컬 DB의 영화 title fuzzy matching에 사용되는 chroma DB입니다.
+
+영화 하나당 document 하나이며, document id는 SQLite의 Movie.id(`sqlite_id`)입니다.
+같은 영화를 다시 등록하면 덮어쓰므로(upsert) 중복 document가 쌓이지 않습니다.
+DB 전체로 다시 만들 때는 `python -m database.reindex_chroma`를 사용해주세요.
 """
 
-from typing import Optional, List, cast
+import threading
+from typing import Optional, List, Tuple, cast
 from pydantic import BaseModel
 from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
 from langchain.schema import Document
-from langchain.text_splitter import CharacterTextSplitter
 from common.env import ENV_BACKEND_ROOT
+from common.embeddings import shared_embeddings
 from datetime import datetime
 
-__all__ = ["MovieMeta", "chroma_fuzzy_search", "chroma_insert", "chroma_delete"]
+__all__ = ["MovieMeta", "chroma_fuzzy_search", "chroma_fuzzy_search_many", "chroma_insert", "chroma_insert_many", "chroma_delete", "chroma_delete_many"]
 
 # 전역 경로 (환경 변수)
 CHROMA_DB_PATH = cast(str, ENV_BACKEND_ROOT) + '/src/database/chroma'
-embedding_model = OpenAIEmbeddings()
+embedding_model = shared_embeddings()
 
 # 영화 메타데이터 Pydantic 모델
 class MovieMeta(BaseModel):
@@ -25,10 +29,22 @@ class MovieMeta(BaseModel):
     release_date: Optional[str] # 영화 출시일
     genres: Optional[List[str]] # 장르
     created_at: str             # 문서 생성일 (너무 오래된 거면 업데이트)
+    aliases: Optional[List[str]] = None # 다른 제목들 (원제 등). 검색용으로 content에만 들어감
+
+_chroma: Optional[Chroma] = None
+_chroma_lock = threading.Lock()
 
-# Chroma DB 세션 반환
-def _chroma_get():
-    return Chroma(persist_directory=CHROMA_DB_PATH, embedding_function=embedding_model)
+# Chroma DB 세션 반환 (process에서 하나만 만들어 재사용)
+def _chroma_get() -> Chroma:
+    global _chroma
+    if _chroma is None:
+        with _chroma_lock:
+            if _chroma is None:
+                _chroma = Chroma(persist_directory=CHROMA_DB_PATH, embedding_function=embedding_model)
+    return _chroma
+
+def _doc_id(sqlite_id: int) -> str:
+    return str(sqlite_id)
 
 # Chroma Query 생성
 def _build_query(title: str, keywords: Optional[List[str]] = None) -> str:
@@ -38,6 +54,19 @@ def _build_query(title: str, keywords: Optional[List[str]] = None) -> str:
     # query := "영화 제목: {제목} | 관련 키워드: keyword0, keyword1, keyword2 ..."
     return " | ".join(parts)
 
+def _to_meta(meta: dict, title: str) -> MovieMeta:
+    genres = meta.get("genres")
+    if isinstance(genres, str):
+        genres = [i for i in genres.split(", ") if i]
+    return MovieMeta(
+        sqlite_id=meta["sqlite_id"],
+        tmdb_id=meta.get("tmdb_id"),
+        title=meta.get("title", title),
+        release_date=meta.get("release_date"),
+        genres=genres,
+        created_at=meta.get("created_at")
+    )
+
 def chroma_fuzzy_search(title: str, keywords: Optional[List[str]] = None) -> Optional[MovieMeta]:
     """
     Chroma DB를 활용하여 title과 keyword로 유사한 영화 제목을 찾습니다.  
@@ -52,38 +81,38 @@ def chroma_fuzzy_search(title: str, keywords: Optional[List[str]] = None) -> Opt
       MovieMeta:
         유사하다고 판단된 영화의 metadata  
     """
+    return chroma_fuzzy_search_many([(title, keywords)])[0]
+
+def chroma_fuzzy_search_many(queries: List[Tuple[str, Optional[List[str]]]]) -> List[Optional[MovieMeta]]:
+    """
+    여러 영화를 한 번에 찾습니다. (`chroma_fuzzy_search`의 batch 버전)  
+    embedding 요청 한 번, chroma query 한 번으로 처리합니다.
+
+    Args:
+      queries:
+        (찾고자 하는 영화 제목, 관련 키워드)의 list
+    Returns:
+      queries 순서대로 유사하다고 판단된 영화의 metadata (없으면 None)
+    """
+    if not queries:
+        return []
     db = _chroma_get()
-    query = _build_query(title, keywords)
-    
+    texts = [_build_query(title, keywords) for title, keywords in queries]
+
     try:
-        results = db.similarity_search(query, k=10)
+        embeddings = embedding_model.embed_documents(texts)
+        results = db._collection.query(query_embeddings=embeddings, n_results=10, include=["metadatas"])
     except Exception as e:
         print(f"[Chroma Error] {e}")
-        return None
-
-    if not results:
-        return None
-
-    for doc in results:
-        meta = doc.metadata
-        if meta.get("sqlite_id"):
-            return MovieMeta(
-                sqlite_id=meta["sqlite_id"],
-                tmdb_id=meta.get("tmdb_id"),
-                title=meta.get("title", title),
-                release_date=meta.get("release_date"),
-                genres=meta.get("genres"),
-                created_at=meta.get("created_at")
-            )
-    return None
+        return [None] * len(queries)
 
-def chroma_insert(meta: MovieMeta):
-    """
-    Chroma DB에 영화 metadata를 등록합니다.  
-    """
-    db = _chroma_get()
-    metadata = meta.model_dump()
-    
+    found: List[Optional[MovieMeta]] = []
+    for (title, _), metadatas in zip(queries, results["metadatas"] or [[] for _ in queries]):
+        meta = next((i for i in metadatas if i and i.get("sqlite_id")), None)
+        found.append(_to_meta(dict(meta), title) if meta else None)
+    return found
+
+def _meta_document(meta: MovieMeta) -> Document:
     content = (
         f"[영화 제목] {meta.title}\n"
         f"[출시일] {meta.release_date}\n"
@@ -91,20 +120,65 @@ def chroma_insert(meta: MovieMeta):
         f"[SQLite ID] {meta.sqlite_id}\n"
         f"[TMDB ID] {meta.tmdb_id}"
     )
+    if meta.aliases:
+        content += f"\n[다른 제목] {', '.join(meta.aliases)}"
 
     # metadata와 자연어 기반 content를 동시에 저장
-    doc = Document(page_content=content, metadata=metadata)
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents([doc])
-    db.add_documents(chunks)
+    # (chroma metadata에는 list나 None을 넣을 수 없으므로 장르는 ", "로 이어서 저장)
+    metadata = meta.model_dump(exclude={"aliases"})
+    metadata["genres"] = ", ".join(meta.genres or [])
+    metadata = {key: value for key, value in metadata.items() if value is not None}
+    return Document(page_content=content, metadata=metadata)
+
+def chroma_insert(meta: MovieMeta):
+    """
+    Chroma DB에 영화 metadata를 등록합니다. 이미 있다면 덮어씁니다.  
+    """
+    chroma_insert_many([meta])
+
+def chroma_insert_many(metas: List[MovieMeta]):
+    """
+    Chroma DB에 여러 영화 metadata를 한 번에 등록합니다. 이미 있다면 덮어씁니다.  
+    embedding 요청도 묶어서 보내므로, 대량으로 등록할 때는 이 함수를 사용해주세요.
+    """
+    # 같은 영화가 여러 번 들어오면 마지막 것만 사용
+    metas = list({meta.sqlite_id: meta for meta in metas}.values())
+    if not metas:
+        return
+    db = _chroma_get()
+    ids = [_doc_id(meta.sqlite_id) for meta in metas]
+    docs = [_meta_document(meta) for meta in metas]
+
+    # 예전(임의의 id로 등록하던 때)에 쌓인 같은 영화의 document 정리
+    legacy = db._collection.get(where={"sqlite_id": {"$in": [meta.sqlite_id for meta in metas]}}, include=[])
+    stale_ids = set(legacy["ids"]) - set(ids)
+    if stale_ids:
+        db._collection.delete(ids=list(stale_ids))
+
+    embeddings = embedding_model.embed_documents([doc.page_content for doc in docs])
+    db._collection.upsert(
+        ids=ids,
+        embeddings=cast(list, embeddings),
+        documents=[doc.page_content for doc in docs],
+        metadatas=[doc.metadata for doc in docs]
+    )
 
 def chroma_delete(meta: MovieMeta):
     """
     Chroma DB에 영화 metadata를 삭제합니다.  
     """
+    chroma_delete_many([meta.sqlite_id])
+
+def chroma_delete_many(sqlite_ids: List[int]):
+    """
+    Chroma DB에서 여러 영화를 삭제합니다. 없는 영화는 무시합니다.  
+    """
+    if not sqlite_ids:
+        return
     db = _chroma_get()
     try:
-        # sqlite_id를 유일 key로 사용
-        db.delete([meta.sqlite_id])
-    except Exception:
-        print("[Chroma Error] 영화 삭제 중 오류 발생")
+        # id가 sqlite_id가 아닌 예전 document도 같이 삭제
+        db._collection.delete(where={"sqlite_id": {"$in": list(sqlite_ids)}})
+        db._collection.delete(ids=[_doc_id(id) for id in sqlite_ids])
+    except Exception as e:
+        print(f"[Chroma Error] 영화 삭제 중 오류 발생: {e}")
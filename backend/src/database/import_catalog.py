@@ -0,0 +1,186 @@
+"""
+TMDB 영화 정보를 파일에서 읽어 MovieChat DB에 한꺼번에 넣습니다.
+
+채팅 중에 TMDB를 기다리지 않도록, 자주 찾을 영화들을 미리 넣어두는 용도입니다.
+파일은 한 줄에 JSON 하나씩(JSON-lines) 들어있어야 하며, `.gz`로 압축되어 있어도 됩니다.
+* `/movie/{id}?append_to_response=credits,watch/providers,external_ids` 응답을 그대로 저장한 dump
+* TMDB daily export(`movie_ids_MM_DD_YYYY.json.gz`, `{"id": ..., "original_title": ...}`)
+  상세 정보가 없으므로 `--fetch` 옵션을 주면 TMDB(및 응답 캐시)에서 불러오고, 아니면 건너뜁니다.
+
+batch 하나가 transaction 하나이며, batch가 끝날 때마다 `<파일>.checkpoint`에 진행 상황을 저장합니다.
+중간에 멈췄다면 같은 명령을 다시 실행하면 이어서 진행합니다.
+
+```bash
+# pwd = backend/src
+python -m database.import_catalog movies.jsonl.gz --batch-size 500
+python -m database.import_catalog movie_ids_05_15_2025.json.gz --fetch --no-index
+```
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from typing import IO, Iterator, List
+from sqlalchemy.orm import Session
+import database.models as m
+import database.utils as u
+from common.tmdb_utils import tmdb_parse_movie, tmdb_request_movies
+from common.tmdb_types import TmdbRequestResult
+from database.internal_types import MovieInfoInternal
+from database.title_index import movie_title_index
+
+DEFAULT_BATCH_SIZE = 500
+MAX_CASTS = 15
+
+class ImportStats:
+  def __init__(self, line: int = 0, imported: int = 0):
+    self.started_at = time.monotonic()
+    self.start_line = line
+    self.line = line         # 처리한(checkpoint에 반영된) 줄 수
+    self.imported = imported # DB에 반영된 영화 수 (이전 실행 포함)
+    self.skipped = 0
+    self.failed = 0
+
+  def report(self, prefix: str = "[import]") -> str:
+    elapsed = max(time.monotonic() - self.started_at, 1e-9)
+    lines = self.line - self.start_line
+    return (
+      f"{prefix} {self.line}줄 처리, 영화 {self.imported}개 반영 "
+      f"(건너뜀 {self.skipped}, 실패 {self.failed}) | {lines / elapsed:.1f} lines/s, {elapsed:.1f}s"
+    )
+
+def _open(path: str) -> IO[str]:
+  if path.endswith(".gz"):
+    return gzip.open(path, "rt", encoding="utf-8")
+  return open(path, encoding="utf-8")
+
+def _checkpoint_path(path: str) -> str:
+  return f"{path}.checkpoint"
+
+def load_checkpoint(path: str) -> tuple[int, int]:
+  """(이미 처리한 줄 수, 반영된 영화 수)"""
+  try:
+    with open(_checkpoint_path(path), encoding="utf-8") as f:
+      checkpoint = json.load(f)
+    return checkpoint["line"], checkpoint["imported"]
+  except (OSError, ValueError, KeyError):
+    return 0, 0
+
+def save_checkpoint(path: str, stats: ImportStats):
+  tmp = f"{_checkpoint_path(path)}.tmp"
+  with open(tmp, "w", encoding="utf-8") as f:
+    json.dump({"line": stats.line, "imported": stats.imported}, f)
+  os.replace(tmp, _checkpoint_path(path))
+
+def read_batches(path: str, skip_lines: int, batch_size: int) -> Iterator[tuple[int, List[dict]]]:
+  """(batch 마지막 줄 번호, JSON 목록)을 순서대로 반환합니다. 깨진 줄은 빈 dict로 들어갑니다"""
+  batch: List[dict] = []
+  line_no = 0
+  with _open(path) as f:
+    for line_no, line in enumerate(f, start=1):
+      if line_no <= skip_lines:
+        continue
+      try:
+        batch.append(json.loads(line))
+      except ValueError:
+        batch.append({})
+      if len(batch) >= batch_size:
+        yield line_no, batch
+        batch = []
+  if batch:
+    yield line_no, batch
+
+def parse_payload(payload: dict) -> TmdbRequestResult|None:
+  """movie detail 응답을 변환합니다. 상세 정보가 없는 줄(daily export 등)은 None"""
+  if not payload.get("id") or not payload.get("title"):
+    return None
+  payload.setdefault("credits", {"cast": [], "crew": []})
+  payload.setdefault("watch/providers", {"results": {}})
+  payload.setdefault("external_ids", {})
+  payload.setdefault("overview", None)
+  payload.setdefault("poster_path", None)
+  try:
+    return tmdb_parse_movie(payload["id"], payload, MAX_CASTS)
+  except (KeyError, TypeError, ValueError):
+    return None
+
+def import_batch(db: Session, payloads: List[dict], fetch: bool, stats: ImportStats) -> List[MovieInfoInternal]:
+  results: List[TmdbRequestResult] = []
+  original_titles: dict[int, str] = {}
+  parsed = [parse_payload(payload) for payload in payloads]
+  if fetch:
+    # 상세 정보가 없는 줄은 TMDB에서 동시에 불러옴 (응답 캐시를 거침)
+    missing = [i for i, (payload, result) in enumerate(zip(payloads, parsed)) if result is None and payload.get("id") and not payload.get("adult")]
+    fetched = tmdb_request_movies([payloads[i]["id"] for i in missing], max_casts=MAX_CASTS) if missing else []
+    for i, result in zip(missing, fetched):
+      parsed[i] = result
+
+  for payload, result in zip(payloads, parsed):
+    if result is None:
+      stats.skipped += 1
+      continue
+    results.append(result)
+    if payload.get("original_title"):
+      original_titles[result.id] = payload["original_title"]
+
+  movies = u.upsert_movies_with_tmdb(db, results)
+  if results and not movies:
+    stats.failed += len(results)
+    return []
+  stats.imported += len(movies)
+
+  # 원제로도 찾을 수 있도록 alias 등록
+  aliases = [
+    {"movie_id": movie.id, "aliased_name": original_titles[movie.tmdb_id]}
+    for movie in movies
+    if original_titles.get(movie.tmdb_id) and original_titles[movie.tmdb_id] != movie.title
+  ]
+  if aliases:
+    u._insert_ignore(db, m.MovieAlias, aliases)
+    db.commit()
+    movie_title_index.add_aliases((i["movie_id"], i["aliased_name"]) for i in aliases)
+  return movies
+
+def register_fuzzy_index(movies: List[MovieInfoInternal]):
+  from datetime import datetime, timezone
+  from database.chroma import MovieMeta, chroma_insert_many
+
+  now = datetime.now(timezone.utc).isoformat()
+  chroma_insert_many([MovieMeta(
+    sqlite_id=movie.id,
+    tmdb_id=movie.tmdb_id,
+    title=movie.title,
+    release_date=movie.release_date.isoformat() if movie.release_date else None,
+    genres=movie.genres,
+    created_at=now
+  ) for movie in movies])
+
+def import_catalog(path: str, batch_size: int = DEFAULT_BATCH_SIZE, fetch: bool = False, index: bool = True, restart: bool = False) -> ImportStats:
+  line, imported = (0, 0) if restart else load_checkpoint(path)
+  stats = ImportStats(line, imported)
+  if line:
+    print(f"[import] checkpoint에서 이어서 진행합니다 ({line}줄부터)")
+
+  with m.SessionLocal() as db:
+    for last_line, payloads in read_batches(path, line, batch_size):
+      movies = import_batch(db, payloads, fetch, stats)
+      if index and movies:
+        register_fuzzy_index(movies)
+      stats.line = last_line
+      save_checkpoint(path, stats)
+      print(stats.report())
+
+  print(stats.report("[import] 완료:"))
+  return stats
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="TMDB JSON-lines dump를 MovieChat DB에 가져옵니다")
+  parser.add_argument("path", help="JSON-lines 파일 (.gz 가능)")
+  parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="transaction 하나에 넣을 줄 수")
+  parser.add_argument("--fetch", action="store_true", help="상세 정보가 없는 줄은 TMDB에서 불러옴")
+  parser.add_argument("--no-index", action="store_true", help="fuzzy search index(chroma)에 등록하지 않음")
+  parser.add_argument("--restart", action="store_true", help="checkpoint를 무시하고 처음부터 진행")
+  args = parser.parse_args()
+  import_catalog(args.path, args.batch_size, args.fetch, not args.no_index, args.restart)
@@ -61,4 +61,8 @@ class MovieInfoInternal(BaseModel):
 
 class ChatRoomContext(BaseModel):
   session_id: str
-  summary: str
\ No newline at end of file
+  summary: str
+
+class ChatMemoryInternal(BaseModel):
+  summary: str
+  messages: List[dict]
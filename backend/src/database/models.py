@@ -7,14 +7,63 @@ from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Mapped, mapped_column
 from datetime import date, datetime, timezone
 from sqlalchemy.orm.attributes import flag_modified
-from common.env import ENV_BACKEND_ROOT
+from common.env import ENV_BACKEND_ROOT, ENV_DB_PROFILE
 
 # SQLite 경로 지정 (상대경로 or 전복로)
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{ENV_BACKEND_ROOT}/src/database/moviechat.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# engine profile 목록. 환경변수 DB_PROFILE로 선택합니다. (기본값: dev)
+# * dev: SQLite 기본 설정 (rollback journal)
+# * production: WAL 모드 + 동시 접속용 설정.
+#   writer(db_append_chat_message 등)와 reader(영화 목록 조회 등)가 서로를 막지 않습니다.
+ENGINE_PROFILES: dict[str, dict] = {
+    "dev": {
+        "pragmas": {},
+        "pool": {},
+    },
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 256 * 1024 * 1024, # bytes
+            "cache_size": -64 * 1024,       # 음수면 KiB 단위 (= 64MiB)
+            "busy_timeout": 5000,           # ms
+            "temp_store": "MEMORY",
+        },
+        "pool": {
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_timeout": 30,
+        },
+    },
+}
+
+def get_engine_profile(profile: str) -> dict:
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"알 수 없는 DB_PROFILE입니다: {profile} (가능한 값: {', '.join(ENGINE_PROFILES)})")
+    return ENGINE_PROFILES[profile]
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = ENV_DB_PROFILE) -> Engine:
+    """`profile`(ENGINE_PROFILES 참고) 설정이 적용된 SQLite engine을 생성합니다"""
+    config = get_engine_profile(profile)
+
+    new_engine = create_engine(
+        url, connect_args={"check_same_thread": False}, **config["pool"]
+    )
+    attach_sqlite_pragmas(new_engine, config["pragmas"])
+    return new_engine
+
+def attach_sqlite_pragmas(target: Engine, pragmas: dict):
+    """`target` engine에서 새로 연결되는 connection마다 `pragmas`를 적용합니다"""
+    if not pragmas:
+        return
+
+    @event.listens_for(target, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f"PRAGMA {key}={value};")
+        cursor.close()
 
 @event.listens_for(Engine, "connect")
 def enable_sqlite_fk_constraints(dbapi_connection, connection_record):
@@ -22,6 +71,8 @@ def enable_sqlite_fk_constraints(dbapi_connection, connection_record):
     cursor.execute("PRAGMA foreign_keys=ON;")
     cursor.close()
 
+engine = make_engine()
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
@@ -35,6 +86,7 @@ TABLE_BOOKMARKED_MOVIE  = "bookmarked_movies"
 TABLE_ARCHIVED_MOVIE    = "archived_movies"
 TABLE_CHAT_ROOM         = "chat_rooms"
 TABLE_CHAT_HISTORY      = "chat_history"
+TABLE_CHAT_MEMORY_EVENT = "chat_memory_events"
 TABLE_CHARACTER_PROFILE = "character_profiles"
 TABLE_DIRECTOR          = "directors"
 TABLE_GENRE             = "genres"
@@ -62,25 +114,25 @@ class Movie(Base):
     __tablename__ = TABLE_MOVIE
     id              : Mapped[int]           = mapped_column(primary_key=True, index=True, autoincrement=True)
     tmdb_id         : Mapped[Optional[int]] = mapped_column(unique=True, nullable=True)
-    title           : Mapped[str]           = mapped_column(nullable=False)
+    title           : Mapped[str]           = mapped_column(nullable=False, index=True)
     tmdb_overview   : Mapped[Optional[str]]
     wiki_document   : Mapped[Optional[str]]
     release_date    : Mapped[Optional[date]]
     poster_img_url  : Mapped[Optional[str]]
     trailer_img_url : Mapped[Optional[str]]
-    last_update     : Mapped[datetime]      = mapped_column(DateTime(timezone=True), nullable=False, default=current_time)
+    last_update     : Mapped[datetime]      = mapped_column(DateTime(timezone=True), nullable=False, default=current_time, index=True)
 
 class MovieReview(Base):
     """쿼리 성능 최적화를 위해 별도 분리"""
     __tablename__ = TABLE_MOVIE_REVIEW
     id       : Mapped[int] = mapped_column(primary_key=True)
-    movie_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_MOVIE), ondelete="CASCADE"), nullable=False)
+    movie_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_MOVIE), ondelete="CASCADE"), nullable=False, index=True)
     text     : Mapped[str] = mapped_column(nullable=False)
 
 class RecommendedMovie(Base):
     __tablename__ = TABLE_RECOMMENDED_MOVIE
     chat_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_CHAT_HISTORY), ondelete="CASCADE"), primary_key=True, nullable=False)
-    movie_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_MOVIE), ondelete="CASCADE"), primary_key=True, nullable=False)
+    movie_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_MOVIE), ondelete="CASCADE"), primary_key=True, nullable=False, index=True)
 
 @event.listens_for(Movie, "before_update", propagate=True)
 def auto_update_last_modified(mapper, connection, target: Movie):
@@ -90,13 +142,13 @@ def auto_update_last_modified(mapper, connection, target: Movie):
 class BookmarkedMovie(Base):
     __tablename__ = TABLE_BOOKMARKED_MOVIE
     movie_id   : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_MOVIE), ondelete="CASCADE"), primary_key=True)
-    user_id    : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_USER), ondelete="CASCADE"),  primary_key=True)
+    user_id    : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_USER), ondelete="CASCADE"),  primary_key=True, index=True)
     created_at : Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=current_time)
 
 class ArchivedMovie(Base):
     __tablename__ = TABLE_ARCHIVED_MOVIE
     movie_id   : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_MOVIE), ondelete="CASCADE"), primary_key=True)
-    user_id    : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_USER), ondelete="CASCADE"),  primary_key=True)
+    user_id    : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_USER), ondelete="CASCADE"),  primary_key=True, index=True)
     rating     : Mapped[int]      = mapped_column(nullable=False)
     created_at : Mapped[datetime] = mapped_column(DateTime(timezone=True), default=current_time)
 
@@ -111,7 +163,7 @@ class Director(Base):
 class ChatRoom(Base):
     __tablename__ = TABLE_CHAT_ROOM
     id           : Mapped[int]      = mapped_column(primary_key=True, index=True, autoincrement=True)
-    user_id      : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_USER), ondelete="CASCADE"), nullable=False)
+    user_id      : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_USER), ondelete="CASCADE"), nullable=False, index=True)
     character_id : Mapped[Optional[int]] = mapped_column(ForeignKey(fk(TABLE_CHARACTER_PROFILE), ondelete="SET NULL"))
     title        : Mapped[str]      = mapped_column(nullable=False)
     summary      : Mapped[str]      = mapped_column(nullable=False, default="")
@@ -120,11 +172,27 @@ class ChatRoom(Base):
 class ChatHistory(Base):
     __tablename__ = TABLE_CHAT_HISTORY
     id        : Mapped[int]      = mapped_column(primary_key=True, index=True, autoincrement=True)
-    room_id   : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_CHAT_ROOM), ondelete="CASCADE"))
+    room_id   : Mapped[int]      = mapped_column(ForeignKey(fk(TABLE_CHAT_ROOM), ondelete="CASCADE"), index=True)
     ai_chat   : Mapped[str]      = mapped_column(nullable=False)
     user_chat : Mapped[str]      = mapped_column(nullable=False)
     timestamp : Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=current_time)
 
+class ChatMemoryEvent(Base):
+    """
+    채팅방 memory(ConversationSummaryBufferMemory)의 append-only log.  
+    kind가 snapshot이면 그 시점의 summary와 buffer의 모든 message가,
+    message면 그 turn에 새로 추가된 message들만,
+    prune이면 buffer를 정리한 뒤의 새 summary와 앞에서 지운 message 수(messages에 `{"pruned": n}`)가 담겨 있음.
+    (memory = 마지막 snapshot + 그 이후의 event들을 순서대로 적용)
+    """
+    __tablename__ = TABLE_CHAT_MEMORY_EVENT
+    id         : Mapped[int]           = mapped_column(primary_key=True, autoincrement=True)
+    room_id    : Mapped[int]           = mapped_column(ForeignKey(fk(TABLE_CHAT_ROOM), ondelete="CASCADE"), nullable=False, index=True)
+    kind       : Mapped[str]           = mapped_column(nullable=False)
+    summary    : Mapped[Optional[str]]
+    messages   : Mapped[str]           = mapped_column(nullable=False) # messages_to_dict 결과의 JSON (prune은 {"pruned": n})
+    created_at : Mapped[datetime]      = mapped_column(DateTime(timezone=True), nullable=False, default=current_time)
+
 class CharacterProfile(Base):
     __tablename__ = TABLE_CHARACTER_PROFILE
     id             : Mapped[int] = mapped_column(primary_key=True, index=True, autoincrement=True)
@@ -161,26 +229,36 @@ class Platform(Base):
 class MovieAlias(Base):
     __tablename__ = TABLE_MOVIE_ALIAS
     movie_id     : Mapped[int]  = mapped_column(ForeignKey(fk(TABLE_MOVIE), ondelete="CASCADE"), nullable=False, primary_key=True)
-    aliased_name : Mapped[str]  = mapped_column(nullable=False, primary_key=True)
+    aliased_name : Mapped[str]  = mapped_column(nullable=False, primary_key=True, index=True)
 
 class MovieGenre(Base):
     __tablename__ = REL_MOVIE_GENRE
     movie_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_MOVIE), ondelete="CASCADE"), primary_key=True, nullable=False)
-    genre_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_GENRE), ondelete="CASCADE"), primary_key=True, nullable=False)
+    genre_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_GENRE), ondelete="CASCADE"), primary_key=True, nullable=False, index=True)
 
 class MovieActor(Base):
     __tablename__ = REL_MOVIE_ACTOR
     movie_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_MOVIE), ondelete="CASCADE"), primary_key=True, nullable=False)
-    actor_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_ACTOR), ondelete="CASCADE"), primary_key=True, nullable=False)
+    actor_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_ACTOR), ondelete="CASCADE"), primary_key=True, nullable=False, index=True)
 
 class MoviePlatform(Base):
     __tablename__ = REL_MOVIE_PLATFORM
     movie_id    : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_MOVIE),    ondelete="CASCADE"),    primary_key=True, nullable=False)
-    platform_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_PLATFORM), ondelete="CASCADE"), primary_key=True, nullable=False)
+    platform_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_PLATFORM), ondelete="CASCADE"), primary_key=True, nullable=False, index=True)
 
 class MovieDirector(Base):
     __tablename__ = REL_MOVIE_DIRECTOR
     movie_id    : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_MOVIE),    ondelete="CASCADE"), primary_key=True, nullable=False)
-    director_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_DIRECTOR), ondelete="CASCADE"), primary_key=True, nullable=False)
+    director_id : Mapped[int] = mapped_column(ForeignKey(fk(TABLE_DIRECTOR), ondelete="CASCADE"), primary_key=True, nullable=False, index=True)
+
+def create_missing_indexes(bind: Engine):
+    """
+    이미 만들어진 moviechat.db에는 create_all이 새로 추가된 index를 만들어주지 않기 때문에,
+    model에 정의된 index 중 DB에 없는 것들을 생성합니다. (여러 번 호출해도 안전함)
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+Base.metadata.create_all(bind=engine)
+create_missing_indexes(engine)
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+database.utils의 db_* 쿼리들의 실행 계획(EXPLAIN QUERY PLAN)을 검사합니다.
+
+각 함수를 sample 데이터가 들어있는 in-memory DB에서 실행해 실제로 나가는 SQL을 수집한 뒤,
+index 없이 table 전체를 훑는(full table scan) 쿼리가 있으면 실패합니다.
+model에 index를 추가/삭제하거나 db_* 함수의 쿼리를 바꿨다면 한 번 돌려주세요.
+
+```bash
+# pwd = backend/src
+python -m database.query_plan
+```
+"""
+
+import re
+import sys
+from typing import Callable
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+import database.models as m
+import database.utils as u
+from datetime import timedelta
+from database.refresh import MovieRefreshScheduler
+
+# 크기가 작아서 full scan이어도 상관없는 table
+SCAN_ALLOWED_TABLES = {m.TABLE_GENRE, m.TABLE_PLATFORM}
+
+# "SCAN table", "SCAN table USING (COVERING) INDEX ..." 모두 table(index) 전체를 훑음
+_SCAN_PATTERN = re.compile(r"^SCAN (\w+)")
+
+def _seed(db: Session) -> dict:
+  user = m.User(email="plan@moviechat", password="pw", nickname="plan")
+  db.add(user)
+  db.flush()
+  room = m.ChatRoom(user_id=user.id, title="plan")
+  movie = m.Movie(tmdb_id=1, title="plan movie")
+  genre = m.Genre(name="plan genre")
+  director = m.Director(tmdb_id=1, name="d", original_name="d")
+  actor = m.Actor(tmdb_id=1, name="a", original_name="a")
+  db.add_all([room, movie, genre, director, actor])
+  db.flush()
+  chat = m.ChatHistory(room_id=room.id, user_chat="u", ai_chat="a")
+  memory = m.ChatMemoryEvent(room_id=room.id, kind=u.MEMORY_EVENT_SNAPSHOT, summary="", messages="[]")
+  character = m.CharacterProfile(movie_id=movie.id, name="c", actor_id=actor.id)
+  db.add_all([
+    chat, memory, character,
+    m.MovieGenre(movie_id=movie.id, genre_id=genre.id),
+    m.MovieDirector(movie_id=movie.id, director_id=director.id),
+    m.MovieActor(movie_id=movie.id, actor_id=actor.id),
+    m.MovieAlias(movie_id=movie.id, aliased_name="plan alias"),
+    m.MovieReview(movie_id=movie.id, text="review"),
+    m.BookmarkedMovie(movie_id=movie.id, user_id=user.id),
+    m.ArchivedMovie(movie_id=movie.id, user_id=user.id, rating=5),
+  ])
+  db.flush()
+  db.add(m.RecommendedMovie(chat_id=chat.id, movie_id=movie.id))
+  db.commit()
+  return {"user": user.id, "room": room.id, "movie": movie.id, "character": character.id}
+
+def hot_queries(ids: dict) -> dict[str, Callable[[Session], object]]:
+  """검사할 db_* 함수 목록 (이름 -> 호출 방법)"""
+  user, room, movie, character = ids["user"], ids["room"], ids["movie"], ids["character"]
+  return {
+    "db_find_user":                   lambda db: u.db_find_user(db, "plan@moviechat"),
+    "db_find_user_by_id":             lambda db: u.db_find_user_by_id(db, user),
+    "db_get_chatroom":                lambda db: u.db_get_chatroom(db, room),
+    "db_get_user_chatrooms":          lambda db: u.db_get_user_chatrooms(db, user),
+    "db_get_chatroom_context":        lambda db: u.db_get_chatroom_context(db, room),
+    "db_get_chat_messages":           lambda db: u.db_get_chat_messages(db, user, room),
+    "db_get_chat_messages (page)":    lambda db: u.db_get_chat_messages(db, user, room, before=2**31, limit=20),
+    "db_get_chatroom_memory":         lambda db: u.db_get_chatroom_memory(db, room),
+    "db_get_bookmarked_movies":       lambda db: u.db_get_bookmarked_movies(db, user),
+    "db_get_archived_movies":         lambda db: u.db_get_archived_movies(db, user),
+    "db_get_watchlist":               lambda db: u.db_get_watchlist(db, user),
+    "db_find_movie_by_id":            lambda db: u.db_find_movie_by_id(db, movie, True, user),
+    "db_find_movie_by_tmdb_id":       lambda db: u.db_find_movie_by_tmdb_id(db, 1),
+    "db_find_movies_by_tmdb_title":   lambda db: u.db_find_movies_by_tmdb_title(db, "plan movie"),
+    "db_find_movies_by_alias":        lambda db: u.db_find_movies_by_alias(db, "plan alias"),
+    "db_get_movie_reviews":           lambda db: u.db_get_movie_reviews(db, movie, None),
+    "db_get_recommended_movies":      lambda db: u.db_get_recommended_movies(db, room),
+    "db_get_character_profile_by_id": lambda db: u.db_get_character_profile_by_id(db, character),
+    "MovieRefreshScheduler.scan":     lambda db: MovieRefreshScheduler(stale_after=timedelta(0)).scan(db),
+  }
+
+def full_scans(db: Session, statement: str, params) -> list[str]:
+  """
+  `statement`의 실행 계획 중 full table scan인 table 이름들을 반환합니다.
+  subquery/CTE 결과를 훑는 것은 table이 아니므로 제외합니다.
+  """
+  plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params).all()
+  scans = []
+  for row in plan:
+    found = _SCAN_PATTERN.match(row[-1])
+    if not found:
+      continue
+    table = found.group(1)
+    if table in m.Base.metadata.tables and table not in SCAN_ALLOWED_TABLES:
+      scans.append(table)
+  return scans
+
+def check_query_plans() -> dict[str, list[str]]:
+  """
+  hot_queries()의 모든 함수를 실행해 full table scan이 있는 쿼리를 찾습니다.
+  Returns:
+    함수 이름 -> 문제가 된 "table: SQL" list (문제가 없는 함수는 포함되지 않음)
+  """
+  engine = create_engine("sqlite://")
+  m.Base.metadata.create_all(bind=engine)
+  session = sessionmaker(bind=engine, autoflush=False)
+
+  captured: list[tuple[str, object]] = []
+  @event.listens_for(engine, "before_cursor_execute")
+  def capture(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith("SELECT"):
+      captured.append((statement, parameters))
+
+  with session() as db:
+    ids = _seed(db)
+
+  failures: dict[str, list[str]] = {}
+  for name, query in hot_queries(ids).items():
+    with session() as db:
+      u.movie_detail_cache.clear()
+      captured.clear()
+      query(db)
+      statements = list(captured)
+      for statement, params in statements:
+        for table in full_scans(db, statement, params):
+          failures.setdefault(name, []).append(f"{table}: {' '.join(statement.split())}")
+  return failures
+
+if __name__ == "__main__":
+  failures = check_query_plans()
+  for name, scans in failures.items():
+    print(f"[query plan] {name}에서 full table scan이 발생합니다")
+    for scan in scans:
+      print(f"  - {scan}")
+  if failures:
+    sys.exit(1)
+  print("[query plan] 모든 쿼리가 index를 사용합니다")
@@ -0,0 +1,171 @@
+"""
+오래된(last_update가 MOVIE_FRESH_FOR보다 지난) 영화 정보를 background에서 TMDB로 갱신합니다.
+
+채팅 요청 중에 TMDB를 기다리지 않도록, 서버가 떠 있는 동안 `MOVIE_REFRESH_INTERVAL`초마다
+우선순위가 높은 영화부터 `batch_size`개씩만 갱신합니다. (TMDB rate limit 보호)
+우선순위는 최근 조회(`movie_access_log`)와 북마크 수가 높을수록, 오래될수록 높습니다.
+
+main.py의 lifespan에서 시작/종료되며, 상태는 `movie_refresh_scheduler.stats()`로 확인할 수 있습니다.
+"""
+
+import asyncio
+import heapq
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+import sqlalchemy as sql
+from sqlalchemy.orm import Session
+import database.models as m
+import database.utils as u
+from database.cache import movie_access_log
+from common.env import ENV_MOVIE_REFRESH_INTERVAL
+from common.tmdb_utils import tmdb_request_movies
+
+# 한 번에 우선순위를 계산할 오래된 영화 수 (오래된 순)
+REFRESH_SCAN_LIMIT = 500
+REFRESH_BATCH_SIZE = 20
+# 이 시간 안에 조회된 영화는 우선순위를 높임
+RECENT_ACCESS_WINDOW = 60 * 60 * 24
+
+def refresh_priority(bookmarks: int, last_access: float|None, overdue: timedelta, now: float) -> float:
+  """클수록 먼저 갱신합니다"""
+  score = math.log1p(bookmarks)
+  if last_access is not None:
+    hours = max(now - last_access, 0) / 3600
+    score += 2.0 / (1.0 + hours)
+  score += min(overdue.total_seconds() / (60 * 60 * 24 * 30), 1.0) * 0.5
+  return score
+
+class MovieRefreshScheduler:
+  def __init__(
+    self,
+    session_factory: Callable[[], Session] = lambda: m.SessionLocal(),
+    stale_after: timedelta = u.MOVIE_FRESH_FOR,
+    batch_size: int = REFRESH_BATCH_SIZE,
+    interval: float = ENV_MOVIE_REFRESH_INTERVAL,
+    scan_limit: int = REFRESH_SCAN_LIMIT,
+  ):
+    self.session_factory = session_factory
+    self.stale_after = stale_after
+    self.batch_size = batch_size
+    self.interval = interval
+    self.scan_limit = scan_limit
+    # (-priority, movie id, tmdb id, last_update)
+    self._queue: list[tuple[float, int, int, datetime]] = []
+    self._task: asyncio.Task|None = None
+    self.refreshed = 0
+    self.failed = 0
+    self.last_scan_at: float|None = None
+    self.last_batch_at: float|None = None
+    self.last_batch_max_lag: float = 0.0
+
+  def _cutoff(self) -> datetime:
+    return m.current_time() - self.stale_after
+
+  def scan(self, db: Session) -> int:
+    """오래된 영화들의 우선순위를 계산해 queue를 다시 만듭니다. queue 길이를 반환합니다"""
+    now = time.time()
+    cutoff = self._cutoff()
+    recent = movie_access_log.since(RECENT_ACCESS_WINDOW)
+    bookmarks = (
+      sql.select(sql.func.count())
+      .where(m.BookmarkedMovie.movie_id == m.Movie.id)
+      .scalar_subquery()
+    )
+    base = (
+      sql.select(m.Movie.id, m.Movie.tmdb_id, m.Movie.last_update, bookmarks)
+      .where(m.Movie.tmdb_id.is_not(None))
+      .where(m.Movie.last_update < cutoff)
+    )
+    oldest = db.execute(base.order_by(m.Movie.last_update).limit(self.scan_limit)).all()
+    # 북마크가 많거나 최근 조회된 영화는 오래된 순서와 상관 없이 포함
+    bookmarked = db.execute(
+      base.where(sql.exists().where(m.BookmarkedMovie.movie_id == m.Movie.id))
+      .order_by(bookmarks.desc())
+      .limit(self.scan_limit)
+    ).all()
+    accessed = db.execute(base.where(m.Movie.id.in_(recent.keys()))).all() if recent else []
+
+    candidates = {row[0]: row for row in [*oldest, *bookmarked, *accessed]}
+    queue = []
+    for id, tmdb_id, last_update, bookmark_count in candidates.values():
+      overdue = cutoff - _as_utc(last_update)
+      priority = refresh_priority(bookmark_count, recent.get(id), overdue, now)
+      queue.append((-priority, id, tmdb_id, last_update))
+    heapq.heapify(queue)
+    self._queue = queue
+    self.last_scan_at = now
+    return len(queue)
+
+  def refresh_batch(self, db: Session) -> int:
+    """queue에서 우선순위가 높은 batch_size개를 TMDB에서 갱신합니다. 갱신된 영화 수를 반환합니다"""
+    batch = [heapq.heappop(self._queue) for _ in range(min(self.batch_size, len(self._queue)))]
+    if not batch:
+      return 0
+
+    # 다른 worker가 먼저 갱신했을 수 있으므로 아직 오래된 것만 요청
+    fresh = u._find_fresh_movies(db, [tmdb_id for _, _, tmdb_id, _ in batch])
+    batch = [i for i in batch if i[2] not in fresh]
+    if not batch:
+      return 0
+
+    now = m.current_time()
+    self.last_batch_max_lag = max((now - self.stale_after - _as_utc(i[3])).total_seconds() for i in batch)
+    results = tmdb_request_movies([tmdb_id for _, _, tmdb_id, _ in batch])
+    fetched = [i for i in results if i is not None]
+    updated = u.upsert_movies_with_tmdb(db, fetched)
+    self.refreshed += len(updated)
+    self.failed += len(batch) - len(updated)
+    self.last_batch_at = time.time()
+    return len(updated)
+
+  def run_once(self) -> int:
+    with self.session_factory() as db:
+      if not self._queue:
+        self.scan(db)
+      return self.refresh_batch(db)
+
+  async def run_forever(self):
+    while True:
+      try:
+        refreshed = await asyncio.to_thread(self.run_once)
+        if refreshed:
+          print(f"[movie refresh] {refreshed}개 영화 갱신 (queue {len(self._queue)})")
+      except Exception as e:
+        print(f"[movie refresh] 갱신 실패: {e}")
+      await asyncio.sleep(self.interval)
+
+  def start(self):
+    if self.interval > 0 and self._task is None:
+      self._task = asyncio.create_task(self.run_forever())
+
+  async def stop(self):
+    if self._task is not None:
+      self._task.cancel()
+      try:
+        await self._task
+      except asyncio.CancelledError:
+        pass
+      self._task = None
+
+  def stats(self) -> dict:
+    """queue 길이, 갱신/실패 수, 갱신 지연(오래된 상태로 남아있던 시간, 초) 등을 반환합니다"""
+    queue = list(self._queue)
+    cutoff = self._cutoff()
+    return {
+      "queue_depth": len(queue),
+      "refreshed": self.refreshed,
+      "failed": self.failed,
+      "oldest_queued_lag": max(((cutoff - _as_utc(i[3])).total_seconds() for i in queue), default=0.0),
+      "last_batch_max_lag": self.last_batch_max_lag,
+      "last_scan_at": self.last_scan_at,
+      "last_batch_at": self.last_batch_at,
+      "rate_limit_per_minute": self.batch_size * 60 / self.interval if self.interval > 0 else 0,
+    }
+
+def _as_utc(value: datetime) -> datetime:
+  # SQLite는 timezone 정보를 저장하지 않으므로 UTC로 간주
+  return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+movie_refresh_scheduler = MovieRefreshScheduler()
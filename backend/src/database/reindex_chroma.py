@@ -0,0 +1,91 @@
+"""
+영화 제목 fuzzy search용 chroma DB(`database/chroma`)를 `movies`, `movie_aliases` table로 다시 만듭니다.
+
+영화를 id 순서로 `--batch-size`개씩 읽어 등록(upsert)하므로 메모리 사용량이 영화 수와 상관 없이 일정하며,
+embedding은 `common/embeddings.py`의 캐시를 거치므로 바뀌지 않은 영화는 embedding 요청을 하지 않습니다.
+끝나면 DB에 없는 영화의 document와 예전에 중복으로 쌓인 document를 지웁니다.
+
+```bash
+# pwd = backend/src
+python -m database.reindex_chroma --batch-size 256
+```
+"""
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Iterator, List
+import sqlalchemy as sql
+from sqlalchemy.orm import Session
+import database.models as m
+from database.chroma import MovieMeta, _chroma_get, _doc_id, chroma_insert_many
+
+DEFAULT_BATCH_SIZE = 256
+
+def read_movie_metas(db: Session, batch_size: int) -> Iterator[List[MovieMeta]]:
+  """id 순서로 batch_size개씩 MovieMeta를 만들어 반환합니다"""
+  last_id = 0
+  while True:
+    movies = db.execute(
+      sql.select(m.Movie.id, m.Movie.tmdb_id, m.Movie.title, m.Movie.release_date)
+      .where(m.Movie.id > last_id)
+      .order_by(m.Movie.id)
+      .limit(batch_size)
+    ).all()
+    if not movies:
+      return
+    ids = [movie.id for movie in movies]
+    last_id = ids[-1]
+
+    genres: dict[int, List[str]] = {}
+    for movie_id, name in db.execute(
+      sql.select(m.MovieGenre.movie_id, m.Genre.name)
+      .join(m.Genre, m.Genre.id == m.MovieGenre.genre_id)
+      .where(m.MovieGenre.movie_id.in_(ids))
+    ):
+      genres.setdefault(movie_id, []).append(name)
+    aliases: dict[int, List[str]] = {}
+    for movie_id, name in db.execute(
+      sql.select(m.MovieAlias.movie_id, m.MovieAlias.aliased_name).where(m.MovieAlias.movie_id.in_(ids))
+    ):
+      aliases.setdefault(movie_id, []).append(name)
+
+    now = datetime.now(timezone.utc).isoformat()
+    yield [MovieMeta(
+      sqlite_id=movie.id,
+      tmdb_id=movie.tmdb_id,
+      title=movie.title,
+      release_date=movie.release_date.isoformat() if movie.release_date else None,
+      genres=genres.get(movie.id, []),
+      created_at=now,
+      aliases=[i for i in aliases.get(movie.id, []) if i != movie.title]
+    ) for movie in movies]
+
+def remove_orphans(indexed: set[str]) -> int:
+  """DB에 없는 영화의 document를 지우고, 지운 수를 반환합니다"""
+  collection = _chroma_get()._collection
+  orphans = [id for id in collection.get(include=[])["ids"] if id not in indexed]
+  for start in range(0, len(orphans), 5000):
+    collection.delete(ids=orphans[start:start + 5000])
+  return len(orphans)
+
+def reindex(batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+  started_at = time.monotonic()
+  indexed: set[str] = set()
+  with m.SessionLocal() as db:
+    for metas in read_movie_metas(db, batch_size):
+      chroma_insert_many(metas)
+      indexed.update(_doc_id(meta.sqlite_id) for meta in metas)
+      elapsed = max(time.monotonic() - started_at, 1e-9)
+      print(f"[reindex] 영화 {len(indexed)}개 등록 | {len(indexed) / elapsed:.1f} movies/s, {elapsed:.1f}s")
+
+  removed = remove_orphans(indexed)
+  elapsed = max(time.monotonic() - started_at, 1e-9)
+  print(f"[reindex] 완료: 영화 {len(indexed)}개, 오래된 document {removed}개 삭제 | {len(indexed) / elapsed:.1f} movies/s, {elapsed:.1f}s")
+  return {"indexed": len(indexed), "removed": removed, "elapsed": elapsed}
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="영화 제목 fuzzy search용 chroma DB를 다시 만듭니다")
+  parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="한 번에 등록할 영화 수")
+  args = parser.parse_args()
+  reindex(args.batch_size)
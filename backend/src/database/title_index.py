@@ -0,0 +1,171 @@
+"""
+영화 제목/별칭(alias)을 메모리에 올려두고 RapidFuzz로 찾는 index입니다.
+
+`fuzzy_fast`가 embedding 요청 없이 대부분의 제목을 바로 찾을 수 있도록, chroma 검색보다 먼저 사용됩니다.
+정규화한 제목이 정확히 같으면 바로, 아니면 RapidFuzz 점수가 `TITLE_MATCH_THRESHOLD` 이상일 때만 반환하며
+그보다 낮으면 None을 반환하므로 호출하는 쪽에서 chroma(vector search)로 넘어가면 됩니다.
+점수가 높더라도 다음과 같은 경우에는 다른 영화로 보고 반환하지 않습니다.
+* 제목의 숫자(속편 번호)가 다를 때: "Toy Story 3" != "Toy Story 2", "PART TWO" != "PART ONE"
+* keyword의 연도와 개봉 연도가 `TITLE_YEAR_TOLERANCE`년보다 많이 차이날 때: "듄" (2021) != "듄" (1984)
+
+영화/alias가 추가되면 `add_movies`, `add_aliases`로 바로 반영하고,
+다른 worker process에서 추가된 것은 `TITLE_INDEX_RELOAD`초마다 DB에서 다시 불러와 반영합니다.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from typing import Iterable, Optional
+import sqlalchemy as sql
+from sqlalchemy.orm import Session
+from rapidfuzz import fuzz, process
+import database.models as m
+
+# 0 ~ 100, 이보다 낮으면 확신할 수 없으므로 vector search로 넘김
+TITLE_MATCH_THRESHOLD = 88
+# 개봉 연도가 keyword와 일치할 때 더해주는 점수
+TITLE_YEAR_BONUS = 5
+# keyword의 연도와 개봉 연도가 이보다 많이 차이나면 다른 영화로 취급 (나라별 개봉일 차이 허용)
+TITLE_YEAR_TOLERANCE = 1
+TITLE_INDEX_RELOAD = 60 * 10
+
+_PARENTHESES = re.compile(r"[\(\[\<《〈「].*?[\)\]\>》〉」]")
+_NUMBERS = {
+  "ii": "2", "iii": "3", "iv": "4", "v": "5", "vi": "6",
+  "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+}
+_ARTICLES = {"the", "a", "an"}
+_DIGITS = re.compile(r"\d+")
+
+def _title_words(title: str) -> list[str]:
+  text = unicodedata.normalize("NFKC", title).casefold()
+  stripped = _PARENTHESES.sub(" ", text).strip()
+  text = stripped or text
+  text = text.replace("&", " and ")
+  words = re.split(r"[\W_]+", text)
+  words = [_NUMBERS.get(w, w) for w in words if w]
+  if len(words) > 1 and words[0] in _ARTICLES:
+    words = words[1:]
+  return words
+
+def normalize_title(title: str) -> str:
+  """
+  띄어쓰기, 문장부호, 대소문자, 전각/반각 차이를 없앤 비교용 제목을 만듭니다.
+  * 괄호 안 내용 제거: "기생충 (영화)", "Parasite (2019)"
+  * "&" -> "and", 로마 숫자/영어 숫자 -> 아라비아 숫자: "Rocky II" -> "rocky2", "Part One" -> "part1"
+  * 영어 관사 제거: "The Host" -> "host"
+  """
+  return "".join(_title_words(title))
+
+def title_numbers(title: str) -> tuple[str, ...]:
+  """제목에 들어있는 숫자들 (속편 번호 등). 숫자가 다르면 글자가 비슷해도 다른 영화입니다"""
+  return tuple(_DIGITS.findall(" ".join(_title_words(title))))
+
+def _year_of(keyword: Optional[str]) -> Optional[int]:
+  if not keyword:
+    return None
+  found = re.search(r"(19|20)\d{2}", keyword)
+  return int(found.group(0)) if found else None
+
+class TitleIndex:
+  def __init__(self, threshold: float = TITLE_MATCH_THRESHOLD, reload_after: float = TITLE_INDEX_RELOAD):
+    self.threshold = threshold
+    self.reload_after = reload_after
+    self._lock = threading.Lock()
+    self._keys: list[str] = []             # 정규화된 제목/alias (RapidFuzz 검색 대상)
+    self._ids: dict[str, set[int]] = {}    # 정규화된 제목 -> movie id들
+    self._numbers: dict[str, tuple[str, ...]] = {}  # 정규화된 제목 -> 제목의 숫자들
+    self._years: dict[int, Optional[int]] = {}
+    self._loaded_at: Optional[float] = None
+
+  def _add(self, movie_id: int, name: str):
+    key = normalize_title(name)
+    if not key:
+      return
+    ids = self._ids.get(key)
+    if ids is None:
+      self._ids[key] = {movie_id}
+      self._numbers[key] = title_numbers(name)
+      self._keys.append(key)
+    else:
+      ids.add(movie_id)
+
+  def load(self, db: Session):
+    """DB의 모든 영화 제목과 alias로 index를 새로 만듭니다"""
+    movies = db.execute(sql.select(m.Movie.id, m.Movie.title, m.Movie.release_date)).all()
+    aliases = db.execute(sql.select(m.MovieAlias.movie_id, m.MovieAlias.aliased_name)).all()
+    index = TitleIndex(self.threshold, self.reload_after)
+    index.add_movies((id, title, release_date.year if release_date else None) for id, title, release_date in movies)
+    index.add_aliases(aliases)
+    with self._lock:
+      self._keys, self._ids, self._numbers, self._years = index._keys, index._ids, index._numbers, index._years
+      self._loaded_at = time.monotonic()
+
+  def add_movies(self, movies: Iterable[tuple[int, str, Optional[int]]]):
+    """(movie id, 제목, 개봉 연도)들을 추가합니다"""
+    with self._lock:
+      for id, title, year in movies:
+        self._years[id] = year
+        self._add(id, title)
+
+  def add_aliases(self, aliases: Iterable[tuple[int, str]]):
+    """(movie id, alias)들을 추가합니다"""
+    with self._lock:
+      for id, alias in aliases:
+        self._add(id, alias)
+
+  def _ensure_loaded(self, db: Session):
+    if self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_after:
+      self.load(db)
+
+  def _best(self, ids: set[int], year: Optional[int]) -> Optional[int]:
+    """
+    같은 제목의 영화들 중 year와 가장 가까운 영화. 개봉 연도를 모르는 영화는 year와 상관 없이 후보로 봅니다.
+    year와 TITLE_YEAR_TOLERANCE년보다 많이 차이나는 영화만 있다면 None
+    """
+    if year is None:
+      return min(ids)
+    candidates = []
+    for id in ids:
+      released = self._years.get(id)
+      if released is None:
+        candidates.append((TITLE_YEAR_TOLERANCE + 1, id))
+      elif abs(released - year) <= TITLE_YEAR_TOLERANCE:
+        candidates.append((abs(released - year), id))
+    return min(candidates)[1] if candidates else None
+
+  def search(self, db: Session, title: str, keyword: Optional[str] = None) -> Optional[tuple[int, float]]:
+    """
+    제목과 가장 비슷한 영화를 찾습니다.
+    Returns:
+      (movie id, 점수 0 ~ 100). 확신할 수 없다면 None
+    """
+    self._ensure_loaded(db)
+    key = normalize_title(title)
+    if not key:
+      return None
+    year = _year_of(keyword)
+
+    ids = self._ids.get(key)
+    if ids:
+      id = self._best(ids, year)
+      return (id, 100.0) if id is not None else None
+
+    keys = self._keys
+    numbers = title_numbers(title)
+    candidates = process.extract(key, keys, scorer=fuzz.ratio, limit=5, score_cutoff=self.threshold - TITLE_YEAR_BONUS)
+    best: Optional[tuple[int, float]] = None
+    for candidate, score, _ in candidates:
+      if self._numbers.get(candidate, ()) != numbers:
+        continue
+      id = self._best(self._ids[candidate], year)
+      if id is None:
+        continue
+      if year is not None and self._years.get(id) == year:
+        score += TITLE_YEAR_BONUS
+      if score >= self.threshold and (best is None or score > best[1]):
+        best = (id, min(score, 100.0))
+    return best
+
+movie_title_index = TitleIndex()
@@ -1,11 +1,16 @@
 import database.models as m
 from common.tmdb_utils import * 
 import sqlalchemy as sql
+from typing import Sequence
+from datetime import timedelta
+from common.env import ENV_MOVIE_STALE_DAYS
 from sqlalchemy import Column
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import sqlalchemy.dialects.sqlite as sqlite
 from database.internal_types import *
+from database.cache import movie_detail_cache, movie_access_log
+from database.title_index import movie_title_index
 
 def orm_to_dict(obj):
     if obj is None: return None
@@ -21,12 +26,15 @@ def get_db():
 
 ######### 유저 정보 #########
 
-def db_create_new_user(db: Session, email: str, password: str, nickname: str):
-  """user 정보를 생성합니다"""
-  stmt = sql.select(m.User).where(m.User.email == email)
-  res = db.execute(stmt).scalar_one_or_none()
-  if res:
-    return res.id
+def db_create_new_user(db: Session, email: str, password: str, nickname: str) -> int|None:
+  """
+  user 정보를 생성하고 새로 만든 user의 id를 반환합니다.  
+  이미 같은 email의 user가 있다면 (동시에 가입한 경우 포함) None을 반환합니다.
+  기존 user의 id를 반환하면 가입 요청만으로 그 계정으로 로그인할 수 있게 되므로 절대 반환하지 않습니다.
+  """
+  stmt = sql.select(m.User.id).where(m.User.email == email)
+  if db.execute(stmt).scalar_one_or_none() is not None:
+    return None
 
   doc = m.User(email=email, password=password, nickname=nickname)
   db.add(doc)
@@ -105,7 +113,8 @@ def db_delete_user_chatroom(db: Session, room_id: int, user_id: int) -> bool:
   """
   delete user chatroom from the database
   the `user_id` must own the `room_id`.  
-  Otherwise, this function fails. (it does nothing when it fails)
+  Otherwise, this function fails. (it does nothing when it fails)  
+  Returns True only when a chatroom was actually deleted.
   """
   stmt = (
     sql.delete(m.ChatRoom)
@@ -113,10 +122,10 @@ def db_delete_user_chatroom(db: Session, room_id: int, user_id: int) -> bool:
     .where(m.ChatRoom.id == room_id)
   )
 
-  db.execute(stmt)
+  result = db.execute(stmt)
   try:
     db.commit()
-    return True
+    return result.rowcount > 0
   except:
     db.rollback()
     return False
@@ -158,10 +167,13 @@ def db_get_chatroom_context(db: Session, room_id: int) -> ChatRoomContext:
 
 ######### 메시지 기능 관련 #########
 
-def db_get_chat_messages(db: Session, user_id: int, room_id: int) -> List[ChatHistoryInternal]:
+def db_get_chat_messages(db: Session, user_id: int, room_id: int, before: int|None = None, limit: int|None = None) -> List[ChatHistoryInternal]:
   """
-  get all chat histories in ChatRoom `room_id`. If the owner does not match the user information,
-  it returns an empty list.
+  get chat histories in ChatRoom `room_id`, oldest first. If the owner does not match the user information,
+  it returns an empty list.  
+  `before`(chat id cursor) / `limit` keyset-paginate the histories from the latest one:
+  only chats older than `before` are loaded, and at most the latest `limit` of them are returned.
+  the cost depends only on `limit`, not on the length of the room.
   """
   stmt = (
     sql.select(m.ChatHistory)
@@ -169,7 +181,16 @@ def db_get_chat_messages(db: Session, user_id: int, room_id: int) -> List[ChatHi
     .where(m.ChatHistory.room_id == room_id)
     .where(m.ChatRoom.user_id == user_id)
   )
+  if before is not None:
+    stmt = stmt.where(m.ChatHistory.id < before)
+  if limit is not None:
+    stmt = stmt.order_by(m.ChatHistory.id.desc()).limit(limit)
+  else:
+    stmt = stmt.order_by(m.ChatHistory.id.asc())
+
   result = db.execute(stmt).scalars().all()
+  if limit is not None:
+    result = result[::-1]
   return [ChatHistoryInternal(
     id = chat.id,
     room_id = chat.room_id,
@@ -178,9 +199,126 @@ def db_get_chat_messages(db: Session, user_id: int, room_id: int) -> List[ChatHi
     timestamp = chat.timestamp
   ) for chat in result]
 
-def db_append_chat_message(db: Session, room_id: int, usr_msg: str, ai_msg: str, summary: dict) -> ChatHistoryInternal|None:
+MEMORY_EVENT_SNAPSHOT = "snapshot"
+MEMORY_EVENT_MESSAGE = "message"
+MEMORY_EVENT_PRUNE = "prune"
+
+MEMORY_SNAPSHOT_INTERVAL = 20
+"""마지막 snapshot 이후 event가 이 개수만큼 쌓이면 snapshot으로 압축합니다"""
+
+def _read_memory_log(db: Session, room_id: int) -> tuple[str, list[dict], int]|None:
+  """
+  마지막 snapshot과 그 이후의 event들로 memory를 복원합니다.
+  Returns:
+    (summary, buffer의 message들, 마지막 snapshot 이후 event 수). log가 없으면 None
+  """
   import json
 
+  last_snapshot = (
+    sql.select(sql.func.max(m.ChatMemoryEvent.id))
+    .where(m.ChatMemoryEvent.room_id == room_id)
+    .where(m.ChatMemoryEvent.kind == MEMORY_EVENT_SNAPSHOT)
+    .scalar_subquery()
+  )
+  stmt = (
+    sql.select(m.ChatMemoryEvent)
+    .where(m.ChatMemoryEvent.room_id == room_id)
+    .where(m.ChatMemoryEvent.id >= last_snapshot)
+    .order_by(m.ChatMemoryEvent.id.asc())
+  )
+  events = db.execute(stmt).scalars().all()
+  if not events:
+    return None
+
+  snapshot, tail = events[0], events[1:]
+  summary = snapshot.summary or ""
+  messages = json.loads(snapshot.messages)
+  for event in tail:
+    if event.kind == MEMORY_EVENT_PRUNE:
+      summary = event.summary or ""
+      messages = messages[json.loads(event.messages)["pruned"]:]
+    else:
+      messages.extend(json.loads(event.messages))
+  return summary, messages, len(tail)
+
+def _memory_diff(logged: list[dict], current: list[dict]) -> tuple[int, list[dict]]:
+  """
+  log의 message들(`logged`)에서 앞의 몇 개를 지우고 몇 개를 붙이면 현재 buffer(`current`)가 되는지 계산합니다.
+  Returns:
+    (앞에서 지울 message 수, 뒤에 붙일 message들)
+  """
+  for pruned in range(len(logged) + 1):
+    kept = logged[pruned:]
+    if current[:len(kept)] == kept:
+      return pruned, current[len(kept):]
+  return len(logged), current  # 도달하지 않음 (pruned == len(logged)이면 항상 일치)
+
+def _append_memory_event(db: Session, room_id: int, summary: dict):
+  """
+  turn이 끝난 뒤의 memory(`summary`)를 채팅방의 memory log에 반영합니다. (commit 안 함)  
+  log에 기록된 memory와 현재 memory를 비교해서
+  * 새로 추가된 message들만 message event로,
+  * buffer가 정리되어 요약이 바뀌었다면 새 요약과 앞에서 지워진 message 수만 prune event로 남깁니다.
+  이전 turn의 기록이 실패했더라도 log 기준으로 비교하므로 빠진 message까지 같이 기록됩니다.
+  event가 `MEMORY_SNAPSHOT_INTERVAL`개 쌓였을 때만 snapshot을 남기고 이전 event들을 지우므로,
+  한 turn에 쓰는 양은 대화 길이나 buffer 크기와 상관 없이 일정합니다. (snapshot은 N turn마다 한 번)
+  """
+  import json
+
+  messages = summary["messages"]
+  logged = _read_memory_log(db, room_id)
+  if logged is None or logged[2] >= MEMORY_SNAPSHOT_INTERVAL:
+    doc = m.ChatMemoryEvent(
+      room_id=room_id, kind=MEMORY_EVENT_SNAPSHOT,
+      summary=summary["summary"], messages=json.dumps(messages)
+    )
+    db.add(doc)
+    db.flush()
+    db.execute(
+      sql.delete(m.ChatMemoryEvent)
+      .where(m.ChatMemoryEvent.room_id == room_id)
+      .where(m.ChatMemoryEvent.id < doc.id)
+    )
+    return
+
+  logged_summary, logged_messages, _ = logged
+  pruned, added = _memory_diff(logged_messages, messages)
+  if added:
+    db.add(m.ChatMemoryEvent(
+      room_id=room_id, kind=MEMORY_EVENT_MESSAGE,
+      messages=json.dumps(added)
+    ))
+    db.flush()
+  if pruned or summary["summary"] != logged_summary:
+    db.add(m.ChatMemoryEvent(
+      room_id=room_id, kind=MEMORY_EVENT_PRUNE,
+      summary=summary["summary"], messages=json.dumps({"pruned": pruned})
+    ))
+
+def db_get_chatroom_memory(db: Session, room_id: int) -> ChatMemoryInternal|None:
+  """
+  채팅방의 memory를 마지막 snapshot과 그 이후의 event들로 복원합니다.  
+  저장된 memory가 없다면 None을 반환합니다.
+  """
+  import json
+
+  logged = _read_memory_log(db, room_id)
+  if logged is None:
+    # memory log 도입 전에 만들어진 채팅방은 ChatRoom.summary에 memory 전체가 JSON으로 들어있음
+    legacy = db_get_chatroom_context(db, room_id).summary
+    if not legacy:
+      return None
+    legacy = json.loads(legacy)
+    return ChatMemoryInternal(summary=legacy["summary"], messages=legacy["messages"])
+
+  summary, messages, _ = logged
+  return ChatMemoryInternal(summary=summary, messages=messages)
+
+def db_append_chat_message(db: Session, room_id: int, usr_msg: str, ai_msg: str, summary: dict) -> ChatHistoryInternal|None:
+  """
+  채팅 내역을 저장하고, 이번 turn까지의 memory(`summary`)를 memory log에 반영합니다.  
+  memory는 매번 전체를 다시 쓰지 않고 이번 turn의 message만 추가합니다. (`_append_memory_event` 참고)
+  """
   doc = m.ChatHistory(
     room_id=room_id,
     user_chat=usr_msg,
@@ -188,10 +326,8 @@ def db_append_chat_message(db: Session, room_id: int, usr_msg: str, ai_msg: str,
   )
   db.add(doc)
   
-  print(f"[db_append_chat_message] summary:\n{summary}\n\n")
   try:
-    stmt = sql.update(m.ChatRoom).where(m.ChatRoom.id == room_id).values(summary=json.dumps(summary))
-    db.execute(stmt)
+    _append_memory_event(db, room_id, summary)
     db.flush()
     db.commit()
     return ChatHistoryInternal(
@@ -205,23 +341,75 @@ def db_append_chat_message(db: Session, room_id: int, usr_msg: str, ai_msg: str,
     db.rollback()
     return None
 
-######### 기능 관련 #########
+######### 영화 정보 bulk 로딩 #########
+
+def db_get_genres_of_movies(db: Session, movie_ids: list[int]) -> dict[int, list[str]]:
+  """`movie_ids`의 genre들을 쿼리 한 번으로 불러옵니다. (movie id -> genre 이름 list)"""
+  genres: dict[int, list[str]] = {i: [] for i in movie_ids}
+  if not movie_ids:
+    return genres
 
-def db_get_bookmarked_movies(db: Session, user_id: int):
-  """
-  북마크된 영화를 불러옵니다.  
-  genre, character, platform 등의 정보가 필요하다면
-  db_find_movie_id를 추가로 사용하시면 됩니다.
-  만약 너무 불편하다면 말씀해주세요
-  """
   stmt = (
-    sql.select(m.BookmarkedMovie, m.Movie)
-    .where(m.BookmarkedMovie.user_id == user_id)
-    .join(m.Movie, m.Movie.id == m.BookmarkedMovie.movie_id)
+    sql.select(m.MovieGenre.movie_id, m.Genre.name)
+    .join(m.Genre, m.Genre.id == m.MovieGenre.genre_id)
+    .where(m.MovieGenre.movie_id.in_(movie_ids))
+  )
+  for movie_id, name in db.execute(stmt).all():
+    genres[movie_id].append(name)
+  return genres
+
+def db_get_directors_of_movies(db: Session, movie_ids: list[int]) -> dict[int, list[PersonInfoInternal]]:
+  """`movie_ids`의 감독들을 쿼리 한 번으로 불러옵니다. (movie id -> 감독 list)"""
+  directors: dict[int, list[PersonInfoInternal]] = {i: [] for i in movie_ids}
+  if not movie_ids:
+    return directors
+
+  stmt = (
+    sql.select(m.MovieDirector.movie_id, m.Director)
+    .join(m.Director, m.Director.id == m.MovieDirector.director_id)
+    .where(m.MovieDirector.movie_id.in_(movie_ids))
   )
+  for movie_id, d in db.execute(stmt).all():
+    directors[movie_id].append(PersonInfoInternal(id=d.id, name=d.name, profile_image_path=d.profile_path))
+  return directors
+
+def db_get_characters_of_movies(db: Session, movie_ids: list[int]) -> dict[int, list[CharacterInfoInternal]]:
+  """`movie_ids`의 캐릭터(+배우)들을 쿼리 한 번으로 불러옵니다. (movie id -> 캐릭터 list)"""
+  characters: dict[int, list[CharacterInfoInternal]] = {i: [] for i in movie_ids}
+  if not movie_ids:
+    return characters
+
+  stmt = (
+    sql.select(m.CharacterProfile, m.Actor)
+    .where(m.CharacterProfile.movie_id.in_(movie_ids))
+    .outerjoin(m.Actor, m.CharacterProfile.actor_id == m.Actor.id)
+  )
+  for character, actor in db.execute(stmt).all():
+    characters[character.movie_id].append(CharacterInfoInternal(
+      id = character.id,
+      movie_id = character.movie_id,
+      name = character.name,
+      tone = character.tone or "",
+      description = character.description or "",
+      actor = PersonInfoInternal(id = actor.id, name = actor.name, profile_image_path = actor.profile_path) if actor is not None else None
+    ))
+  return characters
+
+def db_hydrate_movies(db: Session, movies: Sequence[m.Movie], characters: bool = False) -> List[MovieInfoInternal]:
+  """
+  Movie row들을 genre, director (`characters`가 True라면 캐릭터까지) 정보가 채워진
+  MovieInfoInternal list로 변환합니다. 입력 순서가 유지됩니다.
+  관계 정보는 영화 개수와 상관 없이 `IN (...)` 쿼리 2~3번으로 한꺼번에 불러오기 때문에,
+  영화 목록을 반환하는 함수에서는 영화마다 쿼리를 날리지 말고 이 함수를 사용해주세요.
+  """
+  ids = list({movie.id for movie in movies})
+  genres = db_get_genres_of_movies(db, ids)
+  directors = db_get_directors_of_movies(db, ids)
+  charas = db_get_characters_of_movies(db, ids) if characters else {}
+
   return [MovieInfoInternal(
     id=movie.id,
-    tmdb_id=movie.tmdb_id,
+    tmdb_id=movie.tmdb_id or 0,
     title=movie.title,
     tmdb_overview=movie.tmdb_overview,
     wiki_document=movie.wiki_document,
@@ -229,11 +417,30 @@ def db_get_bookmarked_movies(db: Session, user_id: int):
     poster_img_url=movie.poster_img_url,
     trailer_img_url=movie.trailer_img_url,
     last_update=movie.last_update,
-    genres=db_get_genres_of_movie(db, movie.id),
-    directors=db_get_directors_of_movie(db, movie.id),
-    bookmarked=True,
-  ) for _, movie in db.execute(stmt).all()]
-  
+    genres=genres[movie.id],
+    directors=directors[movie.id],
+    characters=charas.get(movie.id, []),
+  ) for movie in movies]
+
+######### 기능 관련 #########
+
+def db_get_bookmarked_movies(db: Session, user_id: int):
+  """
+  북마크된 영화를 불러옵니다.
+  genre, director 정보까지 채워져서 반환됩니다.
+  character, platform 등의 정보가 필요하다면
+  db_find_movie_id를 추가로 사용하시면 됩니다.
+  """
+  stmt = (
+    sql.select(m.Movie)
+    .join(m.BookmarkedMovie, m.Movie.id == m.BookmarkedMovie.movie_id)
+    .where(m.BookmarkedMovie.user_id == user_id)
+  )
+  movies = db_hydrate_movies(db, db.execute(stmt).scalars().all())
+  for movie in movies:
+    movie.bookmarked = True
+  return movies
+
 
 def db_add_bookmark(db: Session, user_id: int, movie_id: int):
   stmt = (
@@ -263,25 +470,17 @@ def db_rm_bookmark(db: Session, user_id: int, movie_id: int):
     return False
 
 def db_get_genres_of_movie(db: Session, movie_id: int):
-  stmt = (
-    sql.select(m.Genre.name).join(m.MovieGenre, m.Genre.id == m.MovieGenre.genre_id)
-    .where(m.MovieGenre.movie_id == movie_id)
-  )
-  return [i for i in db.execute(stmt).scalars().all()]
+  return db_get_genres_of_movies(db, [movie_id])[movie_id]
 
 def db_get_directors_of_movie(db: Session, movie_id: int):
-  stmt = (
-    sql.select(m.Director).join(m.MovieDirector, m.Director.id == m.MovieDirector.director_id)
-    .where(m.MovieDirector.movie_id == movie_id)
-  )
-  return [PersonInfoInternal(id=i.id, name=i.name, profile_image_path=i.profile_path) for i in db.execute(stmt).scalars().all()]
+  return db_get_directors_of_movies(db, [movie_id])[movie_id]
 
 def db_get_watchlist(db: Session, user_id: int):
   """
   아카이브되었거나 북마크한 영화 정보를 불러옵니다.
+  genre, director 정보까지 채워져서 반환됩니다.
   character, platform 등의 정보가 필요하다면
   db_find_movie_id를 추가로 사용하시면 됩니다.
-  만약 너무 불편하다면 말씀해주세요
   """
 
   archived_movies = (
@@ -302,46 +501,25 @@ def db_get_watchlist(db: Session, user_id: int):
   # 다시 Movie 전체 객체 가져오기
   stmt = sql.select(m.Movie).where(m.Movie.id.in_(sql.select(union_stmt.c.id)))
 
-  return [MovieInfoInternal(
-    id=movie.id,
-    tmdb_id=movie.tmdb_id or 0,
-    title=movie.title,
-    tmdb_overview=movie.tmdb_overview,
-    wiki_document=movie.wiki_document,
-    release_date=movie.release_date,
-    poster_img_url=movie.poster_img_url,
-    trailer_img_url=movie.trailer_img_url,
-    last_update=movie.last_update,
-    genres=db_get_genres_of_movie(db, movie.id),
-    directors=db_get_directors_of_movie(db, movie.id),
-  ) for movie in db.execute(stmt).scalars().all()]
+  return db_hydrate_movies(db, db.execute(stmt).scalars().all())
 
 def db_get_archived_movies(db: Session, user_id: int):
   """
-  아카이브된 영화를 불러옵니다.  
-  genre, character, platform 등의 정보가 필요하다면
+  아카이브된 영화를 불러옵니다.
+  genre, director 정보까지 채워져서 반환됩니다.
+  character, platform 등의 정보가 필요하다면
   db_find_movie_id를 추가로 사용하시면 됩니다.
-  만약 너무 불편하다면 말씀해주세요
   """
   stmt = (
-    sql.select(m.ArchivedMovie, m.Movie)
+    sql.select(m.ArchivedMovie.rating, m.Movie)
     .where(m.ArchivedMovie.user_id == user_id)
     .join(m.Movie, m.Movie.id == m.ArchivedMovie.movie_id)
   )
-  return [MovieInfoInternal(
-    id=movie.id,
-    tmdb_id=movie.tmdb_id,
-    title=movie.title,
-    tmdb_overview=movie.tmdb_overview,
-    wiki_document=movie.wiki_document,
-    release_date=movie.release_date,
-    poster_img_url=movie.poster_img_url,
-    trailer_img_url=movie.trailer_img_url,
-    last_update=movie.last_update,
-    rating=archived.rating, # 유저 개인 평점 불러옴
-    genres=db_get_genres_of_movie(db, movie.id),
-    directors=db_get_directors_of_movie(db, movie.id),
-  ) for archived, movie in db.execute(stmt).all()]
+  rows = db.execute(stmt).all()
+  movies = db_hydrate_movies(db, [movie for _, movie in rows])
+  for (rating, _), movie in zip(rows, movies):
+    movie.rating = rating # 유저 개인 평점 불러옴
+  return movies
 
 def db_add_archived(db: Session, user_id: int, movie_id: int, rating: int):
   stmt = (
@@ -393,63 +571,67 @@ def db_update_archived(db: Session, user_id: int, movie_id: int, rating: int):
     return False
 
 
-def db_find_movie_by_id(db: Session, id: int, verbose: bool = True, user_id: int|None = None) -> MovieInfoInternal|None:
+def _load_movie_detail(db: Session, id: int) -> MovieInfoInternal|None:
+  """유저와 상관 없는 영화 상세 정보를 캐시를 거쳐 불러옵니다"""
+  cached = movie_detail_cache.get(id)
+  if cached is not None:
+    return cached
+
+  # 읽는 동안 upsert 등으로 invalidate되면 읽은 값을 캐시에 넣지 않음
+  version = movie_detail_cache.version()
   stmt = sql.select(m.Movie).where(m.Movie.id == id)
   movie = db.execute(stmt).scalar_one_or_none()
   if movie is None:
     return None
-  
+  detail = db_hydrate_movies(db, [movie], characters=True)[0]
+  movie_detail_cache.put(id, detail, version)
+  return detail
+
+def db_find_movie_by_id(db: Session, id: int, verbose: bool = True, user_id: int|None = None) -> MovieInfoInternal|None:
+  """
+  영화 정보를 불러옵니다.  
+  verbose인 경우 장르, 감독, 캐릭터까지 불러오며, 이 부분은 `movie_detail_cache`에 캐싱됩니다.
+  user_id가 주어지면 북마크 여부와 평점은 매번 쿼리 한 번으로 새로 불러옵니다.
+  """
+  if not verbose:
+    stmt = sql.select(m.Movie).where(m.Movie.id == id)
+    movie = db.execute(stmt).scalar_one_or_none()
+    if movie is None:
+      return None
+    return MovieInfoInternal(
+      id=movie.id,
+      tmdb_id=cast(int, movie.tmdb_id), # 만약 TMDB ID가 없다면 그냥 에러가 나는 게 맞는 것 같다.
+      title=movie.title,
+      tmdb_overview=movie.tmdb_overview,
+      wiki_document=movie.wiki_document,
+      release_date=movie.release_date,
+      poster_img_url=movie.poster_img_url,
+      trailer_img_url=movie.trailer_img_url,
+      last_update=movie.last_update,
+      bookmarked=False
+    )
+
+  detail = _load_movie_detail(db, id)
+  if detail is None:
+    return None
+  movie_access_log.touch(id)
+
   bookmarked = False
   rating = None
-  genres = []
-  directors = []
-  characters = []
-  if verbose:
-    stmt_genre = sql.select(m.Genre).join(m.MovieGenre, m.Genre.id == m.MovieGenre.genre_id).where(m.MovieGenre.movie_id == id)
-    stmt_director = sql.select(m.Director).join(m.MovieDirector, m.Director.id == m.MovieDirector.director_id).where(m.MovieDirector.movie_id == id)
-    stmt_chara = sql.select(m.CharacterProfile, m.Actor).where(m.CharacterProfile.movie_id == id).outerjoin(m.Actor, m.CharacterProfile.actor_id == m.Actor.id)
-
-    if user_id:
-      stmt_bk = (
-        sql.select(m.BookmarkedMovie)
-        .where(m.BookmarkedMovie.user_id == user_id)
-        .where(m.BookmarkedMovie.movie_id == id)
-      )
-      bookmarked = True if db.execute(stmt_bk).scalar_one_or_none() is not None else False
-      stmt_ac = (
-        sql.select(m.ArchivedMovie.rating)
-        .where(m.ArchivedMovie.user_id == user_id)
-        .where(m.ArchivedMovie.movie_id == id)
-      )
-      rating = db.execute(stmt_ac).scalar_one_or_none()
-
-    genres = [i.name for i in db.scalars(stmt_genre).all()]
-    directors = [PersonInfoInternal(id = i.id, name = i.name, profile_image_path=i.profile_path) for i in db.scalars(stmt_director).all()]
-    characters = [CharacterInfoInternal(
-      id = character.id,
-      movie_id = character.movie_id,
-      name = character.name,
-      tone = character.tone or "",
-      description = character.description or "",
-      actor = PersonInfoInternal(id = actor.id, name = actor.name, profile_image_path = actor.profile_path) if actor is not None else None
-    ) for character, actor in db.execute(stmt_chara).all()]
+  if user_id:
+    stmt_user = sql.select(
+      sql.exists()
+      .where(m.BookmarkedMovie.user_id == user_id)
+      .where(m.BookmarkedMovie.movie_id == id),
+      sql.select(m.ArchivedMovie.rating)
+      .where(m.ArchivedMovie.user_id == user_id)
+      .where(m.ArchivedMovie.movie_id == id)
+      .scalar_subquery()
+    )
+    bookmarked, rating = db.execute(stmt_user).one()
 
-  return MovieInfoInternal(
-    id=movie.id,
-    tmdb_id=cast(int, movie.tmdb_id), # 만약 TMDB ID가 없다면 그냥 에러가 나는 게 맞는 것 같다.
-    title=movie.title,
-    tmdb_overview=movie.tmdb_overview,
-    wiki_document=movie.wiki_document,
-    release_date=movie.release_date,
-    poster_img_url=movie.poster_img_url,
-    trailer_img_url=movie.trailer_img_url,
-    last_update=movie.last_update,
-    genres=genres,
-    directors=directors,
-    characters=characters,
-    bookmarked=bookmarked,
-    rating=rating
-  )
+  # 호출하는 쪽에서 값을 고쳐도 캐시가 오염되지 않도록 복사해서 반환
+  return detail.model_copy(update={"bookmarked": bool(bookmarked), "rating": rating}, deep=True)
 
 def db_find_movie_by_tmdb_id(db: Session, tmdb_id: int):
   stmt = sql.select(m.Movie).where(m.Movie.tmdb_id == tmdb_id)
@@ -473,195 +655,205 @@ def db_find_movies_by_alias(db: Session, title: str) -> List[MovieInfoInternal]:
   movies = db.scalars(stmt).all()
   return [MovieInfoInternal.model_validate(movie) for movie in movies]
 
-# flush, commit 안 함
-def _upsert_genre(db: Session, genre: str):
-  stmt = sql.select(m.Genre).where(m.Genre.name == genre)
-  result = db.execute(stmt).scalar_one_or_none()
-  if result:
-    return result
-
-  doc = m.Genre(name=genre)
-  db.add(doc)
-  return doc
-
-def _upsert_director(db: Session, director: DirectorInfo):
-  stmt = sql.select(m.Director).where(m.Director.tmdb_id == director.person_id)
-  result = db.execute(stmt).scalar_one_or_none()
-  if result:
-    return result
-  
-  doc = m.Director(
-    tmdb_id = director.person_id,
-    name = director.name,
-    original_name = director.original_name,
-    profile_path = director.profile_path
+# 이 시간 안에 TMDB에서 불러온 영화는 다시 요청하지 않음 (지나면 database.refresh에서 갱신)
+MOVIE_FRESH_FOR = timedelta(days=ENV_MOVIE_STALE_DAYS)
+# update_movie_by_tmdb_search에서 상세 정보까지 불러올 검색 결과 수
+MOVIE_SEARCH_TOP_K = 2
+
+# 아래 _upsert_* 함수들은 flush, commit 안 함
+# 모두 SQLite `INSERT ... ON CONFLICT`로 여러 row를 한 번에 반영하며, key -> DB id dict를 반환합니다
+# (ORM bulk insert는 row마다 Python 처리 비용이 커서 Core executemany로 실행)
+def _upsert_genres(db: Session, names: set[str]) -> dict[str, int]:
+  if not names:
+    return {}
+  stmt = sqlite.insert(m.Genre).on_conflict_do_nothing(index_elements=[m.Genre.name])
+  db.connection().execute(stmt, [{"name": i} for i in names])
+  rows = db.execute(sql.select(m.Genre.name, m.Genre.id).where(m.Genre.name.in_(names))).all()
+  return {name: id for name, id in rows}
+
+def _upsert_people(db: Session, model: type[m.Director]|type[m.Actor], people: dict[int, DirectorInfo|ActorInfo]) -> dict[int, int]:
+  """Director, Actor 공용. `people`은 TMDB person id -> 인물 정보"""
+  if not people:
+    return {}
+  stmt = sqlite.insert(model)
+  stmt = stmt.on_conflict_do_update(
+    index_elements=[model.tmdb_id],
+    set_={
+      "name": stmt.excluded.name,
+      "original_name": stmt.excluded.original_name,
+      "profile_path": stmt.excluded.profile_path,
+    }
   )
-  db.add(doc)
-  return doc
-
-def _upsert_actor(db: Session, actor: ActorInfo):
-  stmt = sql.select(m.Actor).where(m.Actor.tmdb_id == actor.person_id)
-  result = db.execute(stmt).scalar_one_or_none()
-  if result:
-    return result
-  
-  doc = m.Actor(
-    tmdb_id = actor.person_id,
-    name = actor.name,
-    original_name = actor.original_name,
-    profile_path = actor.profile_path
+  db.connection().execute(stmt, [{
+    "tmdb_id": i.person_id,
+    "name": i.name,
+    "original_name": i.original_name,
+    "profile_path": i.profile_path,
+  } for i in people.values()])
+  rows = db.execute(sql.select(model.tmdb_id, model.id).where(model.tmdb_id.in_(people.keys()))).all()
+  return {tmdb_id: id for tmdb_id, id in rows}
+
+def _upsert_platforms(db: Session, platforms: dict[int, PlatformInfo]) -> dict[int, int]:
+  if not platforms:
+    return {}
+  stmt = sqlite.insert(m.Platform)
+  stmt = stmt.on_conflict_do_update(
+    index_elements=[m.Platform.tmdb_id],
+    set_={"name": stmt.excluded.name, "logo_path": stmt.excluded.logo_path}
   )
-  db.add(doc)
-  return doc
-
-def _upsert_platform(db: Session, platform: PlatformInfo):
-  stmt = sql.select(m.Platform).where(m.Platform.tmdb_id == platform.tmdb_id)
-  result = db.execute(stmt).scalar_one_or_none()
-  if result:
-    return result
-
-  doc = m.Platform(
-    tmdb_id = platform.tmdb_id,
-    name = platform.name,
-    logo_path = platform.logo_path,
+  db.connection().execute(stmt, [{
+    "tmdb_id": i.tmdb_id,
+    "name": i.name,
+    "logo_path": i.logo_path,
+  } for i in platforms.values()])
+  rows = db.execute(sql.select(m.Platform.tmdb_id, m.Platform.id).where(m.Platform.tmdb_id.in_(platforms.keys()))).all()
+  return {tmdb_id: id for tmdb_id, id in rows}
+
+def _upsert_movies(db: Session, movies: list[TmdbRequestResult]) -> dict[int, int]:
+  stmt = sqlite.insert(m.Movie)
+  stmt = stmt.on_conflict_do_update(
+    index_elements=[m.Movie.tmdb_id],
+    set_={
+      "title": stmt.excluded.title,
+      "tmdb_overview": stmt.excluded.tmdb_overview,
+      "release_date": stmt.excluded.release_date,
+      "poster_img_url": stmt.excluded.poster_img_url,
+      "last_update": stmt.excluded.last_update, # core insert에서는 auto_update_last_modified가 불리지 않음
+    }
   )
-  db.add(doc)
-  return doc
-
-def upsert_movie_with_tmdb(db: Session, tmdb_data: TmdbRequestResult):
+  now = m.current_time()
+  db.connection().execute(stmt, [{
+    "tmdb_id": i.id,
+    "title": i.title,
+    "tmdb_overview": i.overview,
+    "release_date": i.release_date,
+    "poster_img_url": i.poster_path,
+    "last_update": now,
+  } for i in movies])
+  tmdb_ids = [i.id for i in movies]
+  rows = db.execute(sql.select(m.Movie.tmdb_id, m.Movie.id).where(m.Movie.tmdb_id.in_(tmdb_ids))).all()
+  return {tmdb_id: id for tmdb_id, id in rows}
+
+def _insert_ignore(db: Session, model, rows: list[dict]):
+  if rows:
+    db.connection().execute(sqlite.insert(model).on_conflict_do_nothing(), rows)
+
+def upsert_movies_with_tmdb(db: Session, tmdb_datas: list[TmdbRequestResult]) -> List[MovieInfoInternal]:
   """
-  TMDB에서 불러온 영화 정보를 MovieChat DB에 반영합니다  
-  DB 반영 실패시 None이 반환되며, 성공시 해당 영화 정보가 반환됩니다.
+  TMDB에서 불러온 영화 정보들을 하나의 transaction으로 MovieChat DB에 반영합니다.  
+  영화 수와 상관 없이 table마다 `INSERT ... ON CONFLICT` 한 번씩만 실행하며,
+  같은 영화가 여러 번 들어있다면 마지막 것이 반영됩니다.  
+  DB 반영 실패시 빈 list가, 성공시 입력 순서대로 영화 정보들이 반환됩니다. (genre, director 포함)
   """
-  tmdb_id = tmdb_data.id
-  stmt0 = sql.select(m.Movie).where(m.Movie.tmdb_id == tmdb_id)
-  result = db.execute(stmt0).scalar_one_or_none()
-  if result:
-    print("updating")
-    result.title          = tmdb_data.title
-    result.tmdb_overview  = tmdb_data.overview
-    result.release_date   = tmdb_data.release_date
-    result.poster_img_url = tmdb_data.poster_path
-    db.commit()
-    
-    stmt1 = sql.delete(m.MovieGenre).where(m.MovieGenre.movie_id == result.id)
-    stmt2 = sql.delete(m.MovieDirector).where(m.MovieDirector.movie_id == result.id)
-    stmt3 = sql.delete(m.MoviePlatform).where(m.MoviePlatform.movie_id == result.id)
-    stmt4 = sql.delete(m.MovieActor).where(m.MovieActor.movie_id == result.id)
-    db.execute(stmt1)
-    db.execute(stmt2)
-    db.execute(stmt3)
-    db.execute(stmt4)
-    doc = result
-    
-  else:
-    print("inserting")
-    doc = m.Movie(
-      tmdb_id=tmdb_id,
-      title=tmdb_data.title,
-      tmdb_overview=tmdb_data.overview,
-      release_date=tmdb_data.release_date,
-      poster_img_url=tmdb_data.poster_path,
-    )
-    db.add(doc)
-
-  pending_genres = [_upsert_genre(db, i) for i in tmdb_data.genres]
-  pending_directors = [_upsert_director(db, i) for i in tmdb_data.directors]
-  pending_platforms = [_upsert_platform(db, i) for i in tmdb_data.platforms]
-  
-  pending_actors = [(_upsert_actor(db, i), idx) for idx, i in enumerate(tmdb_data.casts)]
-  db.flush()
-
-  # 캐릭터를 추가함 (begin)
-  for a, i in pending_actors:
-    cast_info = tmdb_data.casts[i]
-    stmt_c = (
-      sql.select(m.CharacterProfile.id)
-      .where(m.CharacterProfile.actor_id == a.id)
-      .where(m.CharacterProfile.name == cast_info.character)
-      .where(m.CharacterProfile.movie_id == doc.id)
-    )
-    ch_id = db.execute(stmt_c).scalar_one_or_none()
-    if ch_id:
-      continue
-
-    ch = m.CharacterProfile(
-      movie_id = doc.id,
-      name = cast_info.character,
-      actor_id = a.id
-    )
-    db.add(ch)
-  # 캐릭터를 추가함 (end)
-
-  movie_id = doc.id
-  for g in pending_genres:
-    rel = m.MovieGenre(genre_id=g.id, movie_id=movie_id)
-    db.add(rel)
-  for d in pending_directors:
-    rel = m.MovieDirector(director_id=d.id, movie_id=movie_id)
-    db.add(rel)
-  for p in pending_platforms:
-    rel = m.MoviePlatform(platform_id=p.id, movie_id=movie_id)
-    db.add(rel)
-  for a, _ in pending_actors:
-    rel = m.MovieActor(actor_id=a.id, movie_id=movie_id)
-    db.add(rel)
+  if not tmdb_datas:
+    return []
+  movies = list({i.id: i for i in tmdb_datas}.values())
 
   try:
+    movie_ids = _upsert_movies(db, movies)
+    genre_ids = _upsert_genres(db, {g for i in movies for g in i.genres})
+    director_ids = _upsert_people(db, m.Director, {d.person_id: d for i in movies for d in i.directors})
+    actor_ids = _upsert_people(db, m.Actor, {a.person_id: a for i in movies for a in i.casts})
+    platform_ids = _upsert_platforms(db, {p.tmdb_id: p for i in movies for p in i.platforms})
+
+    # 관계 정보는 TMDB 기준으로 새로 만듦 (캐릭터는 설명 등이 붙어있으므로 지우지 않음)
+    ids = list(movie_ids.values())
+    for rel in (m.MovieGenre, m.MovieDirector, m.MoviePlatform, m.MovieActor):
+      db.execute(sql.delete(rel).where(rel.movie_id.in_(ids)))
+
+    _insert_ignore(db, m.MovieGenre, [
+      {"movie_id": movie_ids[i.id], "genre_id": genre_ids[g]} for i in movies for g in i.genres
+    ])
+    _insert_ignore(db, m.MovieDirector, [
+      {"movie_id": movie_ids[i.id], "director_id": director_ids[d.person_id]} for i in movies for d in i.directors
+    ])
+    _insert_ignore(db, m.MoviePlatform, [
+      {"movie_id": movie_ids[i.id], "platform_id": platform_ids[p.tmdb_id]} for i in movies for p in i.platforms
+    ])
+    _insert_ignore(db, m.MovieActor, [
+      {"movie_id": movie_ids[i.id], "actor_id": actor_ids[a.person_id]} for i in movies for a in i.casts
+    ])
+    _insert_ignore(db, m.CharacterProfile, [
+      {"movie_id": movie_ids[i.id], "name": a.character, "actor_id": actor_ids[a.person_id]} for i in movies for a in i.casts
+    ])
     db.commit()
-    res = MovieInfoInternal.model_validate(doc)
-    res.genres = [g.name for g in pending_genres]
-    return res
   except IntegrityError as e:
     db.rollback()
     print(e)
-    return None
+    return []
+  movie_detail_cache.invalidate(*movie_ids.values())
+
+  stmt = sql.select(m.Movie).where(m.Movie.id.in_(movie_ids.values()))
+  by_tmdb_id = {i.tmdb_id: i for i in db_hydrate_movies(db, db.execute(stmt).scalars().all())}
+  movie_title_index.add_movies((i.id, i.title, i.release_date.year if i.release_date else None) for i in by_tmdb_id.values())
+  return [by_tmdb_id[i.id] for i in tmdb_datas]
+
+def upsert_movie_with_tmdb(db: Session, tmdb_data: TmdbRequestResult):
+  """
+  TMDB에서 불러온 영화 정보를 MovieChat DB에 반영합니다  
+  DB 반영 실패시 None이 반환되며, 성공시 해당 영화 정보가 반환됩니다.
+  """
+  res = upsert_movies_with_tmdb(db, [tmdb_data])
+  return res[0] if res else None
+
+def _find_fresh_movies(db: Session, tmdb_ids: list[int]) -> dict[int, MovieInfoInternal]:
+  """last_update가 MOVIE_FRESH_FOR 이내인 영화들 (TMDB ID -> 영화 정보)"""
+  if not tmdb_ids:
+    return {}
+  stmt = (
+    sql.select(m.Movie)
+    .where(m.Movie.tmdb_id.in_(tmdb_ids))
+    .where(m.Movie.last_update >= m.current_time() - MOVIE_FRESH_FOR)
+  )
+  return {i.tmdb_id: i for i in db_hydrate_movies(db, db.execute(stmt).scalars().all())}
 
 def update_movie_by_tmdb_id(db: Session, tmdb_id: int, lang: str = "ko"):
   """
   TMDB의 영화 정보를 MovieChat DB에 반영합니다.  
+  이미 최근(MOVIE_FRESH_FOR 이내)에 반영된 영화라면 TMDB에 요청하지 않습니다.  
   성공 시 해당 영화 정보를 반환합니다.  
   존재하지 않거나, 실패 시 `None`을 반환합니다
   """
+  fresh = _find_fresh_movies(db, [tmdb_id])
+  if tmdb_id in fresh:
+    return fresh[tmdb_id]
+
   res = tmdb_request_movie_bulk(identifier={"movie_id": tmdb_id, "lang": lang})
   if len(res) == 0:
     return None
 
   return upsert_movie_with_tmdb(db, res[0])
 
-def update_movie_by_tmdb_search(db: Session, search: TmdbSearchMovieArgs, lang: str = "ko"):
+def update_movie_by_tmdb_search(db: Session, search: TmdbSearchMovieArgs, lang: str = "ko", top_k: int = MOVIE_SEARCH_TOP_K):
   """
   TMDB의 영화 정보를 MovieChat DB에 반영합니다.  
-  db 반영에 성공한 영화 정보들의 list를 반환합니다.
-  query로 들어온 영화 제목이 '정식' title과 일치하지 않으면 alias로 등록됩니다.
+  검색 결과는 검색 응답만으로 순위를 매기고(`tmdb_search_movies`), 상위 top_k개만 상세 정보를 불러와 반영합니다.
+  이미 최근(MOVIE_FRESH_FOR 이내)에 반영된 영화는 TMDB에 요청하지 않습니다.  
+  db 반영에 성공한 영화 정보들의 list를 순위대로 반환합니다.
+  query로 들어온 영화 제목이 1위 영화의 '정식' title과 일치하지 않으면 1위 영화의 alias로 등록됩니다.
+  (alias는 title index에서 바로 confidence 100으로 찾아지므로, 2위 이하 영화에는 등록하지 않습니다)
   """
   datas : List[MovieInfoInternal]= []
 
-  res = tmdb_request_movie_bulk(identifier={"search": search, "lang": lang})
-  if len(res) == 0:
+  hits = tmdb_search_movies(search, lang, top_k)
+  if len(hits) == 0:
     print(f"[update_movie_by_tmdb_search] {search}에 대한 영화를 TMDB에서 찾을 수 없음")
     return datas
-  
-  for movie in res:
-    data = upsert_movie_with_tmdb(db, movie)
-    if data is None:
-      continue
-    
-    datas.append(data)
-
-    possible_alias = search["query"]
-    if possible_alias != movie.title:
-      print(f"[update_movie_by_tmdb_search] {movie.title}의 다른 이름 {possible_alias}(을)를 추가합니다")
-
-      doc = m.MovieAlias(movie_id=data.id, aliased_name=possible_alias)
-      db.add(doc)
-      try:
-        db.commit()
-      except IntegrityError as e:
-        # 동시 다발적으로 동일한 alias를 추가하는 상황에서 발생할 수도 있는데,
-        # 이 경우는 단순히 rollback 해주면 됨.
-        print(f"[update_movie_by_tmdb_search] 경고: IntegrityError {e}")
-        db.rollback()
+
+  tmdb_ids = [hit["id"] for hit in hits]
+  fresh = _find_fresh_movies(db, tmdb_ids)
+  stale_ids = [i for i in tmdb_ids if i not in fresh]
+  fetched = [i for i in tmdb_request_movies(stale_ids, lang) if i is not None] if stale_ids else []
+  updated = {i.tmdb_id: i for i in upsert_movies_with_tmdb(db, fetched)}
+  datas = [movie for movie in (fresh.get(i) or updated.get(i) for i in tmdb_ids) if movie is not None]
+
+  possible_alias = search["query"]
+  if datas and datas[0].title != possible_alias:
+    print(f"[update_movie_by_tmdb_search] {datas[0].title}의 다른 이름 {possible_alias}(을)를 추가합니다")
+    # 동시 다발적으로 동일한 alias를 추가하는 경우도 있으므로, 이미 있다면 무시함
+    _insert_ignore(db, m.MovieAlias, [{"movie_id": datas[0].id, "aliased_name": possible_alias}])
+    db.commit()
+    movie_title_index.add_aliases([(datas[0].id, possible_alias)])
     
   return datas
 
@@ -673,6 +865,7 @@ def db_update_wikipedia_data(db: Session, id: int, wiki_data: str):
   db.execute(stmt)
   try:
     db.commit()
+    movie_detail_cache.invalidate(id)
     return True
   except:
     db.rollback()
@@ -682,13 +875,13 @@ def db_get_movie_reviews(db: Session, id: int, limit: int|None) -> list[str]:
   if limit:
     stmt = (
       sql.select(m.MovieReview.text)
-      .where(m.MovieReview.id == id)
+      .where(m.MovieReview.movie_id == id)
       .limit(limit)
     )
   else:
     stmt = (
       sql.select(m.MovieReview.text)
-      .where(m.MovieReview.id == id)
+      .where(m.MovieReview.movie_id == id)
     )
 
   return [i for i in db.execute(stmt).scalars().all()]
@@ -717,23 +910,46 @@ def db_add_recommended_movies(db: Session, chat_id: int, movie_ids: list[int]):
     db.rollback()
     return False
 
-def db_get_recommended_movies(db: Session, room_id: int):
-  q_chats = (
-    sql.select(m.ChatHistory.id).where(m.ChatHistory.room_id == room_id)
-    .order_by(m.ChatHistory.timestamp.asc())
+def db_get_recommended_turns(db: Session, room_id: int, before: int|None = None, limit: int|None = None) -> list[tuple[int, list[MovieInfoInternal]]]:
+  """
+  `room_id` 채팅방에서 영화 추천이 있었던 대화(turn)들을 (chat id, 추천 영화 list) 형태로 오래된 순서대로 불러옵니다.  
+  채팅방 길이와 상관 없이 쿼리 수가 일정합니다.
+  Args:
+    before:
+      (optional) cursor. 이 chat id보다 이전의 turn들만 불러옵니다.
+    limit:
+      (optional) 최근 turn부터 최대 `limit`개만 불러옵니다.
+  """
+  turns = (
+    sql.select(m.RecommendedMovie.chat_id)
+    .join(m.ChatHistory, m.ChatHistory.id == m.RecommendedMovie.chat_id)
+    .where(m.ChatHistory.room_id == room_id)
+    .distinct()
   )
-  
-  movies_list: list[list[MovieInfoInternal]]= []
-  for i in db.execute(q_chats).scalars().all():
-    stmt = (
-      sql.select(m.Movie).join(m.RecommendedMovie, m.RecommendedMovie.movie_id == m.Movie.id)
-      .where(m.RecommendedMovie.chat_id == i)
-    )
-    x = [MovieInfoInternal.model_validate(movie) for movie in db.execute(stmt).scalars().all()]
-    if x:
-      movies_list.append(x)
-  
-  return movies_list
+  if before is not None:
+    turns = turns.where(m.RecommendedMovie.chat_id < before)
+  if limit is not None:
+    turns = turns.order_by(m.RecommendedMovie.chat_id.desc()).limit(limit)
+
+  stmt = (
+    sql.select(m.RecommendedMovie.chat_id, m.Movie)
+    .join(m.Movie, m.Movie.id == m.RecommendedMovie.movie_id)
+    .where(m.RecommendedMovie.chat_id.in_(turns.scalar_subquery()))
+    .order_by(m.RecommendedMovie.chat_id.asc())
+  )
+  rows = db.execute(stmt).all()
+  movies = db_hydrate_movies(db, [movie for _, movie in rows])
+
+  result: list[tuple[int, list[MovieInfoInternal]]] = []
+  for (chat_id, _), movie in zip(rows, movies):
+    if not result or result[-1][0] != chat_id:
+      result.append((chat_id, []))
+    result[-1][1].append(movie)
+  return result
+
+def db_get_recommended_movies(db: Session, room_id: int, before: int|None = None, limit: int|None = None) -> list[list[MovieInfoInternal]]:
+  """`room_id` 채팅방의 추천 영화 목록들을 turn 순서대로 불러옵니다. (`db_get_recommended_turns` 참고)"""
+  return [movies for _, movies in db_get_recommended_turns(db, room_id, before, limit)]
 
 def db_get_character_profile_by_id(db: Session, character_id: int) -> CharacterInfoInternal|None:
   stmt = sql.select(m.CharacterProfile).where(m.CharacterProfile.id == character_id)
@@ -745,11 +961,13 @@ def db_update_character_description(db: Session, character_id: int, personality:
     sql.update(m.CharacterProfile)
     .where(m.CharacterProfile.id == character_id)
     .values(description = personality)
+    .returning(m.CharacterProfile.movie_id)
   )
 
   try:
-    db.execute(stmt)
+    movie_ids = db.execute(stmt).scalars().all()
     db.commit()
+    movie_detail_cache.invalidate(*movie_ids)
     return True
   except:
     db.rollback()
@@ -1,26 +1,30 @@
 import os
 import tmdbsimple as tmdb
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
 from langchain_core.documents import Document
-from langchain.text_splitter import CharacterTextSplitter
 from langchain.chains import LLMChain
 from langchain.memory import ConversationSummaryBufferMemory
 from typing import Iterator
 from llm.crawler import get_tmdb_overview, get_wikipedia_content
+from common.embeddings import shared_embeddings
+from llm.movie_store import movie_store, movie_key
+from llm.chunking import chunk_movie_documents
+from llm.session_gc import SessionCache
 
 tmdb.API_KEY = os.environ.get("TMDB_API_KEY")
 openai_key = os.environ.get("OPENAI_API_KEY")
 openrouter_key = os.environ.get("OPEN_ROUTER_KEY") # 캐릭터 프롬프트 생성용 / 대화용
 
-embedding = OpenAIEmbeddings(openai_api_key=openai_key)
+embedding = shared_embeddings()
 
 llm_openai = ChatOpenAI(
     model="gpt-4o",
     temperature=0.7,
     openai_api_key=openai_key
 )
+# 대화 요약용. 세션마다 만들지 않고 같이 사용합니다 (세션마다 HTTP client가 생기지 않도록)
+llm_memory = ChatOpenAI(temperature=0, openai_api_key=openai_key)
 
 # 캐릭터 프롬프트 생성용: Gemini 2.5 Pro (OpenRouter)
 # GPT, 클로드보다 더 나은 성능.
@@ -104,9 +108,9 @@ refine_template_second = PromptTemplate.from_template("""
 """)
 refine_chain_second = LLMChain(llm=llm_refine, prompt=refine_template_second)
 
-cached_chroma_dict = {} # 여기서 세션별 Chroma 캐시를 위한 딕셔너리 선언
-session_memories = {}   # 세션별 메모리를 위한 딕셔너리 선언
-session_prompts = {}    # 세션별 캐릭터 프롬프트를 저장할 딕셔너리 선언
+# 세션별 메모리, 캐릭터 프롬프트. 가장 오래 쓰지 않은 세션부터 내보내며, 다음 메시지에서 DB로부터 다시 불러옵니다 (llm_layer.py)
+session_memories = SessionCache("characterchat.memories")
+session_prompts = SessionCache("characterchat.prompts")
 
 def is_memory_on_cache(session_id):
     return session_id in session_memories
@@ -114,34 +118,37 @@ def is_memory_on_cache(session_id):
 def set_character_prompts(session_id: str, prompts: str):
     session_prompts[session_id] = prompts
 
-def _is_cached_on_chroma(title: str, db):
-    try:
-        existing_titles = {doc.metadata['title'] for doc in db.similarity_search("영화", k=50)}
-    except:
-        existing_titles = set()
-    return title in existing_titles
-
 def is_cached_on_chroma(title: str, session_id):
-    return _is_cached_on_chroma(title, get_chroma_for_session(session_id))
-
-def _add_to_chroma(movie_name: str, overview: str, wiki: str, db):
-    combined = f"[영화 제목] {movie_name}\n\n[TMDB 줄거리]\n{overview}\n\n[Wikipedia 문서]\n{wiki}"
-    doc = Document(page_content=combined, metadata={"title": movie_name})
-
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    split_docs = splitter.split_documents([doc])
-    db.add_documents(split_docs)
-
-def add_to_chroma(title: str, tmdb_overview: str|None, wikipedia_content: str|None, session_id):
+    # presence index로 바로 확인합니다 (embedding 요청/vector search 없음)
+    # 다른 채팅방에서 이미 저장한 영화라면 이 채팅방에서도 참조하도록 연결합니다
+    key = movie_store.find("character", title)
+    if key is None:
+        return False
+    movie_store.attach(session_id, "character", key)
+    return True
+
+def _split_movie_documents(movie_name: str, overview: str, wiki: str) -> list[Document]:
+    # 위키 섹션 단위로 token 수에 맞춰 나눕니다 (llm/chunking.py)
+    docs, stats = chunk_movie_documents(movie_name, overview, wiki)
+    print(f"[chunking] {movie_name}: chunk {stats.chunks}개, embedding {stats.tokens} tokens (섹션 {stats.dropped_sections}개, 중복 {stats.duplicates}개 제외)")
+    return docs
+
+def add_to_chroma(title: str, tmdb_overview: str|None, wikipedia_content: str|None, session_id, movie_id: int|None = None):
     if not tmdb_overview:
         tmdb_overview = ""
     if not wikipedia_content:
         wikipedia_content = ""
-    _add_to_chroma(title, tmdb_overview, wikipedia_content, get_chroma_for_session(session_id))
+    # 영화 하나당 한 번만 embedding하고, 채팅방은 movie_key로 참조만 합니다
+    key = movie_store.find("character", title, movie_id)
+    if key is None:
+        key = movie_key(title, movie_id)
+        docs = _split_movie_documents(title, tmdb_overview, wikipedia_content)
+        movie_store.add("character", key, title, docs, movie_id)
+    movie_store.attach(session_id, "character", key)
 
 def load_memory(session_id: str, summary: str, messages: list):
     memory = ConversationSummaryBufferMemory(
-        llm=ChatOpenAI(temperature=0, openai_api_key=openai_key),
+        llm=llm_memory,
         return_messages=True,
         max_token_limit=1000
     )
@@ -151,34 +158,22 @@ def load_memory(session_id: str, summary: str, messages: list):
 
 def get_chroma_for_session(session_id: str):
     """
-    세션 ID별로 Chroma 인스턴스를 생성/캐시.
-    각 세션은 "./chroma_data/character/{session_id}" 폴더를 사용.
+    모든 세션이 같은 Chroma store("./chroma_data/shared")를 사용합니다.
+    세션별 검색은 movie_store.session_filter()로 구분합니다.
     """
-    global cached_chroma_dict
-    if session_id not in cached_chroma_dict:
-        dir_path = f"./chroma_data/character/{session_id}"
-        os.makedirs(dir_path, exist_ok=True)
-        cached_chroma_dict[session_id] = Chroma(
-            persist_directory=dir_path,
-            embedding_function=embedding
-        )
-    return cached_chroma_dict[session_id]
-
-def load_data(movie_name, db):
-    try:
-        existing_titles = {doc.metadata['title'] for doc in db.similarity_search("영화", k=50)}
-    except:
-        existing_titles = set()
-    if movie_name in existing_titles:
+    return movie_store.chroma("character")
+
+def search_movie_documents(movie: str, session_id: str, k: int = 5) -> list[Document]:
+    search_filter = movie_store.session_filter(session_id, "character", [movie])
+    return get_chroma_for_session(session_id).similarity_search(movie, k=k, filter=search_filter)
+
+def load_data(movie_name, session_id):
+    if is_cached_on_chroma(movie_name, session_id):
         return
     
     overview = get_tmdb_overview(movie_name)
     wiki = get_wikipedia_content(movie_name) or get_wikipedia_content(movie_name + " (영화)")
-    combined = f"[영화 제목] {movie_name}\n\n[TMDB 줄거리]\n{overview}\n\n[Wikipedia 문서]\n{wiki}"
-    docs = [Document(page_content=combined, metadata={"title": movie_name})]
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    split_docs = splitter.split_documents(docs)
-    db.add_documents(split_docs)
+    add_to_chroma(movie_name, overview, wiki, session_id)
 
 def get_memory(session_id):
     if session_id not in session_memories:
@@ -216,15 +211,14 @@ def get_qa_chain_prompt(session_id: str):
 # --------- 메인 루프 (스트리밍 출력) --------------
 def run_character_mode():
     session_id = "session123"
-    db = get_chroma_for_session(session_id)
 
     print("캐릭터를 생성할 영화와 등장인물을 입력해주세요.")
     movie = input("영화 제목: ").strip()
     character = input("등장인물 이름: ").strip()
     #name = f"{movie} - {character}"
 
-    load_data(movie, db)
-    docs = db.similarity_search(movie, k=5)
+    load_data(movie, session_id)
+    docs = search_movie_documents(movie, session_id)
     context = "\n\n".join([doc.page_content for doc in docs])
     
     
@@ -273,6 +267,7 @@ def run_character_mode():
 
 async def get_cc_response(session_id: str, user_input: str):
     memory = get_memory(session_id)
+    movie_store.touch(session_id)
     prompt_template = get_qa_chain_prompt(session_id)
 
     summary = memory.buffer or "(요약 없음)"
@@ -289,8 +284,7 @@ async def get_cc_response(session_id: str, user_input: str):
 def create_personality(movie: str, character: str, session_id: str):
     from typing import cast
 
-    db = get_chroma_for_session(session_id)
-    docs = db.similarity_search(movie, k=5)
+    docs = search_movie_documents(movie, session_id)
     context = "\n\n".join([doc.page_content for doc in docs])
     
     prompt_result = character_prompt_chain.invoke({
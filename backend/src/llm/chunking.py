@@ -0,0 +1,231 @@
+"""
+qachat/characterchat이 영화 문서를 vector store에 넣기 전에 chunk로 나누는 방법입니다.
+
+예전에는 줄거리, 위키 전체, 리뷰를 한 문자열로 이어 붙인 뒤 500글자마다 잘랐기 때문에
+섹션 중간에서 잘리고, 각주/외부 링크 같은 의미 없는 부분과 거의 같은 리뷰까지 embedding했습니다.
+* 위키는 `== 섹션 ==` 단위로 나누고, 같이 보기/각주/외부 링크 등은 버립니다
+  짧은 섹션들은 하나의 chunk로 묶지만, 섹션이 chunk 경계에서 잘리는 것은 섹션 하나가 너무 길 때뿐입니다
+* 리뷰는 하나가 두 chunk로 나뉘지 않도록 리뷰 단위로 묶습니다
+* 글자 수가 아닌 token 수(`CHUNK_MAX_TOKENS`)로 크기를 정합니다
+* 거의 같은 문단/리뷰는 하나만 남깁니다
+* 모든 chunk 앞에 영화 제목과 섹션 이름을 붙여서 chunk만 보고도 어떤 내용인지 알 수 있게 합니다
+
+`python -m llm.chunking`으로 fixture 문서에서 예전 방식과 chunk 수, embedding token 수를 비교할 수 있습니다.
+* retrieval_eval.json: 검색 평가용 문서 (각주 등이 거의 없는 깨끗한 문서)
+* chunking_noisy.json: 같은 영화에 긴 각주/참고 문헌/외부 링크 섹션과 그대로 또는 조금 바꿔 다시 올라온 리뷰를 더한 문서
+"""
+
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Optional
+from langchain_core.documents import Document
+from common.tokens import EMBEDDING_ENCODING, count_tokens
+
+CHUNK_MAX_TOKENS = 350
+# 이 값 이상 겹치면 같은 문단/리뷰로 취급 (글자 3-gram Jaccard)
+NEAR_DUPLICATE_JACCARD = 0.85
+BOILERPLATE_SECTIONS = {
+    "같이 보기", "함께 보기", "각주", "주석", "출처", "외부 링크", "참고 문헌", "참고 자료", "관련 항목",
+    "see also", "references", "notes", "external links", "further reading", "bibliography",
+}
+
+_HEADING = re.compile(r"^(={2,})\s*(.+?)\s*\1\s*$", re.MULTILINE)
+_SENTENCE = re.compile(r"(?<=[.!?。다요])\s+")
+
+NOISY_FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "chunking_noisy.json")
+
+@dataclass
+class ChunkStats:
+    chunks: int = 0
+    tokens: int = 0             # embedding token 수
+    dropped_sections: int = 0
+    duplicates: int = 0
+
+@dataclass
+class Section:
+    name: str
+    units: list[str] = field(default_factory=list)  # 문단 또는 리뷰. 하나의 unit은 가능하면 나누지 않음
+
+def _tokens(text: str) -> int:
+    return count_tokens(text, EMBEDDING_ENCODING)
+
+def split_wiki_sections(wiki: str) -> tuple[list[Section], int]:
+    """위키 문서를 섹션으로 나눕니다. (섹션 목록, 버린 섹션 수)"""
+    sections: list[Section] = []
+    dropped = 0
+    path: list[str] = []
+    matches = list(_HEADING.finditer(wiki))
+    bodies = [("개요", 2, wiki[:matches[0].start()] if matches else wiki)]
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(wiki)
+        bodies.append((match.group(2), len(match.group(1)), wiki[match.end():end]))
+
+    skip_level: Optional[int] = None
+    for name, level, body in bodies:
+        # 버린 섹션의 하위 섹션도 버림
+        if skip_level is not None and level > skip_level:
+            continue
+        skip_level = None
+        path = path[:level - 2] + [name]
+        if name.strip().casefold() in BOILERPLATE_SECTIONS:
+            skip_level = level
+            dropped += 1
+            continue
+        paragraphs = [" ".join(line.split()) for line in body.split("\n")]
+        paragraphs = [p for p in paragraphs if p]
+        if paragraphs:
+            sections.append(Section(" > ".join(path), paragraphs))
+    return sections, dropped
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\W+", "", unicodedata.normalize("NFKC", text).casefold())
+
+def _shingles(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(max(len(text) - 2, 1))}
+
+class _Deduplicator:
+    def __init__(self):
+        self.seen: list[set[str]] = []
+        self.exact: set[str] = set()
+        self.duplicates = 0
+
+    def is_duplicate(self, text: str) -> bool:
+        normalized = _normalize(text)
+        if not normalized or normalized in self.exact:
+            self.duplicates += bool(normalized)
+            return True
+        shingles = _shingles(normalized)
+        for other in self.seen:
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= NEAR_DUPLICATE_JACCARD:
+                self.duplicates += 1
+                return True
+        self.exact.add(normalized)
+        self.seen.append(shingles)
+        return False
+
+def _split_long(text: str, max_tokens: int) -> list[str]:
+    """max_tokens보다 긴 문단을 문장 단위로, 그래도 길면 글자 단위로 나눕니다"""
+    if _tokens(text) <= max_tokens:
+        return [text]
+    pieces: list[str] = []
+    for sentence in _SENTENCE.split(text):
+        while _tokens(sentence) > max_tokens:
+            # token 수에 비례해서 자름
+            cut = max(1, len(sentence) * max_tokens // _tokens(sentence))
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+def _pack_section(section: Section, max_tokens: int) -> list[str]:
+    """섹션 하나를 "[섹션 이름]" + unit들로, max_tokens를 넘지 않게 나눕니다"""
+    blocks: list[str] = []
+    header = f"[{section.name}]\n"
+    budget = max(max_tokens - _tokens(header), 1)
+    current: list[str] = []
+    used = 0
+    for unit in section.units:
+        for piece in _split_long(unit, budget):
+            tokens = _tokens(piece)
+            if current and used + tokens > budget:
+                blocks.append(header + "\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += tokens
+    if current:
+        blocks.append(header + "\n".join(current))
+    return blocks
+
+def _pack(title_header: str, sections: list[Section], max_tokens: int) -> list[tuple[str, list[str]]]:
+    """
+    짧은 섹션들은 이어서 하나의 chunk로 묶고, 긴 섹션은 섹션 안에서만 나눕니다.
+    Returns:
+      (chunk 내용, chunk에 들어간 섹션 이름들)의 list
+    """
+    chunks: list[tuple[str, list[str]]] = []
+    budget = max(max_tokens - _tokens(title_header), 1)
+    current: list[str] = []
+    names: list[str] = []
+    used = 0
+    for section in sections:
+        for block in _pack_section(section, budget):
+            tokens = _tokens(block)
+            if current and used + tokens > budget:
+                chunks.append((title_header + "\n\n".join(current), names))
+                current, names, used = [], [], 0
+            current.append(block)
+            names.append(section.name)
+            used += tokens
+    if current:
+        chunks.append((title_header + "\n\n".join(current), names))
+    return chunks
+
+def chunk_movie_documents(title: str, overview: str|None, wiki: str|None, reviews: Optional[list[str]] = None, max_tokens: int = CHUNK_MAX_TOKENS) -> tuple[list[Document], ChunkStats]:
+    """
+    영화 하나의 줄거리/위키/리뷰를 chunk로 나눕니다.
+    Returns:
+      (chunk 목록, 통계). chunk의 metadata에는 title, section(들어간 섹션 이름들)이 들어갑니다
+    """
+    stats = ChunkStats()
+    sections: list[Section] = []
+    if overview:
+        sections.append(Section("TMDB 줄거리", [" ".join(overview.split())]))
+    if wiki:
+        wiki_sections, stats.dropped_sections = split_wiki_sections(wiki)
+        sections.extend(Section(f"Wikipedia: {section.name}", section.units) for section in wiki_sections)
+    if reviews:
+        sections.append(Section("왓챠 리뷰", [f"- {' '.join(review.split())}" for review in reviews if review.strip()]))
+
+    dedup = _Deduplicator()
+    unique_sections = []
+    for section in sections:
+        units = [unit for unit in section.units if not dedup.is_duplicate(unit)]
+        if units:
+            unique_sections.append(Section(section.name, units))
+
+    docs: list[Document] = []
+    for text, names in _pack(f"[영화 제목] {title}\n", unique_sections, max_tokens):
+        # chroma metadata에는 list를 넣을 수 없으므로 이어서 저장
+        docs.append(Document(page_content=text, metadata={"title": title, "section": ", ".join(dict.fromkeys(names))}))
+        stats.tokens += _tokens(text)
+
+    stats.chunks = len(docs)
+    stats.duplicates = dedup.duplicates
+    return docs, stats
+
+def legacy_chunk_movie_documents(title: str, overview: str|None, wiki: str|None, reviews: Optional[list[str]] = None) -> tuple[list[Document], ChunkStats]:
+    """예전 방식 (전부 이어 붙인 뒤 CharacterTextSplitter(500, 50)). 비교용입니다"""
+    from langchain.text_splitter import CharacterTextSplitter
+    combined = f"[영화 제목] {title}\n\n[TMDB 줄거리]\n{overview or ''}\n\n[Wikipedia 문서]\n{wiki or ''}"
+    if reviews is not None:
+        joined_reviews = "\n\n".join(f"- {r}" for r in reviews)
+        combined += f"\n\n[왓챠 리뷰]\n{joined_reviews}"
+    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    docs = splitter.split_documents([Document(page_content=combined, metadata={"title": title})])
+    return docs, ChunkStats(chunks=len(docs), tokens=sum(_tokens(doc.page_content) for doc in docs))
+
+if __name__ == "__main__":
+    import json
+    from llm.eval_retriever import FIXTURE_PATH
+
+    for fixture_path in (FIXTURE_PATH, NOISY_FIXTURE_PATH):
+        with open(fixture_path, encoding="utf-8") as f:
+            movies = json.load(f)["movies"]
+        print(f"# {os.path.basename(fixture_path)}")
+        total = {"legacy": ChunkStats(), "new": ChunkStats()}
+        for movie in movies:
+            args = (movie["title"], movie["overview"], movie["wiki"], movie["reviews"])
+            for name, chunker in (("legacy", legacy_chunk_movie_documents), ("new", chunk_movie_documents)):
+                _, stats = chunker(*args)
+                total[name].chunks += stats.chunks
+                total[name].tokens += stats.tokens
+                print(
+                    f"{movie['title']:<8} {name:<6} chunk {stats.chunks:>3}개, embedding {stats.tokens:>5} tokens"
+                    f" (섹션 {stats.dropped_sections}개, 중복 {stats.duplicates}개 제외)"
+                )
+        for name, stats in total.items():
+            print(f"합계     {name:<6} chunk {stats.chunks:>3}개, embedding {stats.tokens:>5} tokens")
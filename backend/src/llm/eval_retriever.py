@@ -0,0 +1,115 @@
+"""
+qachat의 문서 검색 품질을 fixture 문서(llm/fixtures/retrieval_eval.json)로 비교합니다.
+
+* vector: 기존 방식 (vector 검색 k=10)
+* hybrid: llm/retriever.py (BM25 + vector, rerank, top 5)
+
+각각 예전 chunk 방식(legacy, 500글자 단위)과 llm/chunking.py(section)로 나눈 문서에서 비교합니다.
+
+질문마다 정답 문자열이 검색된 chunk 안에 있는지로 recall@k를 계산하고,
+prompt에 들어가는 context의 token 수를 같이 보여줍니다.
+기본값은 API 호출 없이 글자 n-gram hashing embedding을 사용하며,
+`--openai`를 주면 실제 embedding 모델(common/embeddings.py, 캐시 포함)을 사용합니다.
+
+```bash
+# pwd = backend/src
+python -m llm.eval_retriever
+```
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import tempfile
+from typing import Callable, List
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from common.tokens import count_tokens
+from llm.chunking import chunk_movie_documents, legacy_chunk_movie_documents
+from llm.movie_store import MovieDocumentStore, movie_key
+from llm.retriever import HYBRID_TOP_K, hybrid_search
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "retrieval_eval.json")
+VECTOR_K = 10
+RECALL_AT = (1, 3, 5, 10)
+
+class HashingEmbeddings(Embeddings):
+    """API 없이 쓰는 embedding. 글자 3-gram을 hashing해서 dim 차원 vector로 만듭니다"""
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        text = " ".join(text.split())
+        for i in range(max(len(text) - 2, 1)):
+            digest = hashlib.md5(text[i:i + 3].encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+CHUNKERS = {"legacy": legacy_chunk_movie_documents, "section": chunk_movie_documents}
+
+def evaluate(name: str, search: Callable[[str], list[Document]], queries: list[dict]) -> dict:
+    hits = {k: 0 for k in RECALL_AT}
+    tokens = 0
+    chunks = 0
+    for query in queries:
+        docs = search(query["question"])
+        context = "\n\n".join(doc.page_content for doc in docs)
+        tokens += count_tokens(context)
+        chunks += len(docs)
+        first = next((i for i, doc in enumerate(docs) if query["answer"] in doc.page_content), None)
+        for k in RECALL_AT:
+            if first is not None and first < k:
+                hits[k] += 1
+    n = len(queries)
+    return {
+        "name": name,
+        **{f"recall@{k}": hits[k] / n for k in RECALL_AT},
+        "chunks": chunks / n,
+        "context_tokens": tokens / n,
+    }
+
+def run(fixture_path: str = FIXTURE_PATH, embedding: Embeddings|None = None) -> list[dict]:
+    with open(fixture_path, encoding="utf-8") as f:
+        fixture = json.load(f)
+
+    results = []
+    for chunker_name, chunker in CHUNKERS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MovieDocumentStore(f"{tmp}/shared", f"{tmp}/refs.db", embedding or HashingEmbeddings())
+            for movie in fixture["movies"]:
+                key = movie_key(movie["title"])
+                docs, _ = chunker(movie["title"], movie["overview"], movie["wiki"], movie["reviews"])
+                store.add("movie", key, movie["title"], docs)
+                store.attach("eval", "movie", key)
+
+            db = store.chroma("movie")
+            search_filter = store.session_filter("eval", "movie")
+            results += [
+                evaluate(f"{chunker_name}/vector (k={VECTOR_K})", lambda q: db.similarity_search(q, k=VECTOR_K, filter=search_filter), fixture["queries"]),
+                evaluate(f"{chunker_name}/hybrid (top {HYBRID_TOP_K})", lambda q: hybrid_search(db, q, search_filter), fixture["queries"]),
+            ]
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="qachat 문서 검색 품질 비교")
+    parser.add_argument("--fixture", default=FIXTURE_PATH)
+    parser.add_argument("--openai", action="store_true", help="실제 embedding 모델 사용 (API 호출)")
+    args = parser.parse_args()
+
+    embedding = None
+    if args.openai:
+        from common.embeddings import shared_embeddings
+        embedding = shared_embeddings()
+    for result in run(args.fixture, embedding):
+        recall = " ".join(f"R@{k} {result[f'recall@{k}']:.2f}" for k in RECALL_AT)
+        print(f"{result['name']:<24} {recall} | chunk {result['chunks']:.1f}개, context {result['context_tokens']:.0f} tokens")
@@ -0,0 +1,89 @@
+"""
+채팅방별 Chroma 폴더(`./chroma_data/movie/{session_id}`, `./chroma_data/character/{session_id}`)를
+공유 store(`./chroma_data/shared`, llm/movie_store.py)로 옮깁니다.
+
+* 이미 계산된 embedding을 그대로 옮기므로 embedding API를 호출하지 않습니다
+* 같은 영화가 여러 채팅방에 있으면 처음 것 하나만 저장하고, 채팅방은 참조만 기록합니다
+* 제목이 DB의 영화 하나와 정확히 일치하면 movie id로 저장합니다
+
+```bash
+# pwd = backend/src (서버를 실행하는 위치)
+python -m llm.migrate_chroma            # 옮기기만
+python -m llm.migrate_chroma --delete   # 옮긴 뒤 채팅방별 폴더 삭제
+```
+"""
+
+import argparse
+import shutil
+from typing import Optional
+import chromadb
+from langchain_core.documents import Document
+from llm.movie_store import CHROMA_DATA_PATH, MovieDocumentStore, close_chroma_client, dir_size, legacy_session_dirs, movie_key, movie_store
+
+# langchain Chroma의 기본 collection 이름
+LEGACY_COLLECTION = "langchain"
+
+def _resolve_movie_id(title: str) -> Optional[int]:
+    import sqlalchemy as sql
+    import database.models as m
+    with m.SessionLocal() as db:
+        ids = db.scalars(sql.select(m.Movie.id).where(m.Movie.title == title).limit(2)).all()
+    return ids[0] if len(ids) == 1 else None
+
+def migrate_session(store: MovieDocumentStore, kind: str, session_id: str, path: str, stats: dict):
+    client = chromadb.PersistentClient(path=path)
+    try:
+        found = client.get_collection(LEGACY_COLLECTION).get(include=["documents", "metadatas", "embeddings"])
+    except Exception:
+        return
+    finally:
+        # 채팅방 폴더마다 client가 열린 채로 남지 않도록 바로 닫음
+        close_chroma_client(path)
+    stats["chunks_read"] += len(found["ids"])
+
+    # 제목별로 묶어서 영화 하나씩 옮김 (chunk 순서는 저장된 순서를 따름)
+    movies: dict[str, list[int]] = {}
+    for i, metadata in enumerate(found["metadatas"] or []):
+        title = (metadata or {}).get("title")
+        if title:
+            movies.setdefault(title, []).append(i)
+
+    for title, indices in movies.items():
+        key = store.find(kind, title)
+        if key is None:
+            movie_id = _resolve_movie_id(title)
+            key = movie_key(title, movie_id)
+            docs = [Document(page_content=found["documents"][i], metadata={}) for i in indices]
+            embeddings = [list(found["embeddings"][i]) for i in indices]
+            store.add(kind, key, title, docs, movie_id, embeddings)
+            stats["movies_written"] += 1
+            stats["chunks_written"] += len(docs)
+        store.attach(session_id, kind, key)
+
+def migrate(root: str = CHROMA_DATA_PATH, store: MovieDocumentStore = movie_store, delete: bool = False) -> dict:
+    stats = {"sessions": 0, "chunks_read": 0, "chunks_written": 0, "movies_written": 0, "bytes_before": 0, "bytes_after": 0}
+    legacy_dirs: list[str] = []
+    for kind, session_id, path in legacy_session_dirs(root):
+        stats["bytes_before"] += dir_size(path)
+        migrate_session(store, kind, session_id, path, stats)
+        stats["sessions"] += 1
+        legacy_dirs.append(path)
+        print(f"[migrate] {kind}/{session_id} 완료")
+
+    if delete:
+        for path in legacy_dirs:
+            shutil.rmtree(path, ignore_errors=True)
+    stats["bytes_after"] = dir_size(store.path)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="채팅방별 Chroma 폴더를 공유 store로 옮깁니다")
+    parser.add_argument("--root", default=CHROMA_DATA_PATH, help="chroma_data 폴더 경로")
+    parser.add_argument("--delete", action="store_true", help="옮긴 뒤 채팅방별 폴더를 삭제")
+    args = parser.parse_args()
+    stats = migrate(args.root, delete=args.delete)
+    print(
+        f"[migrate] 채팅방 {stats['sessions']}개, chunk {stats['chunks_read']}개 -> "
+        f"영화 {stats['movies_written']}개 chunk {stats['chunks_written']}개 | "
+        f"{stats['bytes_before'] / 1e6:.1f}MB -> {stats['bytes_after'] / 1e6:.1f}MB"
+    )
@@ -0,0 +1,420 @@
+"""
+모든 채팅방이 같이 쓰는 영화 문서 vector store입니다.
+
+예전에는 채팅방마다 `./chroma_data/movie/{session_id}`, `./chroma_data/character/{session_id}`에
+같은 영화의 줄거리/위키/리뷰를 따로 embedding해서 저장했지만,
+이제는 영화 하나당 한 번만 `./chroma_data/shared`에 저장하고
+채팅방은 어떤 영화를 참조하는지(movie_key)만 기록해서 metadata filter로 검색합니다.
+
+* kind: "movie"(qachat, 리뷰 포함) / "character"(characterchat, 줄거리 + 위키)
+* movie_key: "movie:{movie id}", movie id를 모를 때는 "title:{제목}"
+
+어떤 영화가 저장되어 있는지는 similarity search 없이 메모리의 presence index(movie id/제목 -> chunk id, 버전, 저장 시각)로
+바로 확인합니다. 버전이 `MOVIE_DOCUMENT_VERSION`보다 낮거나 `MOVIE_DOCUMENT_MAX_AGE`보다 오래된 영화는
+저장되지 않은 것으로 취급하므로, 다음에 언급될 때 다시 저장됩니다.
+
+기존 채팅방별 폴더는 `python -m llm.migrate_chroma`로 옮길 수 있습니다.
+삭제되었거나 오래 쓰이지 않은 채팅방의 참조와, 아무도 참조하지 않는 오래된 영화 문서는 `gc()`가 지웁니다. (llm/session_gc.py)
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+from cachetools import LRUCache
+from chromadb.api.shared_system_client import SharedSystemClient
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from common.env import ENV_MOVIE_STALE_DAYS
+
+CHROMA_DATA_PATH = "./chroma_data"
+SHARED_STORE_PATH = f"{CHROMA_DATA_PATH}/shared"
+SESSION_REF_PATH = f"{CHROMA_DATA_PATH}/session_movies.db"
+KINDS = ("movie", "character")
+# chunk를 만드는 방식이 바뀌면 올려주세요. 이전 버전으로 저장된 영화는 다시 저장됩니다
+MOVIE_DOCUMENT_VERSION = 2
+MOVIE_DOCUMENT_MAX_AGE = 60 * 60 * 24 * ENV_MOVIE_STALE_DAYS
+# 채팅방의 마지막 사용 시각(session_movies.used_at)은 이 간격보다 자주 기록하지 않음 (메시지마다 쓰지 않도록)
+TOUCH_INTERVAL = 60 * 10
+
+def dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def close_chroma_client(path: str) -> bool:
+    """
+    path에 열려 있는 chromadb client(sqlite 연결, 파일 handle 등)를 닫습니다.
+    chromadb는 같은 path의 client를 process가 끝날 때까지 캐시하므로, 다 쓴 폴더는 직접 닫아야 합니다
+    """
+    system = SharedSystemClient._identifier_to_system.pop(path, None)
+    if system is None:
+        return False
+    system.stop()
+    return True
+
+def open_chroma_clients() -> int:
+    return len(SharedSystemClient._identifier_to_system)
+
+def legacy_session_dirs(root: str = CHROMA_DATA_PATH) -> Iterator[tuple[str, str, str]]:
+    """옮기지 않은 채팅방별 폴더들. (kind, session_id, 폴더 경로)"""
+    for kind in KINDS:
+        kind_root = os.path.join(root, kind)
+        if not os.path.isdir(kind_root):
+            continue
+        for session_id in sorted(os.listdir(kind_root)):
+            path = os.path.join(kind_root, session_id)
+            if os.path.isdir(path):
+                yield kind, session_id, path
+
+def movie_key(title: str, movie_id: Optional[int] = None) -> str:
+    return f"movie:{movie_id}" if movie_id is not None else f"title:{title}"
+
+@dataclass
+class MoviePresence:
+    key: str
+    title: str
+    movie_id: Optional[int] = None
+    chunk_ids: list[str] = field(default_factory=list)
+    version: int = 0
+    ingested_at: float = 0.0
+
+    def is_stale(self, now: Optional[float] = None, max_age: float = MOVIE_DOCUMENT_MAX_AGE) -> bool:
+        now = time.time() if now is None else now
+        return self.version < MOVIE_DOCUMENT_VERSION or now - self.ingested_at > max_age
+
+class PresenceIndex:
+    """
+    store 하나(kind)에 저장된 영화 목록. movie_key/movie id로 찾습니다.
+    같은 제목의 다른 영화(리메이크 등)가 있을 수 있으므로, 제목으로는 그 제목의 영화가 하나뿐일 때만 찾습니다
+    """
+    def __init__(self):
+        self.by_key: dict[str, MoviePresence] = {}
+        self.by_title: dict[str, set[str]] = {}  # 제목 -> movie_key들
+        self.by_id: dict[int, str] = {}
+
+    def add_chunk(self, id: str, metadata: dict):
+        key = metadata.get("movie_key")
+        if not key:
+            return
+        presence = self.by_key.get(key)
+        if presence is None:
+            presence = self.put(MoviePresence(key, metadata.get("title", ""), metadata.get("movie_id")))
+        presence.chunk_ids.append(id)
+        # chunk마다 다르다면 가장 오래된 값을 기준으로 판단
+        version = metadata.get("version", 0)
+        ingested_at = metadata.get("ingested_at", 0.0)
+        presence.version = version if len(presence.chunk_ids) == 1 else min(presence.version, version)
+        presence.ingested_at = ingested_at if len(presence.chunk_ids) == 1 else min(presence.ingested_at, ingested_at)
+
+    def put(self, presence: MoviePresence) -> MoviePresence:
+        self.remove(presence.key)
+        self.by_key[presence.key] = presence
+        self.by_title.setdefault(presence.title, set()).add(presence.key)
+        if presence.movie_id is not None:
+            self.by_id[presence.movie_id] = presence.key
+        return presence
+
+    def remove(self, key: str):
+        presence = self.by_key.pop(key, None)
+        if presence is None:
+            return
+        keys = self.by_title.get(presence.title)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_title[presence.title]
+        if presence.movie_id is not None and self.by_id.get(presence.movie_id) == key:
+            del self.by_id[presence.movie_id]
+
+    def get(self, title: str, movie_id: Optional[int] = None) -> Optional[MoviePresence]:
+        """
+        movie_id가 있으면 그 영화, 또는 movie id 없이 같은 제목으로 저장된 예전 문서(add()가 movie id로 옮김)만 찾습니다.
+        movie_id가 없으면 그 제목으로 저장된 영화가 하나뿐일 때만 찾습니다
+        """
+        keys = self.by_title.get(title, set())
+        if movie_id is not None:
+            key = self.by_id.get(movie_id)
+            if key is None:
+                key = next((i for i in sorted(keys) if self.by_key[i].movie_id is None), None)
+        else:
+            key = next(iter(keys)) if len(keys) == 1 else None
+        return self.by_key.get(key) if key else None
+
+class MovieDocumentStore:
+    def __init__(self, path: str = SHARED_STORE_PATH, ref_path: str = SESSION_REF_PATH, embedding: Optional[Embeddings] = None):
+        self.path = path
+        self.ref_path = ref_path
+        self._embedding = embedding
+        self._chromas: dict[str, Chroma] = {}
+        self._presence: dict[str, PresenceIndex] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # session_id -> 마지막으로 used_at을 기록한 시각
+        self._touched: LRUCache = LRUCache(maxsize=4096)
+
+    def chroma(self, kind: str) -> Chroma:
+        with self._lock:
+            if kind not in self._chromas:
+                if self._embedding is None:
+                    from common.embeddings import shared_embeddings
+                    self._embedding = shared_embeddings()
+                os.makedirs(self.path, exist_ok=True)
+                self._chromas[kind] = Chroma(
+                    collection_name=f"movie_documents_{kind}",
+                    persist_directory=self.path,
+                    embedding_function=self._embedding
+                )
+            return self._chromas[kind]
+
+    def _refs(self) -> sqlite3.Connection:
+        # lock을 잡은 상태에서 호출해야 합니다
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.ref_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.ref_path, isolation_level=None, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_movies ("
+                "session_id TEXT NOT NULL, kind TEXT NOT NULL, movie_key TEXT NOT NULL, "
+                "used_at REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (session_id, kind, movie_key))"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(session_movies)")]
+            if "used_at" not in columns:
+                # 예전 table: 지금 사용한 것으로 간주해서 바로 정리되지 않도록 함
+                self._conn.execute("ALTER TABLE session_movies ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+                self._conn.execute("UPDATE session_movies SET used_at = ?", (time.time(),))
+        return self._conn
+
+    def _load_presence(self, kind: str, where: Optional[dict] = None) -> PresenceIndex:
+        found = self.chroma(kind).get(where=where, include=["metadatas"])
+        index = PresenceIndex()
+        for id, metadata in zip(found["ids"], found.get("metadatas") or []):
+            index.add_chunk(id, metadata or {})
+        return index
+
+    def presence_index(self, kind: str) -> PresenceIndex:
+        # 처음 한 번만 store 전체 metadata를 읽고, 이후에는 add()가 갱신합니다
+        index = self._presence.get(kind)
+        if index is None:
+            index = self._load_presence(kind)
+            with self._lock:
+                index = self._presence.setdefault(kind, index)
+        return index
+
+    def presence(self, kind: str, title: str, movie_id: Optional[int] = None) -> Optional[MoviePresence]:
+        """저장된 영화의 chunk id, 버전, 저장 시각. 없으면 None"""
+        index = self.presence_index(kind)
+        found = index.get(title, movie_id)
+        if found is not None:
+            return found
+
+        # 다른 worker process가 저장했을 수 있으므로, 없을 때만 metadata로 한 번 더 확인
+        where = {"title": title} if movie_id is None else {"$or": [{"movie_id": movie_id}, {"title": title}]}
+        for other in self._load_presence(kind, where).by_key.values():
+            with self._lock:
+                index.put(other)
+        return index.get(title, movie_id)
+
+    def find(self, kind: str, title: str, movie_id: Optional[int] = None) -> Optional[str]:
+        """최신 상태로 저장된 영화라면 movie_key를, 없거나 오래되었다면 None을 반환합니다"""
+        found = self.presence(kind, title, movie_id)
+        if found is None or found.is_stale():
+            return None
+        return found.key
+
+    def stats(self) -> dict:
+        """kind별 저장된 영화 수, chunk 수, 오래된 영화 수와 참조하는 채팅방 수, 열린 handle 수, 디스크 사용량(byte)"""
+        now = time.time()
+        result = {}
+        for kind in KINDS:
+            presences = list(self.presence_index(kind).by_key.values())
+            result[kind] = {
+                "movies": len(presences),
+                "chunks": sum(len(i.chunk_ids) for i in presences),
+                "stale": sum(1 for i in presences if i.is_stale(now)),
+            }
+        with self._lock:
+            (sessions,) = self._refs().execute("SELECT COUNT(DISTINCT session_id) FROM session_movies").fetchone()
+        result["sessions"] = sessions
+        result["open_handles"] = self.open_handles()
+        result["disk"] = self.disk_usage()
+        return result
+
+    def open_handles(self) -> dict:
+        return {
+            "chroma_clients": open_chroma_clients(),  # process 전체 (채팅방별 폴더를 연 client 포함)
+            "collections": len(self._chromas),
+            "sqlite": int(self._conn is not None),
+        }
+
+    def disk_usage(self, legacy_root: str = CHROMA_DATA_PATH) -> dict:
+        refs = sum(os.path.getsize(self.ref_path + suffix) for suffix in ("", "-wal", "-journal") if os.path.exists(self.ref_path + suffix))
+        return {
+            "shared": dir_size(self.path),
+            "refs": refs,
+            "legacy": sum(dir_size(path) for _, _, path in legacy_session_dirs(legacy_root)),
+        }
+
+    def add(self, kind: str, key: str, title: str, docs: list[Document], movie_id: Optional[int] = None, embeddings: Optional[list[list[float]]] = None):
+        """
+        영화 하나의 chunk들을 저장합니다. 같은 movie_key로 저장되어 있던 chunk는 지웁니다.
+        embeddings를 주면 embedding을 다시 계산하지 않습니다 (migration용)
+        """
+        now = time.time()
+        for doc in docs:
+            doc.metadata["title"] = title
+            doc.metadata["movie_key"] = key
+            doc.metadata["version"] = MOVIE_DOCUMENT_VERSION
+            doc.metadata["ingested_at"] = now
+            if movie_id is not None:
+                doc.metadata["movie_id"] = movie_id
+        ids = [f"{key}:{i}" for i in range(len(docs))]
+
+        chroma = self.chroma(kind)
+        index = self.presence_index(kind)
+        # 제목으로 저장되어 있던 영화를 movie id로 다시 저장하는 경우, 이전 chunk와 채팅방 참조를 옮김
+        previous = index.get(title, movie_id)
+        if previous is not None and previous.key != key:
+            chroma.delete(where={"movie_key": previous.key})
+            self._rename_refs(kind, previous.key, key)
+            with self._lock:
+                index.remove(previous.key)
+        chroma.delete(where={"movie_key": key})
+        with self._lock:
+            index.remove(key)
+        if not docs:
+            return
+        if embeddings is None:
+            chroma.add_documents(docs, ids=ids)
+        else:
+            chroma._collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=[doc.page_content for doc in docs],
+                metadatas=[doc.metadata for doc in docs]
+            )
+        with self._lock:
+            index.put(MoviePresence(key, title, movie_id, ids, MOVIE_DOCUMENT_VERSION, now))
+
+    def attach(self, session_id: str, kind: str, key: str):
+        """채팅방이 영화를 참조하도록 기록합니다"""
+        now = time.time()
+        with self._lock:
+            self._refs().execute(
+                "INSERT INTO session_movies (session_id, kind, movie_key, used_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id, kind, movie_key) DO UPDATE SET used_at = excluded.used_at",
+                (str(session_id), kind, key, now)
+            )
+            self._touched[str(session_id)] = now
+
+    def touch(self, session_id: str):
+        """채팅방이 사용되었음을 기록합니다. gc()는 오래 쓰이지 않은 채팅방의 참조를 지웁니다"""
+        session_id = str(session_id)
+        now = time.time()
+        with self._lock:
+            if now - self._touched.get(session_id, 0.0) < TOUCH_INTERVAL:
+                return
+            self._refs().execute("UPDATE session_movies SET used_at = ? WHERE session_id = ?", (now, session_id))
+            self._touched[session_id] = now
+
+    def detach_session(self, session_id: str) -> int:
+        """삭제된 채팅방의 참조를 모두 지웁니다. 지운 참조 수를 반환합니다"""
+        with self._lock:
+            self._touched.pop(str(session_id), None)
+            return self._refs().execute("DELETE FROM session_movies WHERE session_id = ?", (str(session_id),)).rowcount
+
+    def _rename_refs(self, kind: str, old: str, new: str):
+        with self._lock:
+            refs = self._refs()
+            refs.execute("UPDATE OR IGNORE session_movies SET movie_key = ? WHERE kind = ? AND movie_key = ?", (new, kind, old))
+            refs.execute("DELETE FROM session_movies WHERE kind = ? AND movie_key = ?", (kind, old))
+
+    def session_keys(self, session_id: str, kind: str) -> list[str]:
+        with self._lock:
+            rows = self._refs().execute(
+                "SELECT movie_key FROM session_movies WHERE session_id = ? AND kind = ?",
+                (str(session_id), kind)
+            ).fetchall()
+        return [key for (key,) in rows]
+
+    def session_filter(self, session_id: str, kind: str, titles: Optional[list[str]] = None) -> Optional[dict]:
+        """
+        채팅방에서 검색할 chunk의 metadata filter.
+        titles가 있으면 그 영화들만, 없으면 채팅방이 참조하는 모든 영화. 참조하는 영화가 없다면 None
+        """
+        if titles:
+            return {"title": {"$in": titles}}
+        keys = self.session_keys(session_id, kind)
+        if not keys:
+            return None
+        return {"movie_key": {"$in": keys}}
+
+    def gc(self, live_session_ids: Optional[set[str]], idle_after: float, legacy_root: Optional[str] = CHROMA_DATA_PATH, now: Optional[float] = None) -> dict:
+        """
+        삭제되었거나(live_session_ids에 없음) idle_after초 동안 쓰이지 않은 채팅방의 참조와,
+        아무 채팅방도 참조하지 않으면서 오래된(is_stale) 영화 문서, 삭제된 채팅방의 예전 채팅방별 폴더를 지웁니다.
+        live_session_ids가 None이면 삭제 여부는 확인하지 않습니다
+        """
+        now = time.time() if now is None else now
+        result = {"sessions": 0, "refs": 0, "movies": 0, "chunks": 0, "legacy_dirs": 0, "bytes": 0}
+        with self._lock:
+            refs = self._refs()
+            sessions = refs.execute("SELECT session_id, MAX(used_at) FROM session_movies GROUP BY session_id").fetchall()
+            expired = [
+                session_id for session_id, used_at in sessions
+                if (live_session_ids is not None and session_id not in live_session_ids) or now - used_at > idle_after
+            ]
+            for session_id in expired:
+                result["refs"] += refs.execute("DELETE FROM session_movies WHERE session_id = ?", (session_id,)).rowcount
+                self._touched.pop(session_id, None)
+            result["sessions"] = len(expired)
+            referenced = set(refs.execute("SELECT DISTINCT kind, movie_key FROM session_movies").fetchall())
+
+        bytes_before = dir_size(self.path)
+        for kind in KINDS:
+            index = self.presence_index(kind)
+            for presence in list(index.by_key.values()):
+                if (kind, presence.key) in referenced or not presence.is_stale(now):
+                    continue
+                # 그 사이에 다시 저장되었다면 새 chunk는 남김
+                self.chroma(kind).delete(where={"$and": [
+                    {"movie_key": presence.key}, {"ingested_at": {"$lte": presence.ingested_at}}
+                ]})
+                with self._lock:
+                    if index.by_key.get(presence.key) is presence:
+                        index.remove(presence.key)
+                result["movies"] += 1
+                result["chunks"] += len(presence.chunk_ids)
+
+        if live_session_ids is not None and legacy_root is not None:
+            for _, session_id, path in list(legacy_session_dirs(legacy_root)):
+                if session_id in live_session_ids:
+                    continue
+                result["bytes"] += dir_size(path)
+                close_chroma_client(path)
+                shutil.rmtree(path, ignore_errors=True)
+                result["legacy_dirs"] += 1
+        # chroma는 지운 공간을 다시 쓰므로 폴더 크기가 줄지 않을 수 있음
+        result["bytes"] += max(bytes_before - dir_size(self.path), 0)
+        return result
+
+    def close(self):
+        """열어둔 chroma client와 sqlite 연결을 닫습니다. 다시 사용하면 새로 엽니다"""
+        with self._lock:
+            self._chromas.clear()
+            self._presence.clear()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            close_chroma_client(self.path)
+
+movie_store = MovieDocumentStore()
@@ -2,15 +2,18 @@ import os
 from dotenv import load_dotenv
 
 import tmdbsimple as tmdb
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.documents import Document
-from langchain.text_splitter import CharacterTextSplitter
 from langchain.memory import ConversationSummaryBufferMemory
 
 
 from llm.crawler import get_tmdb_overview, get_wikipedia_content, get_watcha_reviews
+from common.embeddings import shared_embeddings
+from llm.movie_store import movie_store, movie_key
+from llm.retriever import hybrid_search
+from llm.chunking import chunk_movie_documents
+from llm.session_gc import SessionCache
 
 # --------------------- [1] 초기 설정 ---------------------
 load_dotenv()
@@ -20,7 +23,9 @@ if not tmdb.API_KEY or not openai_key:
     raise ValueError("API 키가 없습니다.")
 
 llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
-embedding = OpenAIEmbeddings()
+# 대화 요약용. 채팅방마다 만들면 채팅방마다 HTTP client가 생기므로 하나를 같이 사용합니다
+memory_llm = ChatOpenAI(temperature=0)
+embedding = shared_embeddings()
 
 # --------------------- [2] 프롬프트 ---------------------
 
@@ -142,36 +147,37 @@ def get_validated_movies(user_input: str) -> list[dict]:
     return validated
 
 # --------------------- [4] Chroma 데이터 로딩 ---------------------
-def _is_cached_on_chroma(title: str, db):
-    try:
-        existing_titles = {doc.metadata['title'] for doc in db.similarity_search("영화", k=50)}
-    except:
-        existing_titles = set()
-    return title in existing_titles
-
 def is_cached_on_chroma(title: str, session_id):
-    return _is_cached_on_chroma(title, get_chroma_for_session(session_id))
-
-def _add_to_chroma(movie_name: str, overview: str, wiki: str, reviews: list[str], db):
-    joined_reviews = "\n\n".join(f"- {r}" for r in reviews)
-
-    combined = f"[영화 제목] {movie_name}\n\n[TMDB 줄거리]\n{overview}\n\n[Wikipedia 문서]\n{wiki}\n\n[왓챠 리뷰]\n{joined_reviews}"
-    doc = Document(page_content=combined, metadata={"title": movie_name})
-
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    split_docs = splitter.split_documents([doc])
-    db.add_documents(split_docs)
-
-def add_to_chroma(title: str, tmdb_overview: str|None, wikipedia_content: str|None, watcha_reviews: list[str], session_id):
+    # presence index로 바로 확인합니다 (embedding 요청/vector search 없음)
+    # 다른 채팅방에서 이미 저장한 영화라면 이 채팅방에서도 참조하도록 연결합니다
+    key = movie_store.find("movie", title)
+    if key is None:
+        return False
+    movie_store.attach(session_id, "movie", key)
+    return True
+
+def _split_movie_documents(movie_name: str, overview: str, wiki: str, reviews: list[str]) -> list[Document]:
+    # 위키 섹션/리뷰 단위로 token 수에 맞춰 나눕니다 (llm/chunking.py)
+    docs, stats = chunk_movie_documents(movie_name, overview, wiki, reviews)
+    print(f"[chunking] {movie_name}: chunk {stats.chunks}개, embedding {stats.tokens} tokens (섹션 {stats.dropped_sections}개, 중복 {stats.duplicates}개 제외)")
+    return docs
+
+def add_to_chroma(title: str, tmdb_overview: str|None, wikipedia_content: str|None, watcha_reviews: list[str], session_id, movie_id: int|None = None):
     if not tmdb_overview:
         tmdb_overview = ""
     if not wikipedia_content:
         wikipedia_content = ""
-    _add_to_chroma(title, tmdb_overview, wikipedia_content, watcha_reviews, get_chroma_for_session(session_id))
+    # 영화 하나당 한 번만 embedding하고, 채팅방은 movie_key로 참조만 합니다
+    key = movie_store.find("movie", title, movie_id)
+    if key is None:
+        key = movie_key(title, movie_id)
+        docs = _split_movie_documents(title, tmdb_overview, wikipedia_content, watcha_reviews)
+        movie_store.add("movie", key, title, docs, movie_id)
+    movie_store.attach(session_id, "movie", key)
      
-def load_data(titles, db):
+def load_data(titles, session_id):
     for movie_name in titles:
-        if _is_cached_on_chroma(movie_name, db):
+        if is_cached_on_chroma(movie_name, session_id):
             print(f"[스킵됨] '{movie_name}'은 이미 Chroma에 저장되어 있습니다.")
             return
 
@@ -180,29 +186,23 @@ def load_data(titles, db):
         overview = get_tmdb_overview(movie_name)
         wiki = get_wikipedia_content(movie_name) or get_wikipedia_content(movie_name + " (영화)")
         reviews = get_watcha_reviews(movie_name, max_comments=20)
-        _add_to_chroma(movie_name, overview, wiki, reviews, db)
+        add_to_chroma(movie_name, overview, wiki, reviews, session_id)
 
 # --------------------- [5] Chroma & Memory 설정 ---------------------
 
-session_memories = {}
-_cached_chroma_dict = {}
+# 가장 오래 쓰지 않은 채팅방부터 내보내며, 다음 메시지에서 DB로부터 다시 불러옵니다 (llm_layer.py)
+session_memories = SessionCache("qachat.memories")
 
 def get_chroma_for_session(session_id: str):
-    if session_id not in _cached_chroma_dict:
-        dir_path = f"./chroma_data/movie/{session_id}"
-        os.makedirs(dir_path, exist_ok=True)
-        _cached_chroma_dict[session_id] = Chroma(
-            persist_directory=dir_path,
-            embedding_function=embedding
-        )
-    return _cached_chroma_dict[session_id]
+    # 모든 채팅방이 같은 store를 사용합니다. 채팅방별 검색은 movie_store.session_filter()로 구분
+    return movie_store.chroma("movie")
 
 def is_memory_on_cache(session_id):
     return session_id in session_memories
 
 def load_memory(session_id: str, summary: str, messages: list):
     memory = ConversationSummaryBufferMemory(
-        llm=ChatOpenAI(temperature=0),
+        llm=memory_llm,
         return_messages=True,
         max_token_limit=1000
     )
@@ -213,7 +213,7 @@ def load_memory(session_id: str, summary: str, messages: list):
 def get_memory(session_id):
     if session_id not in session_memories:
         session_memories[session_id] = ConversationSummaryBufferMemory(
-            llm=ChatOpenAI(temperature=0),
+            llm=memory_llm,
             return_messages=True,
             max_token_limit=1000
         )
@@ -244,8 +244,7 @@ def run_qa_mode():
             print(f"✔ {m['title']} ({m['release_date']}) → TMDB ID: {m['tmdb_id']}")
 
         if movie_titles:
-            chroma = get_chroma_for_session(session_id)
-            load_data(movie_titles, chroma)
+            load_data(movie_titles, session_id)
         else:
             print("[안내] 영화 data loading 생략.")
 
@@ -253,12 +252,11 @@ def run_qa_mode():
         db = get_chroma_for_session(session_id)
         memory = get_memory(session_id)
 
-        search_kwargs = {"k": 10}
-        if movie_titles:
-            search_kwargs["filter"] = {"title": {"$in": movie_titles}}
-        retriever = db.as_retriever(search_kwargs=search_kwargs)
-
-        docs = retriever.get_relevant_documents(user_input)
+        docs = []
+        search_filter = movie_store.session_filter(session_id, "movie", movie_titles)
+        if search_filter is not None:
+            retriever = db.as_retriever(search_kwargs={"k": 10, "filter": search_filter})
+            docs = retriever.get_relevant_documents(user_input)
         context = "\n\n".join([doc.page_content for doc in docs])
 
         summary = memory.buffer or "(요약 없음)"
@@ -324,13 +322,13 @@ def get_streamed_messages(
 
     db = get_chroma_for_session(session_id)
     memory = get_memory(session_id)
+    movie_store.touch(session_id)
 
-    search_kwargs = {"k": 10}
-    if movie_titles:
-        search_kwargs["filter"] = {"title": {"$in": movie_titles}}
-    retriever = db.as_retriever(search_kwargs=search_kwargs)
-
-    docs = retriever.get_relevant_documents(user_input)
+    docs = []
+    search_filter = movie_store.session_filter(session_id, "movie", movie_titles)
+    if search_filter is not None:
+        # BM25 + vector 검색 결과를 합쳐서 관련도가 높은 chunk만 사용합니다 (llm/retriever.py)
+        docs = hybrid_search(db, user_input, search_filter)
     context = "\n\n".join([doc.page_content for doc in docs]) or "관련된 문서를 찾을 수 없습니다."
 
     summary = memory.buffer or "(요약 없음)"
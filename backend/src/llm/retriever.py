@@ -0,0 +1,158 @@
+"""
+qachat.get_streamed_messages에서 사용하는 hybrid 검색입니다.
+
+vector 검색만으로는 인물 이름, 날짜, 대사처럼 글자가 정확히 일치해야 하는 질문에서
+비슷하기만 한 chunk들이 섞여 들어와 prompt만 길어지므로,
+같은 chunk들에 대한 BM25(한글은 글자 bigram) 검색 결과와 vector 검색 결과를 RRF로 합친 뒤,
+질문 단어를 얼마나 포함하는지로 다시 정렬하고 거의 같은 chunk는 빼서 `top_k`개(또는 `token_budget`)만 반환합니다.
+
+검색 품질은 `python -m llm.eval_retriever`로 비교할 수 있습니다.
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+from cachetools import LRUCache
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from common.tokens import count_tokens
+
+HYBRID_FETCH_K = 20      # vector/BM25 각각에서 가져올 후보 수
+HYBRID_TOP_K = 5         # prompt에 넣을 chunk 수
+HYBRID_TOKEN_BUDGET = 1500
+RRF_K = 60
+COVERAGE_WEIGHT = 0.02   # 질문 단어 포함 비율(0 ~ 1)에 곱해서 RRF 점수에 더함
+DUPLICATE_JACCARD = 0.8  # 이미 고른 chunk와 단어가 이만큼 겹치면 제외
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"\w+")
+
+def tokenize(text: str) -> list[str]:
+    """
+    영어/숫자는 단어 그대로, 한글은 글자 bigram으로 나눕니다.
+    조사가 붙어도 찾을 수 있도록 하기 위함입니다: "봉준호가" -> 봉준, 준호, 호가
+    """
+    terms = []
+    for word in _WORD.findall(unicodedata.normalize("NFKC", text).casefold()):
+        if len(word) == 1 or word.isascii():
+            terms.append(word)
+        else:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+@dataclass
+class Chunk:
+    id: str
+    text: str
+    metadata: dict
+    terms: Counter
+    length: int
+
+# chunk id -> (ingested_at, Chunk). 같은 chunk를 요청마다 다시 tokenize하지 않도록
+_chunk_cache: LRUCache = LRUCache(maxsize=20000)
+_chunk_cache_lock = threading.Lock()
+
+def _to_chunk(id: str, text: str, metadata: dict) -> Chunk:
+    version = metadata.get("ingested_at")
+    with _chunk_cache_lock:
+        cached = _chunk_cache.get(id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    terms = tokenize(text)
+    chunk = Chunk(id, text, metadata, Counter(terms), len(terms))
+    with _chunk_cache_lock:
+        _chunk_cache[id] = (version, chunk)
+    return chunk
+
+def bm25_scores(query: list[str], chunks: list[Chunk]) -> list[float]:
+    if not chunks:
+        return []
+    n = len(chunks)
+    avg_length = sum(chunk.length for chunk in chunks) / n or 1.0
+    unique = set(query)
+    df = {term: sum(1 for chunk in chunks if term in chunk.terms) for term in unique}
+    idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items() if count}
+
+    scores = []
+    for chunk in chunks:
+        score = 0.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk.length / avg_length)
+        for term, weight in idf.items():
+            tf = chunk.terms.get(term, 0)
+            if tf:
+                score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+def _jaccard(a: Counter, b: Counter) -> float:
+    union = len(a.keys() | b.keys())
+    return len(a.keys() & b.keys()) / union if union else 1.0
+
+def rerank(query: str, chunks: list[Chunk], vector_ranking: list[str], top_k: int = HYBRID_TOP_K, fetch_k: int = HYBRID_FETCH_K, token_budget: Optional[int] = HYBRID_TOKEN_BUDGET) -> list[Chunk]:
+    """
+    BM25 순위와 vector 순위(chunk id 목록)를 RRF로 합치고, 질문 단어 포함 비율로 다시 정렬합니다.
+    """
+    terms = tokenize(query)
+    scores = bm25_scores(terms, chunks)
+    lexical = sorted((i for i in range(len(chunks)) if scores[i] > 0), key=lambda i: -scores[i])[:fetch_k]
+
+    by_id = {chunk.id: chunk for chunk in chunks}
+    fused: dict[str, float] = {}
+    for rank, i in enumerate(lexical):
+        fused[chunks[i].id] = fused.get(chunks[i].id, 0.0) + 1 / (RRF_K + rank + 1)
+    for rank, id in enumerate(vector_ranking[:fetch_k]):
+        if id in by_id:
+            fused[id] = fused.get(id, 0.0) + 1 / (RRF_K + rank + 1)
+
+    unique_terms = set(terms)
+    def final_score(id: str) -> float:
+        chunk = by_id[id]
+        coverage = sum(1 for term in unique_terms if term in chunk.terms) / len(unique_terms) if unique_terms else 0.0
+        return fused[id] + COVERAGE_WEIGHT * coverage
+
+    selected: list[Chunk] = []
+    used_tokens = 0
+    for id in sorted(fused, key=final_score, reverse=True):
+        chunk = by_id[id]
+        if any(_jaccard(chunk.terms, other.terms) >= DUPLICATE_JACCARD for other in selected):
+            continue
+        # 첫 chunk는 budget을 넘더라도 포함
+        tokens = count_tokens(chunk.text) if token_budget is not None else 0
+        if selected and token_budget is not None and used_tokens + tokens > token_budget:
+            continue
+        used_tokens += tokens
+        selected.append(chunk)
+        if len(selected) >= top_k:
+            break
+    return selected
+
+def hybrid_search(db: Chroma, query: str, search_filter: Optional[dict], top_k: int = HYBRID_TOP_K, fetch_k: int = HYBRID_FETCH_K, token_budget: Optional[int] = HYBRID_TOKEN_BUDGET) -> list[Document]:
+    """
+    search_filter에 해당하는 chunk들 중에서 query와 관련된 chunk를 찾습니다.
+    (채팅방이 참조하는 영화들의 chunk이므로 많아야 수백 개이며, BM25는 이 chunk들에 대해서만 계산합니다)
+    """
+    found = db.get(where=search_filter, include=["documents", "metadatas"])
+    chunks = [
+        _to_chunk(id, text or "", metadata or {})
+        for id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+    ]
+    if not chunks:
+        return []
+
+    vector_ranking: list[str] = []
+    if db.embeddings is not None:
+        results = db._collection.query(
+            query_embeddings=[db.embeddings.embed_query(query)],
+            n_results=min(fetch_k, len(chunks)),
+            where=search_filter,
+            include=[]
+        )
+        vector_ranking = results["ids"][0]
+
+    selected = rerank(query, chunks, vector_ranking, top_k, fetch_k, token_budget)
+    return [Document(page_content=chunk.text, metadata=chunk.metadata, id=chunk.id) for chunk in selected]
@@ -0,0 +1,220 @@
+"""
+채팅방마다 쌓이는 자원을 일정한 크기로 유지합니다.
+
+* qachat/characterchat의 채팅방별 memory, 캐릭터 prompt: `SessionCache` (LRU, 최대 `SESSION_CACHE_SIZE`개)
+  내보내진 채팅방은 다음 메시지에서 DB(chat memory log, 캐릭터 profile)로부터 다시 불러옵니다.
+  메시지를 처리하는 동안(응답 생성 ~ memory 저장)에는 `pin_session`으로 고정해서 내보내지지 않게 합니다
+* 공유 영화 문서 store(llm/movie_store.py)의 채팅방 참조: 채팅방을 삭제하면 바로(`forget_session`),
+  DB에 없거나 `SESSION_IDLE_DAYS`일 동안 메시지가 없던 채팅방은 `SessionGarbageCollector`가 지웁니다
+* 아무 채팅방도 참조하지 않는 오래된 영화 문서, 삭제된 채팅방의 예전 채팅방별 폴더(`chroma_data/{kind}/{id}`)도 같이 지웁니다
+
+main.py의 lifespan에서 `SESSION_GC_INTERVAL`초마다 실행되며, 상태는 `session_gc.stats()`로 확인할 수 있습니다.
+
+```bash
+# pwd = backend/src
+python -m llm.session_gc            # 열린 handle 수, 디스크 사용량 보고
+python -m llm.session_gc --collect  # 한 번 정리한 뒤 보고
+```
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Iterator, Optional
+from cachetools import LRUCache
+import sqlalchemy as sql
+from sqlalchemy.orm import Session
+from common.env import ENV_SESSION_GC_INTERVAL, ENV_SESSION_IDLE_DAYS
+from llm.movie_store import MovieDocumentStore, close_chroma_client, legacy_session_dirs, movie_store
+
+SESSION_CACHE_SIZE = 256
+SESSION_IDLE_AFTER = 60 * 60 * 24 * ENV_SESSION_IDLE_DAYS
+
+# 이름 -> SessionCache. 보고/채팅방 삭제 시 한꺼번에 처리하기 위함
+_session_caches: dict[str, "SessionCache"] = {}
+
+class SessionCache(LRUCache):
+    """
+    채팅방 id -> 값. 가득 차면 가장 오래 쓰지 않은 채팅방부터 내보냅니다.
+    `pin`한 채팅방은 내보내지더라도 pin이 풀릴 때까지 따로 보관했다가, 다시 찾으면 그대로 돌려줍니다
+    """
+    def __init__(self, name: str, maxsize: int = SESSION_CACHE_SIZE):
+        super().__init__(maxsize=maxsize)
+        self.name = name
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._pins: Counter = Counter()
+        self._evicted_pins: dict = {}
+        _session_caches[name] = self
+
+    def __getitem__(self, key):
+        with self._lock:
+            return super().__getitem__(key)
+
+    def __missing__(self, key):
+        # pin된 채팅방이 내보내졌다면 다시 넣어서 돌려줌
+        if key not in self._evicted_pins:
+            raise KeyError(key)
+        value = self._evicted_pins.pop(key)
+        self[key] = value
+        return value
+
+    def __contains__(self, key):
+        with self._lock:
+            return super().__contains__(key) or key in self._evicted_pins
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._evicted_pins.pop(key, None)
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key in self._evicted_pins:
+                del self._evicted_pins[key]
+                if not super().__contains__(key):
+                    return
+            super().__delitem__(key)
+
+    def popitem(self):
+        with self._lock:
+            key, value = super().popitem()
+            if self._pins[key]:
+                self._evicted_pins[key] = value
+            else:
+                self.evictions += 1
+            return key, value
+
+    @contextmanager
+    def pin(self, key) -> Iterator[None]:
+        """with 안에서는 key가 내보내지지 않습니다 (아직 없는 key도 pin할 수 있음)"""
+        with self._lock:
+            self._pins[key] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if self._pins[key] <= 0:
+                    del self._pins[key]
+                    self._evicted_pins.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"size": len(self), "maxsize": self.maxsize, "evictions": self.evictions, "pinned": len(self._pins)}
+
+@contextmanager
+def pin_session(session_id: str) -> Iterator[None]:
+    """채팅방의 memory/prompt를 with 안에서 내보내지 않습니다. 메시지 하나를 처리하는 동안 사용합니다"""
+    with ExitStack() as stack:
+        for cache in list(_session_caches.values()):
+            stack.enter_context(cache.pin(str(session_id)))
+        yield
+
+def forget_session(session_id: str, store: MovieDocumentStore = movie_store) -> dict:
+    """삭제된 채팅방의 memory/prompt, 영화 문서 참조, 예전 채팅방별 폴더를 지웁니다"""
+    session_id = str(session_id)
+    for cache in _session_caches.values():
+        cache.pop(session_id, None)
+    refs = store.detach_session(session_id)
+    legacy_dirs = 0
+    for _, legacy_id, path in list(legacy_session_dirs()):
+        if legacy_id == session_id:
+            close_chroma_client(path)
+            shutil.rmtree(path, ignore_errors=True)
+            legacy_dirs += 1
+    return {"refs": refs, "legacy_dirs": legacy_dirs}
+
+def _live_session_ids(db: Session) -> set[str]:
+    import database.models as m
+    return {str(id) for id in db.scalars(sql.select(m.ChatRoom.id))}
+
+class SessionGarbageCollector:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        store: MovieDocumentStore = movie_store,
+        idle_after: float = SESSION_IDLE_AFTER,
+        interval: float = ENV_SESSION_GC_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.store = store
+        self.idle_after = idle_after
+        self.interval = interval
+        self._task: asyncio.Task|None = None
+        self.runs = 0
+        self.last_run_at: float|None = None
+        self.last_result: dict = {}
+
+    def run_once(self) -> dict:
+        if self.session_factory is None:
+            import database.models as m
+            self.session_factory = m.SessionLocal
+        with self.session_factory() as db:
+            live = _live_session_ids(db)
+        # DB에서 삭제된 채팅방이 메모리에 남아있다면 같이 내보냄
+        evicted = 0
+        for cache in _session_caches.values():
+            with cache._lock:
+                session_ids = [i for i in cache.keys() if i not in live]
+            for session_id in session_ids:
+                evicted += cache.pop(session_id, None) is not None
+        result = self.store.gc(live, self.idle_after)
+        result["evicted"] = evicted
+        self.runs += 1
+        self.last_run_at = time.time()
+        self.last_result = result
+        return result
+
+    async def run_forever(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(self.run_once)
+                if any(result.values()):
+                    print(f"[session gc] {_format_result(result)}")
+            except Exception as e:
+                print(f"[session gc] 정리 실패: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """채팅방 cache 크기, 열린 handle 수, 디스크 사용량(byte), 마지막 정리 결과"""
+        return {
+            "session_caches": {name: cache.stats() for name, cache in _session_caches.items()},
+            "store": self.store.stats(),
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+        }
+
+def _format_result(result: dict) -> str:
+    return (
+        f"채팅방 {result['sessions']}개의 참조 {result['refs']}개, 영화 {result['movies']}개(chunk {result['chunks']}개), "
+        f"채팅방별 폴더 {result['legacy_dirs']}개 삭제, cache에서 {result.get('evicted', 0)}개 제거 | {result['bytes'] / 1e6:.1f}MB 확보"
+    )
+
+session_gc = SessionGarbageCollector()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="삭제/방치된 채팅방의 자원을 정리하고 사용량을 보고합니다")
+    parser.add_argument("--collect", action="store_true", help="보고하기 전에 한 번 정리")
+    args = parser.parse_args()
+    if args.collect:
+        print(f"[session gc] {_format_result(session_gc.run_once())}")
+    print(json.dumps(session_gc.stats(), ensure_ascii=False, indent=2))
@@ -6,6 +6,7 @@ from langchain.schema import messages_to_dict, messages_from_dict
 from typing import AsyncGenerator, TypedDict
 
 from database.chroma import *
+from database.title_index import movie_title_index
 from datetime import datetime, timezone
 from sse import *
 
@@ -20,7 +21,11 @@ def is_room_immersive(room: ChatRoomInfoInternal) -> bool:
   return bool(room.character_id)
 
 
-def get_current_summary(room: ChatRoomInfoInternal) -> SummaryType:
+def get_current_summary(db: Session, room: ChatRoomInfoInternal) -> SummaryType:
+    """
+    채팅방의 현재 memory. 메시지를 처리하는 동안에는 `llm.session_gc.pin_session`으로 memory를 고정해주세요.  
+    memory가 cache에 없다면 빈 memory를 만들지 않고 DB에서 다시 불러옵니다. (빈 memory가 저장되면 대화 내용이 사라짐)
+    """
     import llm.characterchat as cc
     
     session_id = str(room.id)
@@ -29,10 +34,12 @@ def get_current_summary(room: ChatRoomInfoInternal) -> SummaryType:
     # qachat.py의 session 메모리 공간이 분리되어 있어,
     # 다음과 같이 처리해줘야 합니다. 아마 통합해도 될 것 같긴 한데,
     # 다른 side-effect가 발생할 수도 있어 일단은 이렇게 처리.
-    if is_room_immersive(room):
-        memory = cc.get_memory(session_id)
-    else:
-        memory = qachat.get_memory(session_id)
+    chat = cc if is_room_immersive(room) else qachat
+    if not chat.is_memory_on_cache(session_id):
+        context = db_get_chatroom_memory(db, room.id)
+        if context:
+            chat.load_memory(session_id, context.summary, messages_from_dict(context.messages))
+    memory = chat.get_memory(session_id)
 
     summary = memory.moving_summary_buffer
     messages = memory.chat_memory.messages
@@ -65,12 +72,37 @@ async def send_message_to_ai(db: Session, user_id: int, room_id: int, message: s
 
 # fast-path
 def fuzzy_fast(db: Session, title: str, keyword: str|None):
+    # 제목/alias index에서 확실히 찾으면 embedding 요청 없이 바로 반환
+    match = movie_title_index.search(db, title, keyword)
+    if match:
+        movie = db_find_movie_by_id(db, match[0], True)
+        if movie:
+            return movie, None
+
     meta = chroma_fuzzy_search(title, [keyword] if keyword else None)
     if meta:
         movie = db_find_movie_by_id(db, meta.sqlite_id, True)
         return movie, meta
     return None, None
 
+def fuzzy_fast_many(db: Session, queries: list[tuple[str, str|None]]) -> list[tuple[MovieInfoInternal|None, MovieMeta|None]]:
+    """fuzzy_fast의 batch 버전. index에서 못 찾은 제목들만 모아서 chroma에 한 번에 검색합니다"""
+    found: list[tuple[MovieInfoInternal|None, MovieMeta|None]] = [(None, None)] * len(queries)
+    misses: list[int] = []
+    for i, (title, keyword) in enumerate(queries):
+        match = movie_title_index.search(db, title, keyword)
+        movie = db_find_movie_by_id(db, match[0], True) if match else None
+        if movie:
+            found[i] = (movie, None)
+        else:
+            misses.append(i)
+
+    metas = chroma_fuzzy_search_many([(queries[i][0], [queries[i][1]] if queries[i][1] else None) for i in misses])
+    for i, meta in zip(misses, metas):
+        if meta:
+            found[i] = (db_find_movie_by_id(db, meta.sqlite_id, True), meta)
+    return found
+
 # slow-path
 def fuzzy_slow(db: Session, title: str, keyword: str|None, meta: MovieMeta|None):
     movie = None
@@ -144,7 +176,7 @@ async def stream_create_character(db: Session, room_id: int, character_id: int):
                 db_update_wikipedia_data(db, movie.id, movie.wiki_document)
             yield make_sse(SSE_SIGNAL, SSE_CRAWL_END)
 
-        cc.add_to_chroma(title, movie.tmdb_overview, movie.wiki_document, session_id)
+        cc.add_to_chroma(title, movie.tmdb_overview, movie.wiki_document, session_id, movie.id)
     
     yield make_sse(SSE_SIGNAL, SSE_CC_START)
     personality = cc.create_personality(title, character, session_id)
@@ -174,14 +206,11 @@ async def stream_character_chat(db: Session, room_id: int, message: str, charact
     # 메모리 로드 (기존 대화 기록)
     if not cc.is_memory_on_cache(session_id):
         print(f"[cc] session cache가 비어있습니다")
-        context = db_get_chatroom_context(db, room_id).summary
+        context = db_get_chatroom_memory(db, room_id)
         if context:
             print(f"[cc] session 정보를 DB에서 불러옵니다")
             print(f"context: {context}")
-            context = cast(SummaryType, json.loads(context))
-            summary = context["summary"]
-            messages = messages_from_dict(context["messages"])
-            cc.load_memory(session_id, summary, messages)
+            cc.load_memory(session_id, context.summary, messages_from_dict(context.messages))
         else:
             print("session 정보가 없습니다. 새로운 context를 생성합니다.")
     
@@ -215,6 +244,7 @@ async def stream_send_message_to_ai(db: Session, user_id: int, room_id: int, mes
     if hints and hints[0] == '제목이 명확하지 않음 사용자에게 재입력 요청':
         titles = cast(list[str], hints)
     else:
+        queries: list[tuple[str, str|None]] = []
         for hint in hints:
             title = hint.get("title")
             keyword = hint.get("keyword")
@@ -222,8 +252,9 @@ async def stream_send_message_to_ai(db: Session, user_id: int, room_id: int, mes
 
             if qachat.is_cached_on_chroma(title, session_id):
                 continue
+            queries.append((title, keyword))
 
-            movie, meta = fuzzy_fast(db, title, keyword)
+        for (title, keyword), (movie, meta) in zip(queries, fuzzy_fast_many(db, queries)):
             if not movie:
                 yield make_sse(SSE_SIGNAL, SSE_CRAWL_START)
                 movie = fuzzy_slow(db, title, keyword, meta)
@@ -253,8 +284,9 @@ async def stream_send_message_to_ai(db: Session, user_id: int, room_id: int, mes
                 yield make_sse(SSE_SIGNAL, SSE_CRAWL_END)
 
             # 6. Let's cache it
-            qachat.add_to_chroma(title, movie.tmdb_overview, movie.wiki_document, reviews, session_id)
-            print(f"[send_message_to_qachat] chroma에 {title}(이)가 캐시되었습니다")
+            # 문서 metadata에는 사용자가 말한 제목이 아니라 DB의 제목을 저장 (같은 영화를 다르게 불러도 같은 제목으로 찾을 수 있도록)
+            qachat.add_to_chroma(movie.title, movie.tmdb_overview, movie.wiki_document, reviews, session_id, movie.id)
+            print(f"[send_message_to_qachat] chroma에 {movie.title}(이)가 캐시되었습니다")
 
         if not hints:
             print(f"[send_message_to_qachat] 감지된 영화 없음")
@@ -262,14 +294,11 @@ async def stream_send_message_to_ai(db: Session, user_id: int, room_id: int, mes
     
     if not qachat.is_memory_on_cache(session_id):
         print(f"[send_message_to_qachat] session cache가 비어있습니다")
-        context = db_get_chatroom_context(db, room_id).summary
+        context = db_get_chatroom_memory(db, room_id)
         if context:
             print(f"[send_message_to_qachat] session 정보를 DB에서 불러옵니다")
             print(f"context: {context}")
-            context = cast(SummaryType, json.loads(context))
-            summary = context["summary"]
-            messages = messages_from_dict(context["messages"])
-            qachat.load_memory(session_id, summary, messages)
+            qachat.load_memory(session_id, context.summary, messages_from_dict(context.messages))
         else:
             print("session 정보가 없습니다. 새로운 context를 생성합니다.")
 
@@ -290,14 +319,17 @@ async def stream_send_message_to_ai(db: Session, user_id: int, room_id: int, mes
         pass
     elif hints:
         ids: list[int]= []
+        queries: list[tuple[str, str|None]] = []
         for hint in hints:
             title = hint.get("title")
             keyword = hint.get("keyword")
             assert(title)
-            
-            yield make_sse(SSE_SIGNAL, SSE_DB_START)
-            movie, meta = fuzzy_fast(db, title, keyword)
-            yield make_sse(SSE_SIGNAL, SSE_DB_END)
+            queries.append((title, keyword))
+
+        yield make_sse(SSE_SIGNAL, SSE_DB_START)
+        found = fuzzy_fast_many(db, queries)
+        yield make_sse(SSE_SIGNAL, SSE_DB_END)
+        for (title, keyword), (movie, meta) in zip(queries, found):
             if not movie:
                 yield make_sse(SSE_SIGNAL, SSE_CRAWL_START)
                 movie = fuzzy_slow(db, title, keyword, meta)
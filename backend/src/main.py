@@ -1,11 +1,26 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 
 import auth
 import chatrooms
 import movies
+from common.tmdb_utils import tmdb_image_resolver
+from database.refresh import movie_refresh_scheduler
+from llm.session_gc import session_gc
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 처음 만들 때는 TMDB configuration을 요청할 수 있으므로, 요청을 받기 전에 thread에서 미리 만들어둠
+    await asyncio.to_thread(tmdb_image_resolver)
+    movie_refresh_scheduler.start()
+    session_gc.start()
+    yield
+    await session_gc.stop()
+    await movie_refresh_scheduler.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth.router)
 app.include_router(chatrooms.router)
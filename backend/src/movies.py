@@ -1,32 +1,44 @@
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, Path, Request, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Path, Request, Response, status
 from api_schema import *
 from database.utils import *
+import database.async_utils as adb
 from auth import validate_user
 from sse import *
+import asyncio
+from pydantic import TypeAdapter
 import auth
 
 router = APIRouter(prefix="/api/movies", tags=["movie"])
 
+_movie_list_adapter = TypeAdapter(List[Movie])
+
+def movie_list_response(movies: List[MovieInfoInternal]) -> Response:
+    """
+    영화 목록을 JSON 응답으로 변환합니다. 영화가 많으면 오래 걸리므로 `adb.to_thread`로 불러주세요.  
+    Response를 반환하면 FastAPI가 event loop 위에서 response_model 검증/직렬화를 다시 하지 않습니다.
+    """
+    return Response(_movie_list_adapter.dump_json(public_movie_infos(movies)), media_type="application/json")
+
 @router.get("/bookmarked", response_model=List[Movie])
-async def get_bookmarked(user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
-    movies = db_get_bookmarked_movies(db, user.id)
-    return [public_movie_info(movie) for movie in movies]
+async def get_bookmarked(user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
+    movies = await adb.db_get_bookmarked_movies(db, user.id)
+    return await asyncio.to_thread(public_movie_infos, movies)
 
 @router.post("/bookmarked", response_model=Movie)
-async def post_bookmark(payload: MovieIDRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
-    if db_add_bookmark(db, user.id, payload.id):
+async def post_bookmark(payload: MovieIDRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
+    if await adb.db_add_bookmark(db, user.id, payload.id):
         return public_movie_info(
-            cast( MovieInfoInternal, db_find_movie_by_id(db, payload.id, True, user.id) )
+            cast( MovieInfoInternal, await adb.db_find_movie_by_id(db, payload.id, True, user.id) )
         )
     else:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="bad request")
 
 
 @router.delete("/bookmarked", response_model=Movie)
-async def delete_bookmark(payload: MovieIDRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
-    movie = db_find_movie_by_id(db, payload.id, True, user.id)
+async def delete_bookmark(payload: MovieIDRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
+    movie = await adb.db_find_movie_by_id(db, payload.id, True, user.id)
 
-    if movie and db_rm_bookmark(db, user.id, payload.id):
+    if movie and await adb.db_rm_bookmark(db, user.id, payload.id):
         return public_movie_info(movie)
     else:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="bad request")
@@ -35,16 +47,16 @@ async def delete_bookmark(payload: MovieIDRequest, user: UserInfoInternal = Depe
 # /movies/archive
 # ---------------------------
 @router.get("/archive", response_model=List[Movie])
-async def get_archive(user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
-    movies = db_get_archived_movies(db, user.id)
-    return [public_movie_info(movie) for movie in movies]
+async def get_archive(user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
+    movies = await adb.db_get_archived_movies(db, user.id)
+    return await asyncio.to_thread(public_movie_infos, movies)
 
 
 @router.post("/archive", response_model=Movie)
-async def post_archive(payload: ArchiveRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
-    if db_add_archived(db, user.id, payload.movie_id, payload.rating):
+async def post_archive(payload: ArchiveRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
+    if await adb.db_add_archived(db, user.id, payload.movie_id, payload.rating):
         ret = public_movie_info(
-            cast( MovieInfoInternal, db_find_movie_by_id(db, payload.movie_id, True, user.id) )
+            cast( MovieInfoInternal, await adb.db_find_movie_by_id(db, payload.movie_id, True, user.id) )
         )
         ret.rating = min(5, max(0, payload.rating))
         return ret
@@ -53,10 +65,10 @@ async def post_archive(payload: ArchiveRequest, user: UserInfoInternal = Depends
 
 
 @router.put("/archive", response_model=Movie)
-async def update_archive(payload: ArchiveRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
-    if db_update_archived(db, user.id, payload.movie_id, payload.rating):
+async def update_archive(payload: ArchiveRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
+    if await adb.db_update_archived(db, user.id, payload.movie_id, payload.rating):
         ret = public_movie_info(
-            cast( MovieInfoInternal, db_find_movie_by_id(db, payload.movie_id, True, user.id) )
+            cast( MovieInfoInternal, await adb.db_find_movie_by_id(db, payload.movie_id, True, user.id) )
         )
         ret.rating = min(5, max(0, payload.rating))
         return ret
@@ -65,9 +77,9 @@ async def update_archive(payload: ArchiveRequest, user: UserInfoInternal = Depen
 
 
 @router.delete("/archive", response_model=Movie)
-async def delete_archive(payload: MovieIDRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
-    movie = db_find_movie_by_id(db, payload.id, True, user.id)
-    if movie and db_rm_archived(db, user.id, payload.id):
+async def delete_archive(payload: MovieIDRequest, user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
+    movie = await adb.db_find_movie_by_id(db, payload.id, True, user.id)
+    if movie and await adb.db_rm_archived(db, user.id, payload.id):
         return public_movie_info(movie)
     else:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="bad request")
@@ -76,10 +88,10 @@ async def delete_archive(payload: MovieIDRequest, user: UserInfoInternal = Depen
 # /movies/watchlist
 # ---------------------------
 @router.get("/watchlist", response_model=List[Movie])
-async def get_user_watchlist(user: UserInfoInternal = Depends(validate_user), db: Session = Depends(get_db)):
+async def get_user_watchlist(user: UserInfoInternal = Depends(validate_user), db: Session = Depends(adb.get_db)):
     try:
-        movies = db_get_watchlist(db, user.id)
-        return [public_movie_info(movie) for movie in movies]
+        movies = await adb.db_get_watchlist(db, user.id)
+        return await asyncio.to_thread(public_movie_infos, movies)
     except Exception as e:
         print(e)
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -88,9 +100,9 @@ async def get_user_watchlist(user: UserInfoInternal = Depends(validate_user), db
 # /movies/{id}
 # ---------------------------
 @router.get("/{id}", response_model=Movie)
-async def get_movie(request: Request, id: int = Path(...), verbose: bool = Query(True), db: Session = Depends(get_db)):
+async def get_movie(request: Request, id: int = Path(...), verbose: bool = Query(True), db: Session = Depends(adb.get_db)):
     user_id = auth.check_user_id(request)
-    movie = db_find_movie_by_id(db, id, verbose, user_id)
+    movie = await adb.db_find_movie_by_id(db, id, verbose, user_id)
     if movie is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="영화가 없습니다.")
 